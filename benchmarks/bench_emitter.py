@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark and parity check of the two ways makeSubjectCollections and
+makeSampleCollections can create instances: with the openMINDS package
+(emitter="openMINDS") or directly as JSON-LD (emitter="jsonld"). Both are run
+on the same sheets, the instances they write must be the same apart from the
+UUIDs. tests/test_emitter.py asserts the same parity on small sheets.
+
+The openMINDS emitter needs the openMINDS schemas, run `openMINDS_wrapper`
+once with network access (or version_manager.init()) before.
+
+Run with: python benchmarks/bench_emitter.py
+"""
+
+import contextlib
+import glob
+import io
+import json
+import os
+import re
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from metabot import openMINDS_wrapper
+
+SUBJECTS = [10, 100, 1000]
+STATES_PER_SUBJECT = 2
+SAMPLES_PER_SUBJECT = 4
+
+UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def makeSheets(subjects):
+    names = np.repeat(["sub-" + str(s) for s in range(subjects)], STATES_PER_SUBJECT)
+    timePoint = np.tile(np.arange(1, STATES_PER_SUBJECT + 1), subjects)
+    subject = pd.DataFrame({"specimenType": "subject", "name": names, "internalID": names,
+                            "strainName": "C57BL/6J", "strainAtid": "d9875ebd-260e-4337-a637-b62fed4aa91d",
+                            "timePoint": timePoint,
+                            "timePointName": [n + "_state-0" + str(t) for n, t in zip(names, timePoint)],
+                            "biologicalSex": "male", "ageCategory": "adult",
+                            "ageValue": "6-8", "ageUnit": "week", "weightValue": 25, "weightUnit": "gram",
+                            "attribute": "alive", "pathology": None, "sampleType": None, "region": None,
+                            "origin": None, "quantity": None, "isPartOf": None, "descendedFrom": None,
+                            "remarks": None})
+
+    parents = np.repeat(["sub-" + str(s) for s in range(subjects)], SAMPLES_PER_SUBJECT)
+    samples = [p + "_ts-" + str(i % SAMPLES_PER_SUBJECT) for i, p in enumerate(parents)]
+    sample = pd.DataFrame({"specimenType": "ts", "name": samples, "internalID": samples,
+                           "strainName": "C57BL/6J", "strainAtid": "d9875ebd-260e-4337-a637-b62fed4aa91d",
+                           "timePoint": 1, "timePointName": [s + "_state-01" for s in samples],
+                           "biologicalSex": "male", "ageCategory": None,
+                           "ageValue": None, "ageUnit": None, "weightValue": None, "weightUnit": None,
+                           "attribute": "fixed", "pathology": None, "sampleType": "tissueSlice",
+                           "region": "AMBA_CCFv3_2017_hippocampalRegion", "origin": "brain", "quantity": None,
+                           "isPartOf": None, "descendedFrom": [p + "_state-01" for p in parents],
+                           "remarks": None})
+    return subject, sample
+
+
+def build(emitter, subject, sample, output_path):
+    w = openMINDS_wrapper(emitter=emitter)
+    with contextlib.redirect_stdout(io.StringIO()):
+        subject_data = w.makeSubjectCollections(subject.copy(), output_path)
+        w.makeSampleCollections(w.findGroup(sample.copy(), subject_data), output_path)
+
+
+def canonical(output_path):
+    # Replace the UUIDs by the type and label of the instance they point to
+    instances = [json.load(open(f)) for f in glob.glob(os.path.join(output_path, "*", "*.jsonld"))]
+    labels = {i["@id"].split("/")[-1]: i["@type"].split("/")[-1] + ":" + str(i.get("lookupLabel"))
+              for i in instances}
+    return sorted(UUID.sub(lambda m: labels.get(m.group(0), m.group(0)), json.dumps(i, sort_keys=True))
+                  for i in instances)
+
+
+if __name__ == "__main__":
+    print("{:>9} {:>10} {:>15} {:>12} {:>8}".format("subjects", "instances", "openMINDS (s)", "jsonld (s)", "parity"))
+    for subjects in SUBJECTS:
+        subject, sample = makeSheets(subjects)
+        times = {}
+        outputs = {}
+        for emitter in ["openMINDS", "jsonld"]:
+            with tempfile.TemporaryDirectory() as folder:
+                start = time.perf_counter()
+                try:
+                    build(emitter, subject, sample, folder + "/")
+                except Exception as error:
+                    print("{} emitter failed: {}".format(emitter, error))
+                    continue
+                times[emitter] = time.perf_counter() - start
+                outputs[emitter] = canonical(folder)
+
+        parity = outputs.get("openMINDS") == outputs.get("jsonld") if len(outputs) == 2 else "-"
+        print("{:>9} {:>10} {:>15} {:12.3f} {:>8}".format(
+            subjects, len(outputs["jsonld"]),
+            "{:.3f}".format(times["openMINDS"]) if "openMINDS" in times else "-",
+            times["jsonld"], str(parity)))
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the state extraction in makeSubjectCollections: one boolean mask
+per subject (previous implementation) versus a single group-by pass over the
+sheet. Only the grouping stage is timed, no openMINDS instances are created.
+
+Run with: python benchmarks/bench_grouping.py
+"""
+
+import time
+import numpy as np
+import pandas as pd
+
+from metabot import openMINDS_wrapper
+
+STATES_PER_SUBJECT = 5
+SIZES = [100, 1000, 10000, 100000]
+# The per-subject masks are quadratic, skip them for the larger sheets
+MAX_ROWS_MASKED = 20000
+
+
+def makeSheet(rows):
+    subjects = np.arange(rows) // STATES_PER_SUBJECT
+    timePoint = np.arange(rows) % STATES_PER_SUBJECT + 1
+    names = ["sub-" + str(s) for s in subjects]
+    return pd.DataFrame({"specimenType": "subject",
+                         "name": names,
+                         "timePoint": timePoint,
+                         "timePointName": [n + "_state-0" + str(t) for n, t in zip(names, timePoint)],
+                         "ageCategory": "adult"})
+
+
+def splitMasked(df):
+    blocks = []
+    for name in df.name.unique():
+        blocks.append((name, df[df.name == name].drop_duplicates('timePointName', keep='first').reset_index(drop=True)))
+    return blocks
+
+
+# The openMINDS schemas are only loaded when the first collection is created
+w = openMINDS_wrapper()
+
+print("{:>8} {:>10} {:>12} {:>12}".format("rows", "subjects", "masked (s)", "groupby (s)"))
+for rows in SIZES:
+    df = makeSheet(rows)
+
+    if rows <= MAX_ROWS_MASKED:
+        start = time.perf_counter()
+        splitMasked(df)
+        masked = "{:12.3f}".format(time.perf_counter() - start)
+    else:
+        masked = "{:>12}".format("-")
+
+    start = time.perf_counter()
+    list(w._splitSpecimens(df, uniqueStates=True))
+    grouped = time.perf_counter() - start
+
+    print("{:>8} {:>10} {} {:12.3f}".format(rows, df.name.nunique(), masked, grouped))
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of the normalisation that upload applies to every instance:
+the chain of endswith checks and string splits that upload used before,
+versus the lookup tables in metabot.normalize.
+
+Run with: python benchmarks/bench_normalize.py
+"""
+
+import copy
+import time
+import uuid
+
+from metabot.normalize import normalizeInstance
+
+INSTANCES = 100000
+KG_PREFIX = "https://kg.ebrains.eu/api/instances/"
+TYPES = ["subjectState", "subject", "tissueSampleCollectionState", "tissueSampleCollection",
+         "tissueSampleState", "tissueSample"]
+
+
+def makeInstance(i):
+    type_name = TYPES[i % len(TYPES)]
+    return {"@id": "https://localhost/" + type_name + "/" + str(uuid.uuid4()),
+            "@type": "https://openminds.ebrains.eu/core/" + type_name.capitalize(),
+            "lookupLabel": "instance-" + str(i),
+            "studiedState": [{"@id": KG_PREFIX + str(uuid.uuid4())}],
+            "isPartOf": [{"@id": KG_PREFIX + str(uuid.uuid4())}],
+            "species": [{"@id": KG_PREFIX + str(uuid.uuid4())}]}
+
+
+def normalizeChain(instance):
+    atid = KG_PREFIX + instance["@id"].split("/")[-1]
+    instance["@id"] = atid
+    if "studiedState" in instance.keys():
+        for ss in range(len(instance["studiedState"])):
+            atid = KG_PREFIX + instance["studiedState"][ss]["@id"].split("/")[-1]
+            instance["studiedState"][ss]["@id"] = atid
+    for wrong, right in [("Tissuesamplecollectionstate", "TissueSampleCollectionState"),
+                         ("Tissuesamplecollection", "TissueSampleCollection"),
+                         ("Tissuesamplestate", "TissueSampleState"),
+                         ("Tissuesample", "TissueSample"),
+                         ("Subjectstate", "SubjectState")]:
+        if instance["@type"].endswith(wrong):
+            splittype = instance["@type"].split("/")[:-1]
+            splittype.append(right)
+            instance["@type"] = "/".join(splittype)
+    return instance
+
+
+instances = [makeInstance(i) for i in range(INSTANCES)]
+
+results = {}
+for name, normalize in [("endswith chain", normalizeChain), ("lookup table", normalizeInstance)]:
+    batch = copy.deepcopy(instances)
+    start = time.perf_counter()
+    results[name] = [normalize(instance) for instance in batch]
+    elapsed = time.perf_counter() - start
+    print("{:>16}: {:10.0f} instances/s".format(name, INSTANCES / elapsed))
+
+print("Same output:", results["endswith chain"] == results["lookup table"])
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the packed output compared to one file per instance, for the
+same sheets as bench_emitter.py: the time to create the instances, the size
+on disk, the time to read all instances back and the time to read 100
+instances by UUID (what upload does with a list of changed instances).
+
+Run with: python benchmarks/bench_pack.py
+"""
+
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from bench_emitter import makeSheets
+from metabot import openMINDS_wrapper
+from metabot.pack import PackReader
+from metabot.sink import manifestFiles
+
+SUBJECTS = 1000
+PACKED = [None, "jsonl", "gzip", "zstd"]
+LOOKUPS = 100
+
+
+def build(subject, sample, output_path, packed):
+    w = openMINDS_wrapper(emitter="jsonld", packed=packed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        subject_data = w.makeSubjectCollections(subject.copy(), output_path)
+        w.makeSampleCollections(w.findGroup(sample.copy(), subject_data), output_path)
+
+
+def folderSize(folder):
+    return sum(os.path.getsize(os.path.join(path, name))
+               for path, _, names in os.walk(folder) for name in names)
+
+
+def readFiles(files):
+    for fname in files:
+        with open(fname) as f:
+            json.load(f)
+
+
+if __name__ == "__main__":
+    subject, sample = makeSheets(SUBJECTS)
+    print("{} subjects".format(SUBJECTS))
+    print("{:>8} {:>10} {:>10} {:>10} {:>12}".format("packed", "build (s)", "size (MB)", "read (s)",
+                                                     "lookups (s)"))
+    for packed in PACKED:
+        with tempfile.TemporaryDirectory() as folder:
+            start = time.perf_counter()
+            try:
+                build(subject, sample, folder, packed)
+            except ImportError as error:
+                print("{:>8} {}".format(packed, error))
+                continue
+            built = time.perf_counter() - start
+
+            if packed is None:
+                files = manifestFiles(folder)
+                sample_files = random.Random(0).sample(files, LOOKUPS)
+                start = time.perf_counter()
+                readFiles(files)
+                read = time.perf_counter() - start
+                start = time.perf_counter()
+                readFiles(sample_files)
+                lookups = time.perf_counter() - start
+            else:
+                start = time.perf_counter()
+                pack = PackReader(folder)
+                for instance in pack:
+                    pass
+                read = time.perf_counter() - start
+                uuids = random.Random(0).sample(pack.uuids(), LOOKUPS)
+                start = time.perf_counter()
+                pack = PackReader(folder)
+                for uuid in uuids:
+                    pack.get(uuid)
+                lookups = time.perf_counter() - start
+            print("{:>8} {:10.3f} {:10.2f} {:10.3f} {:12.3f}".format(str(packed), built, folderSize(folder) / 1e6,
+                                                                    read, lookups))
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of reading a specimen sheet with read_excel compared to the
+readers for CSV, JSON-lines and Parquet files (readers.readSheet) and reading
+the same files in chunks (readers.readChunks). The sheet is the one of
+bench_emitter.py, written once in every format.
+
+Run with: python benchmarks/bench_readers.py
+"""
+
+import os
+import tempfile
+import time
+import pandas as pd
+
+from bench_emitter import makeSheets
+from metabot.readers import readChunks, readSheet
+
+SUBJECTS = 5000
+CHUNKSIZE = 10000
+
+
+def timeRead(read):
+    start = time.perf_counter()
+    rows = read()
+    return time.perf_counter() - start, rows
+
+
+if __name__ == "__main__":
+    subject, sample = makeSheets(SUBJECTS)
+    sheet = pd.concat([subject, sample], ignore_index=True)
+    print("{} rows".format(len(sheet)))
+    print("{:>10} {:>15} {:>15}".format("format", "readSheet (s)", "readChunks (s)"))
+
+    with tempfile.TemporaryDirectory() as folder:
+        files = {"xlsx": os.path.join(folder, "sheet.xlsx"),
+                 "csv": os.path.join(folder, "sheet.csv"),
+                 "jsonl": os.path.join(folder, "sheet.jsonl"),
+                 "parquet": os.path.join(folder, "sheet.parquet")}
+        sheet.to_excel(files["xlsx"], index=False)
+        sheet.to_csv(files["csv"], index=False)
+        sheet.to_json(files["jsonl"], orient="records", lines=True)
+        try:
+            sheet.to_parquet(files["parquet"])
+        except ImportError:
+            del files["parquet"]
+
+        for name, fname in files.items():
+            whole, rows = timeRead(lambda: len(readSheet(fname)))
+            chunked, chunkRows = timeRead(lambda: sum(len(chunk) for chunk in readChunks(fname, CHUNKSIZE)))
+            assert rows == chunkRows == len(sheet)
+            print("{:>10} {:15.3f} {:15.3f}".format(name, whole, chunked))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the start up time of a job, each step is timed in a new Python
+process so nothing is imported or cached yet:
+
+    - importing metabot and creating the wrapper (all an upload or delete job
+      needs)
+    - creating the first collection, which loads openMINDS and builds the
+      collection class of its Helper
+    - creating the first instances of every specimen type
+    - importing openMINDS and creating its Helper directly, as the wrapper
+      did before
+
+The openMINDS steps need the openMINDS schemas, run `openMINDS_wrapper` once
+with network access (or version_manager.init()) before.
+
+Run with: python benchmarks/bench_startup.py
+"""
+
+import subprocess
+import sys
+import time
+
+REPEATS = 5
+
+STEPS = [
+    ("import metabot + wrapper",
+     "from metabot import openMINDS_wrapper; openMINDS_wrapper()"),
+    ("first collection",
+     "from metabot import openMINDS_wrapper; from metabot.schemas import createCollection; "
+     "createCollection(openMINDS_wrapper().helper)"),
+    ("first instances",
+     "from metabot import openMINDS_wrapper; from metabot.schemas import createCollection; "
+     "from metabot.emitter import REQUIRED, addInstance; c = createCollection(openMINDS_wrapper().helper); "
+     "[addInstance(c, name, dict.fromkeys(required)) for name, required in REQUIRED.items()]"),
+    ("openMINDS Helper",
+     "import openMINDS, openMINDS.version_manager; "
+     "openMINDS.version_manager.version_selection('v3'); openMINDS.Helper().create_collection()"),
+    ("openMINDS instances",
+     "import openMINDS, openMINDS.version_manager; from metabot.emitter import REQUIRED; "
+     "openMINDS.version_manager.version_selection('v3'); c = openMINDS.Helper().create_collection(); "
+     "[getattr(c, 'add_core_' + name)(**dict.fromkeys(required)) for name, required in REQUIRED.items()]"),
+]
+
+
+def timeSnippet(code):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        return None, result.stderr.strip().split("\n")[-1]
+    return elapsed, None
+
+
+print("{:>26} {:>10} {:>10}".format("step", "best (s)", "mean (s)"))
+for name, code in STEPS:
+    times = []
+    for _ in range(REPEATS):
+        elapsed, error = timeSnippet(code)
+        if error is not None:
+            break
+        times.append(elapsed)
+    if not times:
+        print("{:>26}   failed: {}".format(name, error))
+        continue
+    print("{:>26} {:10.3f} {:10.3f}".format(name, min(times), sum(times) / len(times)))
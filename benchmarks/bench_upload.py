@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of openMINDS_wrapper.upload against the local KG stand-in
+(kg_standin.py) for a range of worker counts.
+
+Run with: python benchmarks/bench_upload.py
+"""
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from kg_standin import startServer
+from metabot import openMINDS_wrapper
+
+INSTANCES = 500
+LATENCY = 0.02
+WORKERS = [1, 4, 16, 32]
+
+
+def makeInstances(folder, number):
+    os.makedirs(os.path.join(folder, "subjectState"))
+    fnames = []
+    for i in range(number):
+        atid = str(uuid.uuid4())
+        fname = os.path.join(folder, "subjectState", atid + ".jsonld")
+        with open(fname, "w") as f:
+            json.dump({"@id": "https://localhost/subjectState/" + atid,
+                       "@type": "https://openminds.ebrains.eu/core/Subjectstate",
+                       "lookupLabel": "state-" + str(i)}, f)
+        fnames.append(fname)
+    return fnames
+
+
+# The openMINDS schemas are only loaded when the first collection is created
+w = openMINDS_wrapper()
+
+print("{:>8} {:>10} {:>14}".format("workers", "time (s)", "instances/s"))
+for workers in WORKERS:
+    server = startServer(latency=LATENCY)
+    with tempfile.TemporaryDirectory() as folder:
+        fnames = makeInstances(folder, INSTANCES)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            w.upload(fnames, "token", "dataset", workers=workers, kg_url=server.kg_url)
+        elapsed = time.perf_counter() - start
+    server.shutdown()
+    print("{:>8} {:10.2f} {:14.1f}".format(workers, elapsed, INSTANCES / elapsed))
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of makeSubjectCollections and makeSampleCollections with a pool of
+worker processes, for the same sheets as bench_emitter.py.
+
+Run with: python benchmarks/bench_workers.py
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from bench_emitter import makeSheets
+from metabot import openMINDS_wrapper
+
+SUBJECTS = 2000
+WORKERS = [1, 2, 4, 8]
+
+
+def build(subject, sample, output_path, workers):
+    w = openMINDS_wrapper(emitter="jsonld")
+    with contextlib.redirect_stdout(io.StringIO()):
+        subject_data = w.makeSubjectCollections(subject.copy(), output_path, workers=workers)
+        w.makeSampleCollections(w.findGroup(sample.copy(), subject_data), output_path, workers=workers)
+
+
+if __name__ == "__main__":
+    subject, sample = makeSheets(SUBJECTS)
+    print("{} subjects, {} cores".format(SUBJECTS, os.cpu_count()))
+    print("{:>8} {:>10}".format("workers", "time (s)"))
+    for workers in WORKERS:
+        with tempfile.TemporaryDirectory() as folder:
+            start = time.perf_counter()
+            build(subject, sample, folder + "/", workers)
+            print("{:>8} {:10.3f}".format(workers, time.perf_counter() - start))
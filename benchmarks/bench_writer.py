@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of makeSubjectCollections and makeSampleCollections with a
+different number of threads writing the instance files (writers), for the
+same sheets as bench_emitter.py. With 0 the files are written one by one.
+
+Run with: python benchmarks/bench_writer.py
+"""
+
+import contextlib
+import io
+import tempfile
+import time
+
+from bench_emitter import makeSheets
+from metabot import openMINDS_wrapper
+
+SUBJECTS = 1000
+WRITERS = [0, 1, 4, 8, 16]
+
+
+def build(subject, sample, output_path, writers):
+    w = openMINDS_wrapper(emitter="jsonld", writers=writers)
+    with contextlib.redirect_stdout(io.StringIO()):
+        subject_data = w.makeSubjectCollections(subject.copy(), output_path)
+        w.makeSampleCollections(w.findGroup(sample.copy(), subject_data), output_path)
+
+
+if __name__ == "__main__":
+    subject, sample = makeSheets(SUBJECTS)
+    print("{} subjects".format(SUBJECTS))
+    print("{:>8} {:>10}".format("writers", "time (s)"))
+    for writers in WRITERS:
+        with tempfile.TemporaryDirectory() as folder:
+            start = time.perf_counter()
+            build(subject, sample, folder, writers)
+            print("{:>8} {:10.3f}".format(writers, time.perf_counter() - start))
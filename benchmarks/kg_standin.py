@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal local stand-in for the instances endpoint of core.kg.ebrains.eu, used
+to exercise upload, delete and add2dsv without touching the real KG. Every
+request is answered after an artificial latency; instances are kept in memory.
+A fraction of the requests can be answered with 503 (flaky) to exercise the
+retries of the client, and the first answers for a UUID can be scripted
+(server.scripted[uuid] = [(status, headers), ...]), e.g. a 429 with a
+Retry-After header. The method, UUID and query of every request are logged.
+
+Use it from a script:
+    server = startServer(latency=0.05)
+    w.upload(instances_fnames, "token", "dataset", kg_url=server.kg_url)
+    server.shutdown()
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Keep connections alive like the real KG does
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=None, headers=None):
+        data = json.dumps(body if body is not None else {}).encode()
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method):
+        time.sleep(self.server.latency)
+        path, _, query = self.path.partition("?")
+        uuid = path.rstrip("/").split("/")[-1]
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        self.server.log.append((method, uuid))
+        self.server.queries.append(parse_qs(query))
+
+        if self.headers.get("Authorization") != "Bearer " + self.server.token:
+            return self._reply(401)
+        with self.server.lock:
+            scripted = self.server.scripted.get(uuid)
+            answer = scripted.pop(0) if scripted else None
+        if answer is not None:
+            return self._reply(answer[0], headers=answer[1])
+        if random.random() < self.server.flaky:
+            return self._reply(503)
+        instances = self.server.instances
+        with self.server.lock:
+            if method == "POST":
+                if uuid in instances:
+                    return self._reply(409)
+                instances[uuid] = body
+            elif method in ("PUT", "PATCH"):
+                if uuid not in instances and method == "PATCH":
+                    return self._reply(404)
+                if method == "PATCH":
+                    instances[uuid].update(body)
+                else:
+                    instances[uuid] = body
+            elif method == "DELETE":
+                if instances.pop(uuid, None) is None:
+                    return self._reply(404)
+            elif method == "GET":
+                if uuid not in instances:
+                    return self._reply(404)
+                return self._reply(200, {"data": instances[uuid]})
+        self._reply(200, {"data": body})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+class StandInServer(ThreadingHTTPServer):
+    request_queue_size = 256
+
+
+def startServer(latency=0.05, token="token", port=0, flaky=0.0):
+    server = StandInServer(("127.0.0.1", port), StandInHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.token = token
+    server.flaky = flaky
+    server.lock = threading.Lock()
+    server.instances = {}
+    server.log = []
+    server.queries = []
+    server.scripted = {}
+    server.kg_url = "http://127.0.0.1:" + str(server.server_address[1]) + "/v3-beta/instances/"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -16,11 +16,11 @@ More information about this file can be found in the instruction document
 
 import os
 import pandas as pd
-import glob
 from datetime import datetime
 from getpass import getpass
 
 from metabot import openMINDS_wrapper
+from metabot.readers import readSheet
 
 w = openMINDS_wrapper()
  
@@ -38,7 +38,7 @@ os.chdir(fpath)
 
 # Make output folder is it does not exist yet
 now = datetime.now()
-output_path = "createdInstances" + "_" + now.strftime("%d%m%Y_%H%M") + "\\"
+output_path = os.path.join("createdInstances" + "_" + now.strftime("%d%m%Y_%H%M"), "")
 if os.path.isdir(output_path):
     print("Output folder already exists")
 else:
@@ -47,33 +47,17 @@ else:
 
 # Import the file with the specimen metadata
 metadata_file = input("What is the name of your specimen file (e.g. specimen_template.xlsx)? ")
-fileLocation = fpath + metadata_file + ".xlsx"
+fileLocation = fpath + metadata_file
+if not os.path.splitext(metadata_file)[1]:
+    fileLocation = fileLocation + ".xlsx"
 
-specimenInfo = pd.read_excel(fileLocation)
+# Excel, CSV, JSON(-lines) and Parquet files can be used
+specimenInfo = readSheet(fileLocation)
 
-specimenType = specimenInfo.specimenType.to_list()
-
-if "subjectGroup" in specimenType:
-    SG_info = specimenInfo[specimenInfo.specimenType == "subjectGroup"].reset_index(drop=True) 
-    SG_data = w.makeSubjectCollections(SG_info, output_path)
-
-if "subject" in specimenType:
-    subject_info = specimenInfo[specimenInfo.specimenType == "subject"].reset_index(drop=True) 
-    if 'SG_data' in locals():
-        subject_info = w.findGroup(subject_info, SG_data)
-    subject_data = w.makeSubjectCollections(subject_info, output_path)
-
-if "tsc" in specimenType:
-    tsc_info = specimenInfo[specimenInfo.specimenType == "tsc"].reset_index(drop=True) 
-    if 'subject_data' in locals():
-        tsc_info = w.findGroup(tsc_info, subject_data)
-    tsc_data = w.makeSampleCollections(tsc_info, output_path)
-
-if "ts" in specimenType:
-    ts_info = specimenInfo[specimenInfo.specimenType == "ts"].reset_index(drop=True)
-    if 'tsc_data' in locals():
-        ts_info = w.findGroup(ts_info, tsc_data) 
-    ts_data = w.makeSampleCollections(ts_info, output_path)
+# Create the instances of all levels (subject groups, subjects, tissue sample
+# collections and tissue samples) in one go, the UUIDs of the specimen they
+# are part of or descended from are filled in along the way
+specimen_data = w.makeSpecimenCollections(specimenInfo, output_path)
 
 # Saving an overview file in the output folder for future reference
 print("\nOverview file is saved in the output folder \n")
@@ -83,12 +67,16 @@ answer = input("Would you like to upload the instances you created to the KGE? y
 
 if answer == "y":
     token = getpass(prompt="Please enter your KG token (or Enter to skip uploading to the KG): ")
-    instances_fnames = glob.glob(output_path + "*\\*", recursive = True)
+    # All instances that were written are listed in the manifest of the output folder
+    instances_fnames = output_path
 
     print("\nUploading data now:\n")
     
     if token != "":
-        response_upload = w.upload(instances_fnames, token, space_name = "dataset")  
+        # The journal keeps track of what was uploaded, so running this again
+        # only uploads the instances that are new or have changed
+        journal = os.path.join(output_path, "upload_journal.sqlite")
+        response_upload = w.upload(instances_fnames, token, space_name = "dataset", journal = journal)  
 
         # Add specimen to dataset version
         answer = input("Would you like to add the instances you created to a dataset version? yes (y) or no (n) " ) 
@@ -97,26 +85,10 @@ if answer == "y":
         print("\nAdding specimen to dataset version:" + dsv_uuid + "\n")
 
         # Retrieve the specimen information of the created instances
-        if 'SG_data' in locals():
-            SG2add = SG_data.specimen_uuid.unique().tolist()
-        else:
-            SG2add = []
-        if 'subject_data' in locals():
-            subjects2add = subject_data.specimen_uuid.unique().tolist()
-        else:
-            subjects2add = []
-        if 'tsc_data' in locals():
-            tsc2add = tsc_data.specimen_uuid.unique().tolist()
-        else:
-            tsc2add = []
-        if 'ts_data' in locals():
-            ts2add = ts_data.specimen_uuid.unique().tolist()
-        else:
-            ts2add = []
-        
-        instances2add = SG2add + subjects2add + tsc2add + ts2add
+        instances2add = specimen_data.specimen_uuid.unique().tolist()
 
-        response_addition = w.add2dsv(instances2add, token, dsv_uuid, space_name = "dataset")
+        # Keep the specimen that are already linked to the dataset version
+        response_addition = w.add2dsv(instances2add, token, dsv_uuid, space_name = "dataset", merge = True)
 
     else: 
         print("No token provided")  
@@ -38,7 +38,7 @@ data["descendedFrom"] = None
 df = pd.DataFrame(data, index=['i',])
 
 # Make output folder is it does not exist yet
-output_path = "createdInstances" + "_" + datetime.now().strftime("%d%m%Y_%H%M") + "\\"
+output_path = os.path.join("createdInstances" + "_" + datetime.now().strftime("%d%m%Y_%H%M"), "")
 if os.path.isdir(output_path):
     print("Output folder already exists")
 else:
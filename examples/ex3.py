@@ -21,10 +21,16 @@ w = openMINDS_wrapper()
 file_location = os.getcwd()
 fpath = input("Please define you path: ")
      
-fpath = fpath + "\\" 
+fpath = os.path.join(fpath, "")
 os.chdir(fpath)
 token = getpass(prompt="Please enter your KG token (or Enter to skip uploading to the KG): ")
-instances_fnames = glob.glob(fpath + "*\\*", recursive = True)
+
+# The manifest of the folder lists its instances, older folders without one
+# are searched for instance files
+if os.path.exists(os.path.join(fpath, "manifest.csv")):
+    instances_fnames = fpath
+else:
+    instances_fnames = glob.glob(os.path.join(fpath, "*", "*.jsonld"))
 
 # Select the space the instances need to be uploaded to, e.g. dataset
 space_name = "dataset"
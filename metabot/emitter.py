@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Fast path for creating the specimen instances without the openMINDS package.
+A JsonLdCollection keeps every instance as a plain JSON-LD dictionary that is
+created in one go from all its properties and checked once against the
+properties of its openMINDS (v3) schema, and saves the instances in the same
+files the openMINDS collections write.
+
+Classes:
+-------
+    Records :
+        rows of one specimen as plain Python values
+    JsonLdCollection :
+        collection of JSON-LD instances with the interface of an openMINDS
+        collection (add_core_<type>, get, save)
+Functions:
+-------
+    makeNamespace :
+        turn a name or UUID into a namespace for deterministic UUIDs
+    deterministicUUID :
+        UUID of an instance derived from a namespace and its identity
+    addInstance :
+        create an instance with all its properties in any collection
+"""
+
+import json
+import os
+import uuid
+
+from .normalize import TYPE_NAMES
+from .sink import writeAtomic
+
+CORE_PREFIX = "https://openminds.ebrains.eu/core/"
+LOCAL_PREFIX = "https://localhost/"
+CONTEXT = {"@vocab": "https://openminds.ebrains.eu/vocab/"}
+
+_STATE_PROPERTIES = ["additionalRemarks", "age", "attribute", "descendedFrom", "internalIdentifier",
+                     "lookupLabel", "pathology", "relativeTimeIndication", "weight"]
+
+# Properties of the openMINDS v3 specimen schemas, the first ones are required
+PROPERTIES = {
+    "subject": ["species", "studiedState", "biologicalSex", "internalIdentifier", "isPartOf",
+                "lookupLabel"],
+    "subjectState": ["ageCategory", "handedness"] + _STATE_PROPERTIES,
+    "subjectGroup": ["species", "studiedState", "additionalRemarks", "biologicalSex",
+                     "internalIdentifier", "lookupLabel", "quantity"],
+    "subjectGroupState": ["ageCategory", "handedness"] + _STATE_PROPERTIES,
+    "tissueSample": ["origin", "species", "studiedState", "type", "anatomicalLocation",
+                     "biologicalSex", "internalIdentifier", "isPartOf", "laterality", "lookupLabel"],
+    "tissueSampleCollection": ["origin", "species", "studiedState", "type", "additionalRemarks",
+                               "anatomicalLocation", "biologicalSex", "internalIdentifier", "isPartOf",
+                               "laterality", "lookupLabel", "quantity"],
+    "tissueSampleState": _STATE_PROPERTIES,
+    "tissueSampleCollectionState": _STATE_PROPERTIES,
+}
+
+REQUIRED = {
+    "subject": ["species", "studiedState"],
+    "subjectState": ["ageCategory"],
+    "subjectGroup": ["species", "studiedState"],
+    "subjectGroupState": ["ageCategory"],
+    "tissueSample": ["origin", "species", "studiedState", "type"],
+    "tissueSampleCollection": ["origin", "species", "studiedState", "type"],
+    "tissueSampleState": [],
+    "tissueSampleCollectionState": [],
+}
+
+# Properties that hold (lists of) links to other instances
+LINKS = frozenset(["species", "studiedState", "biologicalSex", "isPartOf", "ageCategory", "handedness",
+                   "attribute", "descendedFrom", "pathology", "origin", "type", "anatomicalLocation",
+                   "laterality"])
+
+
+def _checkInstance(type_name, properties):
+    allowed = PROPERTIES.get(type_name)
+    if allowed is None:
+        raise ValueError("No schema known for " + str(type_name))
+    for key, value in properties.items():
+        if key not in allowed:
+            raise ValueError(key + " is not a property of " + type_name)
+        if value is None or key not in LINKS:
+            continue
+        for link in value if isinstance(value, list) else [value]:
+            if not isinstance(link, dict) or not isinstance(link.get("@id"), str):
+                raise ValueError(key + " of " + type_name + " must link to instances with an @id, got " + repr(link))
+
+
+def makeNamespace(namespace):
+    """
+    Namespace UUID for deterministic UUIDs, namespace can be a UUID or any
+    name (e.g. the name of the project)
+    """
+    if namespace is None or isinstance(namespace, uuid.UUID):
+        return namespace
+    try:
+        return uuid.UUID(str(namespace))
+    except ValueError:
+        return uuid.uuid5(uuid.NAMESPACE_URL, str(namespace))
+
+
+def deterministicUUID(namespace, *identity):
+    """
+    UUID that only depends on the namespace and the identity of an instance
+    (its type, the specimen name, time point and state name)
+    """
+    return uuid.uuid5(namespace, "/".join(str(part) for part in identity))
+
+
+class Records:
+    """
+    The rows of one specimen as plain Python values. Columns are read like
+    the columns of a DataFrame (records.name[i]), but indexing a list is much
+    cheaper than indexing a pandas Series for every cell.
+    """
+
+    def __init__(self, columns):
+        self.__dict__.update(columns)
+        self.columns = list(columns)
+
+    @classmethod
+    def split(cls, df, positions):
+        """
+        Yield one Records per array of row positions, the sheet is converted
+        to Python values only once
+        """
+        columns = {column: df[column].tolist() for column in df.columns}
+        for rows in positions:
+            yield cls({column: [values[row] for row in rows] for column, values in columns.items()})
+
+    def __len__(self):
+        return len(self.columns and self.__dict__[self.columns[0]])
+
+    def row(self, i):
+        return Records({column: self.__dict__[column][i] for column in self.columns})
+
+
+class JsonLdInstance(dict):
+    """
+    JSON-LD instance, properties can also be set as attributes (like the
+    instances of an openMINDS collection)
+    """
+
+    def __init__(self, type_name, properties, UUID=None):
+        self.__dict__["type_name"] = type_name
+        self.__dict__["UUID"] = uuid.uuid1() if UUID is None else UUID
+        super().__init__()
+        self["@id"] = LOCAL_PREFIX + type_name + "/" + str(self.UUID)
+        self["@type"] = CORE_PREFIX + TYPE_NAMES.get(type_name.lower(), type_name)
+        self.update(properties)
+
+    @property
+    def at_id(self):
+        return self["@id"]
+
+    def __getattr__(self, key):
+        if key.startswith("_"):
+            raise AttributeError(key)
+        return self.get(key)
+
+    def __setattr__(self, key, value):
+        _checkInstance(self.type_name, {key: value})
+        self[key] = value
+
+    def content(self):
+        """
+        JSON-LD text of the instance, as it is saved
+        """
+        data = {key: value for key, value in self.items() if value is not None}
+        data["@context"] = CONTEXT
+        return json.dumps(data)
+
+    def save(self, output_folder):
+        os.makedirs(os.path.join(output_folder, self.type_name), exist_ok=True)
+
+        # With deterministic UUIDs an unchanged instance is already there and
+        # is not written again
+        writeAtomic(os.path.join(output_folder, self.type_name, str(self.UUID) + ".jsonld"), self.content())
+
+
+class JsonLdCollection:
+    def __init__(self):
+        self.data = {}
+
+    def add(self, type_name, UUID=None, **properties):
+        """
+        Create an instance of type_name (e.g. "subjectState") with all its
+        properties and return its @id. A new UUID is made unless one is given.
+        """
+        _checkInstance(type_name, properties)
+        instance = JsonLdInstance(type_name, properties, UUID)
+        self.data[instance.at_id] = instance
+        return instance.at_id
+
+    def get(self, id):
+        return self.data[id]
+
+    def save(self, output_folder):
+        for item in self.data.values():
+            item.save(output_folder)
+
+    def __getattr__(self, name):
+        # add_core_<type>(...) like the openMINDS collections
+        if name.startswith("add_core_"):
+            type_name = name[len("add_core_"):]
+            return lambda **properties: self.add(type_name, **properties)
+        raise AttributeError(name)
+
+
+def addInstance(collection, type_name, properties, UUID=None):
+    """
+    Create an instance of type_name with all its properties in a
+    JsonLdCollection or an openMINDS collection and return its @id. The
+    instance gets the given UUID, or a new random one if it is None.
+    """
+    if isinstance(collection, JsonLdCollection):
+        return collection.add(type_name, UUID, **properties)
+
+    required = REQUIRED[type_name]
+    atid = getattr(collection, "add_core_" + type_name)(**{key: properties.get(key) for key in required})
+    instance = collection.get(atid)
+    for key, value in properties.items():
+        if key not in required:
+            setattr(instance, key, value)
+
+    if UUID is not None:
+        # openMINDS always makes a random UUID, replace it
+        del collection.data[atid]
+        instance.UUID = UUID
+        instance.at_id = LOCAL_PREFIX + instance.type_name + "/" + str(UUID)
+        atid = instance.at_id
+        collection.data[atid] = instance
+    return atid
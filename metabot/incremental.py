@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Functions for rebuilding only the specimen whose rows changed since the
+previous run. Every row of a sheet gets a content hash that is stored in the
+overview file (<type>_created.csv). On the next run the hashes of each specimen
+are compared with the overview, only new and changed specimen are created
+again, and the instances that were added, changed or removed are listed in a
+change manifest (*_changes.csv) for the upload and delete steps.
+
+Functions:
+-------
+    rowHashes :
+        content hash of every row of a sheet
+    compareSheet :
+        find the specimen that are new, changed or removed
+    previousIds :
+        the @ids of unchanged specimen and their states in the overview
+    changeManifest :
+        list the instances that were added, changed or removed
+    readChanges :
+        the files to upload and UUIDs to delete of change manifests
+"""
+
+import os
+
+from .overview import stateKeys
+
+# Columns added by makeSubjectCollections and makeSampleCollections
+GENERATED_COLUMNS = ["specimen_uuid", "state_uuid", "row_hash"]
+
+
+def rowHashes(df):
+    """
+    Content hash (hexadecimal string) of every row, over all columns except
+    the generated ones, independent of the order of the columns
+    """
+    import pandas as pd
+    columns = sorted(column for column in df.columns if column not in GENERATED_COLUMNS)
+    content = df[columns].astype("string").fillna("\x00")
+    hashes = pd.util.hash_pandas_object(content, index=False)
+    return hashes.map(lambda value: format(value, "016x"))
+
+
+def _specimenHashes(names, hashes):
+    # The sorted row hashes of each specimen, so the order of the rows does not matter
+    import pandas as pd
+    return pd.Series(hashes.to_numpy(), index=names.astype(str).to_numpy()).groupby(level=0).agg(
+        lambda values: tuple(sorted(values)))
+
+
+def compareSheet(df, hashes, previous):
+    """
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The sheet that is going to be created
+    hashes : Pandas Series
+        rowHashes of df
+    previous : Pandas DataFrame
+        Overview file of the previous run (None if there is none)
+    Returns
+    -------
+    rebuild : set
+        Names of the specimen that are new or have changed rows
+    removed : set
+        Names of the specimen that are in the overview but not in df
+    """
+    current = _specimenHashes(df.name, hashes)
+    if previous is None or "row_hash" not in previous.columns:
+        return set(current.index), set()
+
+    before = _specimenHashes(previous.name, previous.row_hash.astype(str))
+    unchanged = current.index.intersection(before.index)
+    unchanged = unchanged[(current[unchanged] == before[unchanged]).to_numpy()]
+    return set(current.index) - set(unchanged), set(before.index) - set(current.index)
+
+
+def previousIds(previous, names):
+    """
+    Return the specimen and state UUIDs by name from the overview for the
+    given specimen names
+    """
+    rows = previous[previous.name.astype(str).isin(names)]
+    specimen_dict = dict(zip(rows.name.astype(str), rows.specimen_uuid.astype(str)))
+    state_dict = dict(zip(stateKeys(rows), rows.state_uuid.astype(str)))
+    return specimen_dict, state_dict
+
+
+def changeManifest(df, previous, rebuild, removed, specimen_dict, state_dict, output_path):
+    """
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The sheet that was created
+    previous : Pandas DataFrame
+        Overview file of the previous run (None if there is none)
+    rebuild : set
+        Names of the specimen that were created again
+    removed : set
+        Names of the specimen that are not in the sheet anymore
+    specimen_dict, state_dict : dictionary
+        The @ids of the specimen and states that were created again
+    output_path : string
+        Location the instances were saved in
+    Returns
+    -------
+    changes : Pandas DataFrame
+        One row per instance with the change ("added", "changed" or
+        "removed"), the specimen name, the UUID and the instance file (empty
+        for removed instances)
+    """
+    import pandas as pd
+    state_names = dict(zip(stateKeys(df), df.name.astype(str)))
+    new = {}
+    for name, atid in specimen_dict.items():
+        new[atid.split("/")[-1]] = (name, atid)
+    for state, atid in state_dict.items():
+        new.setdefault(atid.split("/")[-1], (state_names.get(state), atid))
+
+    old = {}
+    if previous is not None:
+        rows = previous[previous.name.astype(str).isin(rebuild | removed)]
+        for name, specimen, state in zip(rows.name.astype(str), rows.specimen_uuid.astype(str),
+                                         rows.state_uuid.astype(str)):
+            old[specimen] = name
+            old[state] = name
+
+    changes = []
+    for uuid, (name, atid) in new.items():
+        changes.append({"change": "changed" if uuid in old else "added",
+                        "name": name,
+                        "uuid": uuid,
+                        "file": output_path + atid.split("/")[-2] + "/" + uuid + ".jsonld"})
+    for uuid, name in old.items():
+        if uuid not in new:
+            changes.append({"change": "removed", "name": name, "uuid": uuid, "file": None})
+    return pd.DataFrame(changes, columns=["change", "name", "uuid", "file"])
+
+
+def readChanges(manifests):
+    """
+
+    Parameters
+    ----------
+    manifests : List
+        Paths to change manifests (*_changes.csv)
+    Returns
+    -------
+    upload : List
+        Instance files that were added or changed, for upload
+    delete : List
+        UUIDs of the instances that were removed, for delete or bulkDelete
+    """
+    import pandas as pd
+    changes = [pd.read_csv(manifest) for manifest in manifests if os.path.exists(manifest)]
+    if not changes:
+        return [], []
+    changes = pd.concat(changes, ignore_index=True)
+    upload = changes.file[changes.change != "removed"].tolist()
+    delete = changes.uuid[changes.change == "removed"].tolist()
+    return upload, delete
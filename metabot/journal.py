@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+File containing the UploadJournal class, a small SQLite file that remembers
+which instances were uploaded to which space and with what content, so an
+interrupted upload can be restarted without posting everything again
+
+Classes:
+-------
+    UploadJournal :
+        record the UUID, content hash and status of uploaded instances and
+        forget deleted ones
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# Status codes after which the instance is known to be in the KG with the
+# content that was sent
+CONFIRMED = (200, 201)
+# Status code of an instance that already existed, its content in the KG is
+# unknown so it is recorded without a hash and replaced (PUT) the next time
+EXISTS = 409
+# Status codes of a deletion after which the instance is no longer in the KG
+GONE = (200, 204, 404)
+
+
+def contentHash(instance):
+    """
+    Hash of the JSON-LD content of an instance, independent of key order
+    """
+    content = json.dumps(instance, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class UploadJournal:
+    def __init__(self, path, commit_every=256):
+        """
+
+        Parameters
+        ----------
+        path : string
+            Location of the journal file, it is created if it does not exist
+        commit_every : int
+            Number of recorded or forgotten instances after which the journal
+            is written to disk, so an interrupted run loses at most this many
+        """
+        self.path = path
+        self.commit_every = commit_every
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS instances ("
+                                "uuid TEXT, space TEXT, hash TEXT, status INTEGER, "
+                                "updated REAL, PRIMARY KEY (uuid, space))")
+        self.connection.commit()
+
+    def lookup(self, space_name):
+        """
+        Return {uuid: (hash, status)} for all instances recorded for a space
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT uuid, hash, status FROM instances WHERE space = ?", (space_name,)).fetchall()
+        return {uuid: (hash, status) for uuid, hash, status in rows}
+
+    def confirmed(self, space_name):
+        """
+        Return {uuid: hash} for the instances that are known to be in the KG,
+        the hash is None for instances that already existed when they were
+        posted
+        """
+        return {uuid: hash for uuid, (hash, status) in self.lookup(space_name).items()
+                if status in CONFIRMED or status == EXISTS}
+
+    def record(self, uuid, space_name, hash, status):
+        with self.lock:
+            if status == EXISTS:
+                hash = None
+            # Keep the hash of the content that is in the KG if the upload failed
+            elif status not in CONFIRMED:
+                row = self.connection.execute(
+                    "SELECT hash, status FROM instances WHERE uuid = ? AND space = ?",
+                    (uuid, space_name)).fetchone()
+                if row is not None and (row[1] in CONFIRMED or row[1] == EXISTS):
+                    hash = row[0]
+                    status = row[1]
+            self.connection.execute("INSERT OR REPLACE INTO instances VALUES (?, ?, ?, ?, ?)",
+                                    (uuid, space_name, hash, status, time.time()))
+            self._changed()
+
+    def forget(self, uuid, space_name):
+        """
+        Remove an instance that was deleted from the KG, so the next upload
+        posts it again
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM instances WHERE uuid = ? AND space = ?", (uuid, space_name))
+            self._changed()
+
+    def _changed(self):
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.connection.commit()
+            self.pending = 0
+
+    def commit(self):
+        with self.lock:
+            self.connection.commit()
+            self.pending = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
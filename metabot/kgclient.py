@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+File containing the KGClient class, a small client for the EBRAINS Knowledge
+Graph API that is shared by the upload, delete and add2dsv methods of the
+openMINDS_wrapper
+
+Classes:
+-------
+    RateLimiter :
+        limit the number of requests per second for each host
+    TokenRejected :
+        raised once the KG has rejected the token too often
+    KGClient :
+        send requests to the KG over a pooled session, one after another or
+        concurrently with a pool of worker threads, retrying transient errors
+        and keeping a table of the requests that failed
+"""
+
+import collections
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from .log import logger
+
+KG_URL = "https://core.kg.ebrains.eu/v3-beta/instances/"
+KG_PREFIX = "https://kg.ebrains.eu/api/instances/"
+
+# Responses that are worth trying again after a while
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+STATUS_MESSAGES = {401: "Token not valid, authorisation not successful",
+                   404: "Instance not found",
+                   409: "Instance already exists",
+                   429: "Too many requests",
+                   503: "Service unavailable"}
+
+
+class RateLimiter:
+    """
+    Spread requests evenly so that no host receives more than `rate`
+    requests per second. A rate of None disables the limit.
+    """
+
+    def __init__(self, rate=None):
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, url):
+        if not self.rate:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + 1.0 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class TokenRejected(Exception):
+    pass
+
+
+def retryAfter(response):
+    """
+    Number of seconds the server asked us to wait (Retry-After header), or None
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class KGClient:
+    def __init__(self, token, space_name=None, kg_url=KG_URL, workers=8, rate=None,
+                 retries=5, backoff=1.0, max_backoff=60.0, max_unauthorized=3, timeout=60, stats=None):
+        """
+
+        Parameters
+        ----------
+        token : string
+            Authorisation token to get access to the KGE
+        space_name : string
+            Space the requests are sent to, e.g. "dataset", "common", etc.
+        kg_url : string
+            Instances endpoint of the KG API, change this to point the client
+            at a local test server
+        workers : int
+            Number of requests that are sent at the same time
+        rate : float
+            Maximum number of requests per second for each host (None for no
+            limit)
+        retries : int
+            Number of times a request is repeated after a 429 or 5xx response
+            or a connection error
+        backoff : float
+            Base of the exponential backoff in seconds, the waiting time is
+            random between 0 and backoff * 2^attempt (at most max_backoff),
+            unless the server sends a Retry-After header
+        max_backoff : float
+            Longest time to wait between two attempts in seconds
+        max_unauthorized : int
+            After this many 401 responses in a row the token is considered dead
+            and the remaining requests are not sent anymore
+        timeout : float
+            Timeout of a single request in seconds
+        stats : RunStats
+            If given, the status code and latency of every attempt are added
+            to its request histogram
+        """
+        import requests
+        self.space_name = space_name
+        self.kg_url = kg_url if kg_url.endswith("/") else kg_url + "/"
+        self.workers = max(1, int(workers))
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_unauthorized = max_unauthorized
+        self.timeout = timeout
+        self.stats = stats
+
+        self.lock = threading.Lock()
+        self.unauthorized = 0
+        self.failures = []
+
+        # One session for all requests so the connections (and TLS handshakes)
+        # are reused, with a connection pool that is large enough for all workers
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"accept": "*/*",
+                                     "Authorization": "Bearer " + token})
+
+    def request(self, method, uuid, json=None, params=None, failMissing=False):
+        """
+        Send one request for the instance with the given UUID, retrying 429
+        and 5xx responses and connection errors. Failed requests are added to
+        the failure table. Raises TokenRejected if the token is dead. Query
+        parameters given with params are sent together with the space. A 404 on
+        GET only answers whether an instance exists and is not a failure,
+        unless failMissing is True.
+        """
+        import requests
+        url = self.kg_url + uuid
+        query = {"space": self.space_name} if self.space_name else {}
+        query.update(params or {})
+        attempt = 0
+        while True:
+            if self.unauthorized >= self.max_unauthorized:
+                self._fail(method, uuid, None, "Not sent, the token was rejected", attempt)
+                raise TokenRejected("The KG rejected the token " + str(self.unauthorized) + " times in a row")
+
+            self.limiter.wait(url)
+            wait = None
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, json=json, params=query,
+                                                timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if self.stats is not None:
+                    self.stats.request(method, None, time.perf_counter() - started)
+                if attempt >= self.retries:
+                    self._fail(method, uuid, None, str(error), attempt + 1)
+                    raise
+            except requests.RequestException as error:
+                self._fail(method, uuid, None, str(error), attempt + 1)
+                raise
+            else:
+                if self.stats is not None:
+                    self.stats.request(method, response.status_code, time.perf_counter() - started)
+                with self.lock:
+                    self.unauthorized = self.unauthorized + 1 if response.status_code == 401 else 0
+                if response.status_code not in RETRY_STATUS or attempt >= self.retries:
+                    missing = method == "GET" and response.status_code == 404 and not failMissing
+                    if response.status_code >= 300 and not missing:
+                        self._fail(method, uuid, response.status_code,
+                                   STATUS_MESSAGES.get(response.status_code, response.reason), attempt + 1)
+                    return response
+                wait = retryAfter(response)
+
+            if wait is None:
+                wait = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            time.sleep(min(wait, self.max_backoff))
+            attempt += 1
+
+    def _fail(self, method, uuid, status, message, attempts):
+        with self.lock:
+            self.failures.append({"uuid": uuid, "method": method, "status": status,
+                                  "message": message, "attempts": attempts})
+
+    def failureTable(self):
+        """
+        Return a DataFrame with one row per failed request (uuid, method,
+        status, message, attempts)
+        """
+        import pandas as pd
+        with self.lock:
+            return pd.DataFrame(self.failures, columns=["uuid", "method", "status", "message", "attempts"])
+
+    def summary(self, total):
+        """
+        Log a short summary of the requests that did not succeed
+        """
+        import pandas as pd
+        failures = self.failureTable()
+        message = str(total - len(failures)) + "/" + str(total) + " requests succeeded"
+        if not len(failures):
+            logger.info(message, extra={"done": total, "total": total})
+            return failures
+        status = failures.status.map(lambda code: "error" if pd.isnull(code) else str(int(code)))
+        counts = failures.groupby([status, failures.message], sort=False).size()
+        lines = ["  " + str(number) + " x " + str(status) + ": " + str(text)
+                 for (status, text), number in counts.items()]
+        logger.warning(message + "\n" + "\n".join(lines),
+                       extra={"done": total - len(failures), "total": total,
+                              "counts": {str(status) + ": " + str(text): int(number)
+                                         for (status, text), number in counts.items()}})
+        return failures
+
+    def map(self, method, uuids, instances=None, callback=None, params=None, failMissing=False):
+        """
+        Send one request per UUID using the worker pool
+
+        Parameters
+        ----------
+        method : string or List
+            HTTP method, e.g. "POST", "DELETE", or one method per UUID
+        uuids : List
+            UUIDs of the instances
+        instances : List
+            JSON body for each UUID (None to send no body)
+        callback : function
+            Called as callback(uuid, response) as soon as a request returns
+        params : dictionary
+            Query parameters sent together with the space
+        failMissing : boolean
+            If True, a 404 on GET is added to the failure table
+        Returns
+        -------
+        response : dictionary
+            The response for each UUID, in the order of uuids. Requests that
+            could not be sent (connection errors, dead token) give None
+        """
+        if instances is None:
+            instances = [None] * len(uuids)
+        if isinstance(method, str):
+            methods = [method] * len(uuids)
+        else:
+            methods = method
+
+        return self.stream(zip(methods, uuids, instances), prefetch=len(uuids),
+                           callback=callback, params=params, failMissing=failMissing)
+
+    def stream(self, items, prefetch=64, callback=None, params=None, failMissing=False):
+        """
+        Send the (method, uuid, instance) requests of an iterable (e.g. a
+        generator) using the worker pool. The next request is only taken from
+        the iterable when fewer than prefetch requests are waiting for an
+        answer, so the iterable is consumed as fast as the KG answers.
+
+        Returns
+        -------
+        response : dictionary
+            The response for each UUID, in the order of the requests
+        """
+        prefetch = max(prefetch, self.workers)
+        response = {}
+        pending = collections.deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for method, uuid, instance in items:
+                pending.append((uuid, pool.submit(self._send, method, uuid, instance, callback, params,
+                                                  failMissing)))
+                while len(pending) >= prefetch:
+                    uuid, future = pending.popleft()
+                    response[uuid] = future.result()
+            while pending:
+                uuid, future = pending.popleft()
+                response[uuid] = future.result()
+
+        return response
+
+    def _send(self, method, uuid, instance, callback, params, failMissing):
+        import requests
+        try:
+            result = self.request(method, uuid, json=instance, params=params, failMissing=failMissing)
+        except (requests.RequestException, TokenRejected):
+            return None
+        if callback is not None:
+            callback(uuid, result)
+        return result
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Logging of MetaBot. All messages go through the "metabot" logger, by default
+as plain lines on the standard output like the print calls they replace. The
+notices the builders used to print for every row ("No remarks added") are
+counted and logged once per sheet, and uploads and deletions log their
+progress and rate every few seconds instead of a line per instance. With
+verbosity "debug" every notice is logged with the specimen it belongs to,
+with "quiet" only errors are logged.
+
+Classes:
+-------
+    JsonFormatter :
+        format log records as JSON lines
+    Notices :
+        count the notices of a sheet
+    Progress :
+        log the progress and rate of a long task
+Functions:
+-------
+    setVerbosity :
+        set the level and format of the MetaBot log
+    reportNotices :
+        log how often every notice was given
+"""
+
+import itertools
+import json
+import logging
+import sys
+import threading
+import time
+
+logger = logging.getLogger("metabot")
+
+VERBOSITY = {"debug": logging.DEBUG, "info": logging.INFO, "warning": logging.WARNING,
+             "quiet": logging.ERROR}
+
+# Seconds between two progress messages
+PROGRESS_INTERVAL = 2.0
+
+
+class _StdoutHandler(logging.StreamHandler):
+    # Always the current standard output, so redirecting it (as notebooks and
+    # contextlib.redirect_stdout do) also redirects the log
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        """
+        One JSON object per record with the time, level and message, and the
+        counts or progress (done, total, rate) of the record if it has them
+        """
+        data = {"time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage()}
+        for key in ["counts", "done", "total", "rate"]:
+            if hasattr(record, key):
+                data[key] = getattr(record, key)
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data)
+
+
+def setVerbosity(verbosity="info", logFormat="text"):
+    """
+
+    Parameters
+    ----------
+    verbosity : string or int
+        "debug", "info", "warning" or "quiet" (only errors), or a logging
+        level
+    logFormat : string
+        "text" for plain lines or "json" for one JSON object per line. The
+        log is written to the standard output unless the application set up
+        logging itself (a handler on the "metabot" or the root logger), then
+        only the level is set
+    """
+    level = VERBOSITY.get(verbosity, verbosity)
+    if not isinstance(level, int):
+        raise ValueError("Unknown verbosity " + str(verbosity) + ", use one of " + ", ".join(VERBOSITY))
+    if logFormat not in ["text", "json"]:
+        raise ValueError("Unknown log format " + str(logFormat) + ", use text or json")
+
+    logger.setLevel(level)
+    handlers = [handler for handler in logger.handlers if isinstance(handler, _StdoutHandler)]
+    if not logger.handlers and not logging.getLogger().handlers:
+        handler = _StdoutHandler()
+        logger.addHandler(handler)
+        logger.propagate = False
+        handlers = [handler]
+    for handler in handlers:
+        handler.setFormatter(JsonFormatter() if logFormat == "json" else logging.Formatter("%(message)s"))
+
+
+class Notices:
+    def __init__(self):
+        """
+        Counts of the notices of one sheet. Counting costs one dictionary
+        update, the notices are only logged one by one with verbosity "debug"
+        """
+        self.counts = {}
+        self.debug = logger.isEnabledFor(logging.DEBUG)
+
+    def add(self, message, name=None):
+        self.counts[message] = self.counts.get(message, 0) + 1
+        if self.debug:
+            logger.debug(message if name is None else message + " (" + str(name) + ")")
+
+
+def reportNotices(counts, what):
+    """
+    Log how often every notice was given (counts of Notices), what is e.g.
+    "the subject sheet"
+    """
+    if not counts or not logger.isEnabledFor(logging.INFO):
+        return
+    lines = ["  " + str(number) + " x " + message for message, number in counts.items()]
+    logger.info("Notices for " + what + ":\n" + "\n".join(lines), extra={"counts": dict(counts)})
+
+
+class Progress:
+    def __init__(self, total, what, interval=PROGRESS_INTERVAL):
+        """
+
+        Parameters
+        ----------
+        total : int
+            Number of steps of the task
+        what : string
+            Description of a step, e.g. "Posted instance"
+        interval : float
+            Seconds between two progress messages
+        """
+        self.total = total
+        self.what = what
+        self.interval = interval
+        self.enabled = logger.isEnabledFor(logging.INFO)
+        self.count = itertools.count(1)
+        self.done = 0
+        self.start = self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def update(self):
+        """
+        One step is done, can be called from several threads
+        """
+        done = self.done = next(self.count)
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if now - self.last >= self.interval or done == self.total:
+            with self.lock:
+                if now - self.last >= self.interval or done == self.total:
+                    self.last = now
+                    self._log(done, now)
+
+    def skip(self):
+        """
+        One step is not needed after all (e.g. an instance the upload journal
+        skips), the total becomes one smaller
+        """
+        with self.lock:
+            self.total -= 1
+            if self.enabled and self.done and self.done == self.total:
+                self.last = time.monotonic()
+                self._log(self.done, self.last)
+
+    def _log(self, done, now):
+        elapsed = now - self.start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        logger.info(self.what + " " + str(done) + "/" + str(self.total) + " ({:.1f}/s)".format(rate),
+                    extra={"done": done, "total": self.total, "rate": round(rate, 1)})
@@ -9,12 +9,16 @@ Methods:
         import subject metadata from JSON file
     importSubjectsFromCSV : 
         import subject metadata from CSV file
+    importSubjectsFromParquet :
+        import subject metadata from Parquet file
     mergeInfo : 
         merge subject and sample metadata
     makeSubjectCollections : 
         create subject and subject state instances
     makeSampleCollections : 
         create sample and sample state instances
+    makeSpecimenCollections :
+        create the instances of all levels of a specimen sheet
     upload : 
         upload instances to KGE
     delete : 
@@ -22,89 +26,625 @@ Methods:
 @author: mvanswieten
 """
 
+import collections
+import itertools
 import json
-import openMINDS
-import openMINDS.version_manager
-import pandas as pd
-import requests
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .emitter import JsonLdCollection, Records, addInstance, deterministicUUID, makeNamespace
+from .incremental import changeManifest, compareSheet, previousIds, rowHashes
+from .kgclient import KGClient, KG_PREFIX, KG_URL
+from .journal import GONE, UploadJournal, contentHash
+from .log import Notices, Progress, logger, reportNotices, setVerbosity
+from .normalize import normalizeInstance
+from .pack import PackReader, PackWriter, mergePack, packFile
+from .profiling import RunStats, Timer, timed
+from .overview import addIds, overviewFile, readOverview, saveOverview
+from .pipeline import SUBJECT_TYPES, planLevels, specimenParents
+from .readers import mergeInfo, readChunks, readSheet
+from .scheduler import dependencyWaves, referencedUUIDs
+from .sink import MANIFEST, InstanceWriter, manifestFiles, updateManifest
+from .schemas import createCollection, loadHelper
+from .terms import defaultResolver
+from .validate import validateSheet
+
+# Compression of the pack for each packed output
+PACKED = {None: None, "jsonl": None, "gzip": "gzip", "zstd": "zstd"}
 
 class openMINDS_wrapper:
-    def __init__(self):
-        openMINDS.version_manager.init()
-        openMINDS.version_manager.version_selection("v3")
-        self.helper = openMINDS.Helper()
+    def __init__(self, snapshot=None, version="v3", update=False, emitter="openMINDS", namespace=None,
+                 overview="csv", writers=8, packed=None, verbosity=None, logFormat="text"):
+        """
+
+        Parameters
+        ----------
+        snapshot : string
+            Location of a snapshot of the openMINDS instances (see
+            terms.downloadSnapshot) used to check the controlled terms and
+            brain regions. By default the snapshot in the user cache is used
+            if there is one
+        version : string
+            openMINDS version used to create the instances
+        update : boolean
+            Pull the latest openMINDS schemas before the first collection is
+            created. By default they are only downloaded if they are missing
+        emitter : string
+            "openMINDS" to create the instances with the openMINDS package, or
+            "jsonld" to write them directly as JSON-LD (faster, checked
+            against the openMINDS package with benchmarks/bench_emitter.py)
+        namespace : string or UUID
+            If given, the UUIDs of new instances are derived from this
+            namespace (e.g. the name of the project) and the type, name,
+            timePoint and timePointName of the specimen, so running the same
+            sheet again gives the same instances and files. By default every
+            run makes new random UUIDs
+        overview : string
+            Format of the overview files (<type>_created.csv) saved next to
+            the instances: "csv", or "parquet" or "feather" (need pyarrow)
+            with the same column types for every sheet
+        writers : int
+            Number of threads that write the instance files, every file is
+            written to a temporary file first and then renamed. The files are
+            listed in manifest.csv in the output folder
+        packed : string
+            If given, all instances are written to one JSON-lines file in the
+            output folder instead of one file per instance: "jsonl"
+            (instances.jsonl), "gzip" (instances.jsonl.gz) or "zstd"
+            (instances.jsonl.zst, needs zstandard), with an index of the
+            UUIDs (instances.index.csv). upload, delete and bulkDelete read
+            the output folder or the pack directly
+        verbosity : string
+            "debug" (every notice and instance), "info", "warning" or "quiet"
+            (only errors), see log.setVerbosity. It is set for the "metabot"
+            logger, so for all wrappers. By default the verbosity is left as
+            it is, and "info" if it was never set
+        logFormat : string
+            "text" for plain lines or "json" for one JSON object per line
+        """
+        self.version = version
+        self.update = update
+        self.emitter = emitter
+        self.namespace = makeNamespace(namespace)
+        self.overview = overview
+        self.writers = writers
+        if packed not in PACKED:
+            raise ValueError("Unknown packed output " + str(packed) + ", use None, jsonl, gzip or zstd")
+        self.packed = packed
+        self._helper = None
+        self.terms = defaultResolver(snapshot)
+        self.failures = None
+        # Timings of the stages of the run, see profile and saveReport
+        self.stats = RunStats()
+        if verbosity is not None or logger.level == logging.NOTSET:
+            setVerbosity(verbosity or "info", logFormat)
+
+    @property
+    def helper(self):
+        # openMINDS is only loaded when the first collection is created, so
+        # upload, delete and add2dsv do not have to wait for it
+        if self._helper is None:
+            self._helper = loadHelper(self.version, self.update)
+        return self._helper
+
+    def _uuid(self, *identity):
+        if self.namespace is None:
+            return None
+        return deterministicUUID(self.namespace, *identity)
+
+    def _writer(self, output_path):
+        if self.packed:
+            return PackWriter(output_path, PACKED[self.packed])
+        return InstanceWriter(output_path, self.writers)
+
+    def _commitFiles(self, output_path, entries, removed=()):
+        # List the written instances in the manifest or the index of the pack
+        with self.stats.stage("manifest"):
+            if self.packed:
+                mergePack(output_path, entries, removed, PACKED[self.packed])
+            else:
+                updateManifest(output_path, entries, removed)
+
+    def _collection(self):
+        if self.emitter == "openMINDS":
+            return createCollection(self.helper)
+        return JsonLdCollection()
     
+    def profile(self, cpu=True, memory=False, top=30, profileFile=None):
+        """
+
+        Parameters
+        ----------
+        cpu : boolean
+            Profile the calls in the with block with cProfile (the thread
+            that calls them, not the writer threads and worker processes)
+        memory : boolean
+            Trace the memory allocations with tracemalloc
+        top : int
+            Number of functions and lines that are kept in the report
+        profileFile : string
+            If given, the cProfile statistics are also saved to this file
+        Returns
+        -------
+        capture : context manager
+            Use as "with wrapper.profile():", the profiles are added to the
+            report of saveReport
+        """
+        return self.stats.capture(cpu, memory, top, profileFile)
+
+    def saveReport(self, filename=None, reset=False):
+        """
+
+        Parameters
+        ----------
+        filename : string
+            Location of the JSON report, if None it is only returned
+        reset : boolean
+            Start a new run after the report, by default the stages of all
+            calls since the wrapper was made (or the last reset) are added up
+        Returns
+        -------
+        report : dictionary
+            The wall and CPU time of every stage (calls, wall, cpu in
+            seconds), the number of instances of every type that were
+            created, the requests to the KG by status code (count, latency
+            and a histogram with the upper bounds of latencyBuckets) and the
+            profiles of profile
+        """
+        report = self.stats.report()
+        if filename is not None:
+            with open(filename, "w") as f:
+                json.dump(report, f, indent=2)
+        if reset:
+            self.stats.reset()
+        return report
+
+    @timed("findGroup")
     def findGroup(self, df, group_data):
+        """
+
+        Parameters
+        ----------
+        df : Pandas DataFrame
+            DataFrame containing the metadata of the specimen that are part of,
+            or descended from, the specimen in group_data
+        group_data : Pandas DataFrame
+            DataFrame returned by makeSubjectCollections or makeSampleCollections
+            for the parent specimen
+        Returns
+        -------
+        df : Pandas DataFrame
+            DataFrame with the isPartOf_uuid and descendedFrom_uuid columns
+            filled in. Multiple parents (separated by a comma) are stored as
+            comma separated UUIDs
+        """
 
-        groupState = group_data.timePointName.to_list()
-        groupName = group_data.name.to_list()
+        # Build the name -> uuid indices once, the first occurrence of a name wins
+        groupName = self._buildIndex(group_data.name, group_data.specimen_uuid)
+        groupState = self._buildIndex(group_data.timePointName, group_data.state_uuid)
+
+        unresolved = []
+        for column, index in [("isPartOf", groupName), ("descendedFrom", groupState)]:
+            resolved, missing = self._resolveReferences(df[column], index)
+            unresolved += [(column, ref) for ref in missing]
+            if resolved.empty:
+                continue
+            if not column + '_uuid' in df.columns:
+                df.insert(0, column + '_uuid', '')
+            df.loc[resolved.index, column + '_uuid'] = resolved
+
+        if unresolved:
+            logger.warning(str(len(unresolved)) + " reference(s) could not be resolved:\n"
+                           + "\n".join(column + ": " + str(ref) for column, ref in unresolved))
 
-        for i in range(len(df)):
-            if df.isPartOf[i] in groupName:
-                idx = groupName.index(df.isPartOf[i])
-                if not 'isPartOf_uuid' in df.columns:
-                    df.insert(i, 'isPartOf_uuid', '')
-                df.loc[i, "isPartOf_uuid"] = group_data.specimen_uuid[idx]
-        
-        for i in range(len(df)):
-            if df.descendedFrom[i] in groupState:
-                idx = groupState.index(df.descendedFrom[i])
-                if not 'descendedFrom_uuid' in df.columns:
-                    df.insert(i, 'descendedFrom_uuid', '')
-                df.loc[i, "descendedFrom_uuid"] = group_data.state_uuid[idx]
-        
         return df
 
+    def _buildIndex(self, keys, uuids):
+        """
+        Map each (non-empty) key to its uuid, keeping the first occurrence
+        """
+        import pandas as pd
+        index = pd.Series(uuids.to_numpy(), index=keys.to_numpy())
+        index = index[index.index.notnull()]
+        return index[~index.index.duplicated(keep='first')]
+
+    def _resolveReferences(self, references, index):
+        """
+        Resolve a column of (comma separated) references against an index in
+        one join. Returns the joined uuids per row and the unique references
+        that are not in the index.
+        """
+        references = references.dropna()
+        parents = references.map(lambda ref: [part.strip() for part in ref.split(",")]
+                                 if isinstance(ref, str) else [ref]).explode()
+        uuids = parents.map(index)
+
+        missing = parents[uuids.isnull()].unique().tolist()
+        resolved = uuids.dropna().astype(str).groupby(level=0, sort=False).agg(", ".join)
+        return resolved, missing
+
+    def _splitUUIDs(self, uuids):
+        """
+        The comma separated UUIDs of an isPartOf_uuid or descendedFrom_uuid
+        cell, empty cells and UUIDs (parents that were not found) are left out
+        """
+        if not isinstance(uuids, str):
+            return []
+        return [uuid.strip() for uuid in uuids.split(",") if uuid.strip()]
+
+    def _uuidLinks(self, uuids):
+        return [{"@id": KG_PREFIX + uuid} for uuid in self._splitUUIDs(uuids)]
+
+    def _splitSpecimens(self, df, uniqueStates=False):
+        """
+        Split the sheet once into one block of state rows per specimen, in the
+        order in which the specimen first appear, and yield (name, block)
+        pairs. The blocks are Records (columns of plain Python values). With
+        uniqueStates only the first row of each timePointName is kept.
+        """
+        import numpy as np
+        import pandas as pd
+        if uniqueStates:
+            df = df.drop_duplicates(['name', 'timePointName'], keep='first')
+
+        # Sort the row positions by specimen once and cut the blocks from it
+        codes, names = pd.factorize(df.name, use_na_sentinel=False)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+
+        blocks = (order[bounds[i]:bounds[i + 1]] for i in range(len(names)))
+        yield from zip(names, Records.split(df, blocks))
+
+    def _buildSheet(self, build, df, blocks, output_path, filename, singleCollection=False, workers=1,
+                    incremental=False):
+        """
+        Create the specimen of a sheet with build, or in incremental mode only
+        the specimen that changed since the overview file of the previous run.
+        Returns the @ids of all specimen and states by name and the row hashes.
+        The files that were written are added to the manifest of output_path.
+        """
+        hashes = rowHashes(df)
+        sheet = "the " + os.path.basename(filename).rsplit("_created", 1)[0] + " sheet"
+        if not incremental:
+            specimen_dict, state_dict, entries, notices = self._buildSpecimens(build, blocks, output_path,
+                                                                               singleCollection, workers)
+            self._commitFiles(output_path, entries)
+            reportNotices(notices, sheet)
+            return specimen_dict, state_dict, hashes
+
+        previous = readOverview(filename, anyFormat=True)
+        rebuild, removed = compareSheet(df, hashes, previous)
+        logger.info(str(len(rebuild)) + " new or changed and " + str(len(removed))
+                    + " removed specimen since the previous run",
+                    extra={"counts": {"changed": len(rebuild), "removed": len(removed)}})
+
+        blocks = ((name, block) for name, block in blocks if str(name) in rebuild)
+        specimen_dict, state_dict, entries, notices = self._buildSpecimens(build, blocks, output_path,
+                                                                           singleCollection, workers)
+        reportNotices(notices, sheet)
+
+        changes = changeManifest(df, previous, rebuild, removed, specimen_dict, state_dict, output_path)
+        changes.to_csv(filename.rsplit("_created", 1)[0] + "_changes.csv", index=False)
+        self._commitFiles(output_path, entries, changes.uuid[changes.change == "removed"])
+
+        # The unchanged specimen keep the instances of the previous run
+        if previous is not None:
+            unchanged = set(df.name.astype(str)) - rebuild
+            kept_specimen, kept_state = previousIds(previous, unchanged)
+            specimen_dict.update(kept_specimen)
+            state_dict.update(kept_state)
+        return specimen_dict, state_dict, hashes
+
+    def _buildSpecimens(self, build, blocks, output_path, singleCollection=False, workers=1):
+        """
+        Run build (_buildSubjects or _buildSamples) over the specimen blocks,
+        in this process or split over a pool of worker processes, and merge
+        the @ids of the specimen and states they created, the manifest
+        entries of their files and the counts of their notices
+        """
+        if workers is None or workers <= 1:
+            return build(blocks, output_path, singleCollection)
+
+        # A few parts per worker so a slow part does not hold up the others
+        blocks = list(blocks)
+        size = max(1, -(-len(blocks) // (workers * 4)))
+        parts = [blocks[i:i + size] for i in range(0, len(blocks), size)]
+
+        specimen_dict = {}
+        state_dict = {}
+        entries = []
+        notices = collections.Counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # The results are merged in the order of the sheet
+            for specimens, states, files, counts, report in pool.map(self._buildPart, itertools.repeat(build.__name__),
+                                                                     parts, itertools.repeat(output_path),
+                                                                     itertools.repeat(singleCollection)):
+                specimen_dict.update(specimens)
+                state_dict.update(states)
+                entries += files
+                notices.update(counts)
+                self.stats.merge(report)
+        return specimen_dict, state_dict, entries, dict(notices)
+
+    def _buildPart(self, build, blocks, output_path, singleCollection):
+        # Runs in a worker process with its own (empty) stats, build is the
+        # name of the method so it uses the same copy of the wrapper
+        return getattr(self, build)(blocks, output_path, singleCollection) + (self.stats.report(),)
+
+    def __getstate__(self):
+        # The openMINDS Helper can not be sent to a worker process, the
+        # workers load their own when they need it
+        state = self.__dict__.copy()
+        state["_helper"] = None
+        return state
 
-    def makeSubjectCollections(self, df, output_path):
+    def importSubjectsFromCSV(self, fname, chunksize=None):
+        """
+
+        Parameters
+        ----------
+        fname : string
+            Location of a CSV (or tab separated .tsv) file with specimen
+            metadata, with the columns of the specimen template
+        chunksize : int
+            If given, the file is read in chunks of about this many rows that
+            hold whole specimen (see readers.readChunks)
+        Returns
+        -------
+        df : Pandas DataFrame
+            DataFrame containing specimen metadata, or an iterator of
+            DataFrames if chunksize is given
+        """
+        if chunksize:
+            return self.stats.iterate("read", readChunks(fname, chunksize))
+        with self.stats.stage("read"):
+            return readSheet(fname)
+
+    def importSubjectsFromJSON(self, fname, chunksize=None):
+        """
+
+        Parameters
+        ----------
+        fname : string
+            Location of a JSON file (a list of rows) or JSON-lines file (.jsonl
+            or .ndjson, one row per line) with specimen metadata
+        chunksize : int
+            If given, the file is read in chunks of about this many rows that
+            hold whole specimen (see readers.readChunks)
+        Returns
+        -------
+        df : Pandas DataFrame
+            DataFrame containing specimen metadata, or an iterator of
+            DataFrames if chunksize is given
+        """
+        if chunksize:
+            return self.stats.iterate("read", readChunks(fname, chunksize))
+        with self.stats.stage("read"):
+            return readSheet(fname)
+
+    def importSubjectsFromParquet(self, fname, chunksize=None):
+        """
+
+        Parameters
+        ----------
+        fname : string
+            Location of a Parquet file with specimen metadata (needs pyarrow)
+        chunksize : int
+            If given, the file is read in chunks of about this many rows that
+            hold whole specimen (see readers.readChunks)
+        Returns
+        -------
+        df : Pandas DataFrame
+            DataFrame containing specimen metadata, or an iterator of
+            DataFrames if chunksize is given
+        """
+        if chunksize:
+            return self.stats.iterate("read", readChunks(fname, chunksize))
+        with self.stats.stage("read"):
+            return readSheet(fname)
+
+    def mergeInfo(self, subject_info, sample_info):
+        """
+
+        Parameters
+        ----------
+        subject_info : Pandas DataFrame
+            DataFrame containing subject (and subject group) metadata
+        sample_info : Pandas DataFrame
+            DataFrame containing sample metadata
+        Returns
+        -------
+        df : Pandas DataFrame
+            One specimen sheet (e.g. for makeSpecimenCollections) with the
+            subjects first. Empty strainName, strainAtid and biologicalSex
+            values of the samples are taken from the specimen they descend
+            from
+        """
+        return mergeInfo(subject_info, sample_info)
+
+    def validate(self, df):
         """
         
         Parameters
         ----------
         df : Pandas DataFrame
-            DataFrame containing subject metadata
+            DataFrame containing specimen metadata
+        Returns
+        -------
+        errors : Pandas DataFrame
+            One row per mistake in the sheet (row, name, column, value,
+            message and level). Instances can be created if none of the
+            mistakes has level "error", "warning" mistakes are allowed
+        """
+        parsed, errors = validateSheet(df, self.terms)
+        if len(errors):
+            logger.warning(str(len(errors)) + " mistake(s) found in the sheet:\n" + errors.to_string(index=False))
+        return errors
+
+    def _validated(self, df, validated=False):
+        """
+        Validate and parse the sheet, stop before anything is created if it
+        contains errors, warnings are only logged. A sheet that was validated
+        before is only parsed
+        """
+        if validated:
+            with self.stats.stage("parse"):
+                return validateSheet(df, self.terms, check=False)[0]
+        with self.stats.stage("validate"):
+            parsed, errors = validateSheet(df, self.terms)
+        warnings = errors[errors["level"] == "warning"]
+        errors = errors[errors["level"] == "error"]
+        if len(warnings):
+            logger.warning(str(len(warnings)) + " warning(s) for the sheet:\n" + warnings.to_string(index=False))
+        if len(errors):
+            logger.error(str(len(errors)) + " mistake(s) found in the sheet:\n" + errors.to_string(index=False))
+            raise ValueError("The sheet contains " + str(len(errors)) + " mistake(s), no instances were created")
+        return parsed
+
+    def _makeChunks(self, make, chunks, output_path, singleCollection=False, workers=1, incremental=False,
+                    validated=False):
+        """
+        Create the chunks of a sheet one by one with make (makeSubjectCollections
+        or makeSampleCollections) and save one overview file for all of them
+        """
+        import pandas as pd
+        if incremental:
+            raise ValueError("An incremental run needs the whole sheet, it can not be created in chunks")
+
+        data = []
+        for chunk in chunks:
+            data.append(make(chunk, output_path, singleCollection, workers, validated=validated))
+        if not data:
+            return pd.DataFrame()
+
+        # Every chunk overwrote the overview file, save it again for all chunks
+        data = pd.concat(data, ignore_index=True)
+        specimenType = data.specimenType.iloc[-1]
+        with self.stats.stage("overview"):
+            saveOverview(data, overviewFile(output_path, specimenType, self.overview))
+        return data
+
+    @timed("makeSubjectCollections")
+    def makeSubjectCollections(self, df, output_path, singleCollection=False, workers=1,
+                               incremental=False, validated=False):
+        """
+        
+        Parameters
+        ----------
+        df : Pandas DataFrame
+            DataFrame containing subject metadata, or an iterator of DataFrames
+            (e.g. readers.readChunks) that are created one by one with one
+            overview file for all of them
         output_path : string
             Location files should be saved in
+        singleCollection : boolean
+            If True, all instances of the sheet are stored in one collection
+            that is saved once at the end. By default one collection is saved
+            per subject (including all its states)
+        workers : int
+            Number of processes that create the instances, each process
+            creates and saves the instances of a part of the specimen. On
+            Windows and macOS the calling script needs an
+            if __name__ == "__main__": guard for workers > 1
+        incremental : boolean
+            If True, the sheet is compared with the overview file of the
+            previous run in output_path (using the row_hash column) and only
+            new and changed specimen are created again, the other specimen
+            keep their instances. The added, changed and removed instances
+            are listed in <specimenType>_changes.csv
+        validated : boolean
+            If True, the sheet was already checked (e.g. by
+            makeSpecimenCollections for the whole sheet) and is only parsed
         Returns
         -------
         data : Pandas DataFrame
             DataFrame containing subject metadata including information about 
             the newly generated instances
         """
+        import pandas as pd
+        output_path = os.path.join(output_path, "")
+        if not isinstance(df, pd.DataFrame):
+            return self._makeChunks(self.makeSubjectCollections, df, output_path, singleCollection, workers,
+                                    incremental, validated)
+
+        # Check the whole sheet before any instance is created
+        parsed = self._validated(df, validated)
+
+        # The overview is named after the type of the last subject
+        specimenType = parsed.specimenType[parsed.name == parsed.name.drop_duplicates().iloc[-1]].iloc[0]
+        filename = overviewFile(output_path, specimenType, self.overview)
+
+        blocks = self._splitSpecimens(parsed, uniqueStates=True)
+        subject_dict, state_dict, hashes = self._buildSheet(self._buildSubjects, df, blocks, output_path,
+                                                            filename, singleCollection, workers, incremental)
+
+        # The UUID columns are added to a copy, df is not changed. The row
+        # hashes are kept for the next incremental run
+        with self.stats.stage("overview"):
+            data = addIds(df, subject_dict, state_dict, hashes)
+            saveOverview(data, filename)
+
+        return data
+
+    def _buildSubjects(self, blocks, output_path, singleCollection=False):
+        """
+        Create and save the subjects and subject states of (name, Records)
+        blocks, returns the @ids of the subjects and states by name, the
+        manifest entries of the files that were written and the counts of the
+        notices
+        """
+        import pandas as pd
         kg_prefix = "https://kg.ebrains.eu/api/instances/"
-        data = df
-        
-        uniqueSubs = df.name.unique()
+        terms = self.terms
+        writer = self._writer(output_path)
 
         state_dict = {}
-        subject_dict = {} 
-        for sub in range(len(uniqueSubs)):
-            
-            # Print the name of the instance
-            print("\n Creating instances for subject: " + str(uniqueSubs[sub]) + "\n")
+        subject_dict = {}
+        if singleCollection:
+            mycol = self._collection()
+
+        # Notices are counted, with verbosity "debug" they are also logged per specimen
+        notices = Notices()
+        debug = notices.debug
+
+        # Time spent on creating the instances and on saving them, and the
+        # number of instances of every type
+        create = Timer()
+        save = Timer()
+        created = {}
+
+        for subject_name, stateInfo in blocks:
             
-            subject_name = str(uniqueSubs[sub])
+            create.start()
+            subject_name = str(subject_name)
+            if debug:
+                logger.debug("Creating instances for subject: " + subject_name)
+
+            # The subject information is taken from the first row of the subject
+            subjectInfo = stateInfo.row(0)
+            specimenType = subjectInfo.specimenType
                     
-            # Define the openMINDS function based on the specimenType
-            if df.specimenType[sub] == "subject" :
-                statemethod = 'add_core_subjectState'
-                subjectmethod = 'add_core_subject'
-            elif df.specimenType[sub] == "subjectGroup" :
-                statemethod = 'add_core_subjectGroupState'
-                subjectmethod = 'add_core_subjectGroup'    
+            # Define the openMINDS type based on the specimenType
+            if specimenType == "subject" :
+                statetype = 'subjectState'
+                subjecttype = 'subject'
+            elif specimenType == "subjectGroup" :
+                statetype = 'subjectGroupState'
+                subjecttype = 'subjectGroup'
         
             # # initiate the collection into which you will store all metadata instances
-            mycol = self.helper.create_collection()
+            if not singleCollection:
+                mycol = self._collection()
 
             #### Subject State ####
             
             # Create a subject state name(s) first 
-            stateInfo = df[df.name == uniqueSubs[sub]].drop_duplicates('timePointName', keep = 'first').reset_index(drop=True) 
             numberOfStates = len(stateInfo)
             stateName = []
             for state in range(numberOfStates):
                 if pd.isnull(stateInfo.timePointName[state]):
-                    print(">>> No subject state name defined, making generic one <<<")
+                    notices.add("No subject state name defined, making generic one", subject_name)
                     stateName.append(str(subject_name) + "_" + "state-0" + str(stateInfo.timePoint[state]))
                 else:
                     stateName.append(str(stateInfo.timePointName[state]))
@@ -112,173 +652,243 @@ class openMINDS_wrapper:
             # Create subject state(s)
             states = []  
             for state_num in range(len(stateName)):  
-                print("creating state " + str(stateName[state_num]) + " for subject " + str(subject_name))
-                state_dict[stateName[state_num]] = getattr(mycol, statemethod)(
-                    ageCategory = [{"@id" : "https://openminds.ebrains.eu/instances/ageCategory/" + stateInfo.ageCategory[state_num]}])    
-                mycol.get(state_dict[stateName[state_num]]).lookupLabel = stateName[state_num]
+                if debug:
+                    logger.debug("creating state " + str(stateName[state_num]) + " for subject " + subject_name)
+                stateProperties = {"ageCategory": [terms.link("ageCategory", stateInfo.ageCategory[state_num])],
+                                   "lookupLabel": stateName[state_num]}
                 
-                # If state attribute is defined, add to collection
-                attributeName = []
-                if pd.isnull(stateInfo.attribute[state_num]):
-                    print("No subject attribute defined")
-                    attribute = None
-                    mycol.get(state_dict[stateName[state_num]]).attribute = attribute
-                else:
-                    if stateInfo.attribute[state_num].find(','):
-                        for attributes in stateInfo.attribute[state_num].split(","):
-                            attributeName.append({"@id": "https://openminds.ebrains.eu/instances/subjectAttribute/" + str(attributes.strip())})
-                        mycol.get(state_dict[stateName[state_num]]).attribute = attributeName
-                        attribute = stateInfo.attribute[state_num]
-                    else:
-                        attribute = stateInfo.attribute[state_num]
-                        mycol.get(state_dict[stateName[state_num]]).attribute = [{"@id" : "https://openminds.ebrains.eu/instances/subjectAttribute/" + str(attribute)}]
-
-                states.append({"@id": kg_prefix + state_dict[stateName[state_num]].split("/")[-1]})
+                # If state attribute is defined, add to the state
+                attributeName = terms.links("subjectAttribute", stateInfo.attributeList[state_num])
+                if attributeName is None:
+                    notices.add("No subject attribute defined", stateName[state_num])
+                stateProperties["attribute"] = attributeName
 
                 # Add the age of the animal
-                if pd.isnull(stateInfo.ageValue[state_num]) and pd.isnull(stateInfo.ageUnit[state_num]):
-                    print("No age information defined")
-                elif str(stateInfo.ageValue[state_num]).find("-") != -1:
-                    ages = stateInfo.ageValue[state_num].split("-")
-                    mycol.get(state_dict[stateName[state_num]]).age = [{"@type" : "https://openminds.ebrains.eu/core/QuantitativeValueRange",
-                                                "minValueUnit" : {"@id": "https://openminds.ebrains.eu/instances/unitOfMeasurement/" + str(stateInfo.ageUnit[state_num])},
-                                                "maxValueUnit" : {"@id": "https://openminds.ebrains.eu/instances/unitOfMeasurement/" + str(stateInfo.ageUnit[state_num])}, 
-                                                "minValue" : int(ages[0].strip()),
-                                                "maxValue" : int(ages[1].strip())
+                if pd.isnull(stateInfo.ageMin[state_num]):
+                    notices.add("No age information defined", stateName[state_num])
+                elif stateInfo.ageRange[state_num]:
+                    stateProperties["age"] = [{"@type" : "https://openminds.ebrains.eu/core/QuantitativeValueRange",
+                                                "minValueUnit" : terms.link("unitOfMeasurement", stateInfo.ageUnit[state_num]),
+                                                "maxValueUnit" : terms.link("unitOfMeasurement", stateInfo.ageUnit[state_num]), 
+                                                "minValue" : int(stateInfo.ageMin[state_num]),
+                                                "maxValue" : int(stateInfo.ageMax[state_num])
                                                 }]
                 else:
-                    mycol.get(state_dict[stateName[state_num]]).age = [{"@type" : "https://openminds.ebrains.eu/core/QuantitativeValue",
-                                                                "unit" : {"@id": "https://openminds.ebrains.eu/instances/unitOfMeasurement/" + str(stateInfo.ageUnit[state_num])}, 
-                                                                "value" : int(stateInfo.ageValue[state_num])
+                    stateProperties["age"] = [{"@type" : "https://openminds.ebrains.eu/core/QuantitativeValue",
+                                                                "unit" : terms.link("unitOfMeasurement", stateInfo.ageUnit[state_num]), 
+                                                                "value" : int(stateInfo.ageMin[state_num])
                                                             }]
                 
                 #add the weight of the animal
-                if pd.isnull(stateInfo.weightValue[state_num]) and pd.isnull(stateInfo.weightUnit[state_num]):
-                    print("No weight information defined")
-                elif str(stateInfo.weightValue[state_num]).find("-") != -1:
-                    weights = stateInfo.weightValue[state_num].split("-")
-                    mycol.get(state_dict[stateName[state_num]]).weight = [{"@type" : "https://openminds.ebrains.eu/core/QuantitativeValueRange",
-                                                "minValueUnit" : {"@id": "https://openminds.ebrains.eu/instances/unitOfMeasurement/" + str(stateInfo.weightUnit[state_num])},
-                                                "maxValueUnit" : {"@id": "https://openminds.ebrains.eu/instances/unitOfMeasurement/" + str(stateInfo.weightUnit[state_num])}, 
-                                                "minValue" : int(weights[0].strip()),
-                                                "maxValue" : int(weights[1].strip())
+                if pd.isnull(stateInfo.weightMin[state_num]):
+                    notices.add("No weight information defined", stateName[state_num])
+                elif stateInfo.weightRange[state_num]:
+                    stateProperties["weight"] = [{"@type" : "https://openminds.ebrains.eu/core/QuantitativeValueRange",
+                                                "minValueUnit" : terms.link("unitOfMeasurement", stateInfo.weightUnit[state_num]),
+                                                "maxValueUnit" : terms.link("unitOfMeasurement", stateInfo.weightUnit[state_num]), 
+                                                "minValue" : int(stateInfo.weightMin[state_num]),
+                                                "maxValue" : int(stateInfo.weightMax[state_num])
                                                 }]
                 else:
-                    mycol.get(state_dict[stateName[state_num]]).weight = [{"@type" : "https://openminds.ebrains.eu/core/QuantitativeValue",
-                                                                "unit" : {"@id": "https://openminds.ebrains.eu/instances/unitOfMeasurement/" + str(stateInfo.weightUnit[state_num])}, 
-                                                                "value" : int(stateInfo.weightValue[state_num])
+                    stateProperties["weight"] = [{"@type" : "https://openminds.ebrains.eu/core/QuantitativeValue",
+                                                                "unit" : terms.link("unitOfMeasurement", stateInfo.weightUnit[state_num]), 
+                                                                "value" : int(stateInfo.weightMin[state_num])
                                                                 }]
                 
                 if pd.isnull(stateInfo.remarks[state_num]):
-                    print("No remarks added")
+                    notices.add("No remarks added", stateName[state_num])
                     additionalRemarks = None
                 else:
                     additionalRemarks = str(stateInfo.remarks[state_num])
-                mycol.get(state_dict[stateName[state_num]]).additionalRemarks = additionalRemarks
+                stateProperties["additionalRemarks"] = additionalRemarks
 
                 if pd.isnull(stateInfo.descendedFrom[state_num]):
-                    print("No 'descended from' information defined")
+                    notices.add("No 'descended from' information defined", stateName[state_num])
                 else:
                     if 'descendedFrom_uuid' in stateInfo.columns:
-                        descendedState = []
-                        for st in range(len(stateInfo.descendedFrom_uuid[state_num])):
-                            descendedState.append({"@id": kg_prefix + stateInfo.descendedFrom_uuid[state_num][st]})
-                            
-                        mycol.get(state_dict[stateName[state_num]]).descendedFrom = descendedState
+                        descendedState = self._uuidLinks(stateInfo.descendedFrom_uuid[state_num])
+                        if descendedState:
+                            stateProperties["descendedFrom"] = descendedState
+
+                # Create the state with all its properties
+                state_dict[stateName[state_num]] = addInstance(mycol, statetype, stateProperties, self._uuid(
+                    statetype, subject_name, stateInfo.timePoint[state_num], stateName[state_num]))
+                created[statetype] = created.get(statetype, 0) + 1
+                states.append({"@id": kg_prefix + state_dict[stateName[state_num]].split("/")[-1]})
 
             #### Subject ####
-            print("Creating subject " + str(subject_name))
+            if debug:
+                logger.debug("Creating subject " + subject_name)
 
             # Find the strain information if applicable
-            if pd.isnull(df.strainName[sub]):
-                print("No strain defined")
+            if pd.isnull(subjectInfo.strainName):
+                notices.add("No strain defined", subject_name)
                 strain_info = None
             else:
-                if pd.isnull(df.strainAtid[sub]) or not df.strainAtid[sub]:
-                    print("No strain identifier found, please check 'strainAtid' or add manually")
+                if pd.isnull(subjectInfo.strainAtid) or not subjectInfo.strainAtid:
+                    notices.add("No strain identifier found, please check 'strainAtid' or add manually",
+                                subject_name)
                     strain_info = None
                 else:
-                    strain_atid_url = "https://kg.ebrains.eu/api/instances/" + str(df.strainAtid[sub])
+                    strain_atid_url = "https://kg.ebrains.eu/api/instances/" + str(subjectInfo.strainAtid)
                     strain_info = [{"@id": strain_atid_url}]
                 
-            # Create the subject and link the subject state
-            subject_dict[subject_name] = getattr(mycol, subjectmethod)(
-                species = strain_info,
-                studiedState = states)
-            mycol.get(subject_dict[subject_name]).lookupLabel = str(subject_name)
+            # Link the subject state(s)
+            subjectProperties = {"species": strain_info,
+                                 "studiedState": states,
+                                 "lookupLabel": str(subject_name)}
             
-            # If internal identifier is defined, add to collection
-            if pd.isnull(df.internalID[sub]):
-                print(">>> No internal identifier available <<<")
+            # If internal identifier is defined, add to the subject
+            if pd.isnull(subjectInfo.internalID):
+                notices.add("No internal identifier available", subject_name)
                 internalID = None
             else:
-                internalID =  str(df.internalID[sub])
-            mycol.get(subject_dict[subject_name]).internalIdentifier = internalID
+                internalID =  str(subjectInfo.internalID)
+            subjectProperties["internalIdentifier"] = internalID
                 
             # If biological sex is defined, add to collection 
-            if  pd.isnull(df.biologicalSex[sub]):
-                print('No biological sex information available')
+            if  pd.isnull(subjectInfo.biologicalSex):
+                notices.add("No biological sex information available", subject_name)
                 sex = None
-                # mycol.get(subject_dict[subject_name]).biologicalSex = sex
             else:
-                sex = [{"@id" : "https://openminds.ebrains.eu/instances/biologicalSex/" +  str(df.biologicalSex[sub])}]
-            mycol.get(subject_dict[subject_name]).biologicalSex = sex
+                sex = [terms.link("biologicalSex", subjectInfo.biologicalSex)]
+            subjectProperties["biologicalSex"] = sex
 
-            if pd.isnull(df.isPartOf[sub]):
-                print("Specimen is not part of a group or collection")
+            if pd.isnull(subjectInfo.isPartOf):
+                notices.add("Specimen is not part of a group or collection", subject_name)
             else:
-                if 'isPartOf_uuid' in df.columns:
-                    mycol.get(subject_dict[subject_name]).isPartOf = [{"@id" : "https://kg.ebrains.eu/api/instances/" + df.isPartOf_uuid[sub]}]
+                if 'isPartOf_uuid' in stateInfo.columns:
+                    isPartOf = self._uuidLinks(subjectInfo.isPartOf_uuid)
+                    if isPartOf:
+                        subjectProperties["isPartOf"] = isPartOf
+
+            # Create the subject with all its properties
+            subject_dict[subject_name] = addInstance(mycol, subjecttype, subjectProperties,
+                                                     self._uuid(subjecttype, subject_name))
+            created[subjecttype] = created.get(subjecttype, 0) + 1
+            create.stop()
             
-            mycol.save(output_path) 
-        
-        for x in range(len(data)):
-            if not 'specimen_uuid' in data.columns:
-                data.insert(x, 'specimen_uuid', '')
-            data.loc[x, "specimen_uuid"] = subject_dict[str(data["name"][x])].split("/")[-1]
-            if not 'state_uuid' in data.columns:
-                data.insert(x, 'state_uuid', '')
-            if pd.isnull(str(data.timePointName[x])):
-                data.loc[x, "state_uuid"] = state_dict[str(data["name"][x]) + "_" + "state-0" + str(data.timePoint[x])].split("/")[-1]
-            else:
-                data.loc[x, "state_uuid"] = state_dict[str(data["timePointName"][x])].split("/")[-1]
+            if not singleCollection:
+                save.start()
+                writer.save(mycol)
+                save.stop()
 
-        filename = output_path + df.specimenType[sub] + '_created.csv'
-        data.to_csv(filename, index = False, header=True)  
-      
-        return data
+        # Save all instances of the sheet in the output folder
+        save.start()
+        if singleCollection:
+            writer.save(mycol)
+        writer.close()
+        save.stop()
 
-    def makeSampleCollections(self, df, output_path):
+        self.stats.add("create", create)
+        self.stats.add("save", save)
+        self.stats.countInstances(created)
+        return subject_dict, state_dict, writer.entries, notices.counts
+
+    @timed("makeSampleCollections")
+    def makeSampleCollections(self, df, output_path, singleCollection=False, workers=1,
+                              incremental=False, validated=False):
         """
         
         Parameters
         ----------
         df : Pandas DataFrame
-            DataFrame containing sample metadata
+            DataFrame containing sample metadata, or an iterator of DataFrames
+            (e.g. readers.readChunks) that are created one by one with one
+            overview file for all of them
         output_path : string
             Location files should be saved in
+        singleCollection : boolean
+            If True, all instances of the sheet are stored in one collection
+            that is saved once at the end. By default one collection is saved
+            per sample (including all its states)
+        workers : int
+            Number of processes that create the instances, each process
+            creates and saves the instances of a part of the specimen. On
+            Windows and macOS the calling script needs an
+            if __name__ == "__main__": guard for workers > 1
+        incremental : boolean
+            If True, the sheet is compared with the overview file of the
+            previous run in output_path (using the row_hash column) and only
+            new and changed specimen are created again, the other specimen
+            keep their instances. The added, changed and removed instances
+            are listed in <specimenType>_changes.csv
+        validated : boolean
+            If True, the sheet was already checked (e.g. by
+            makeSpecimenCollections for the whole sheet) and is only parsed
         Returns
         -------
         data : Pandas DataFrame
             DataFrame containing sample metadata including information about 
             the newly generated instances
         """
+        import pandas as pd
         
+        output_path = os.path.join(output_path, "")
+        if not isinstance(df, pd.DataFrame):
+            return self._makeChunks(self.makeSampleCollections, df, output_path, singleCollection, workers,
+                                    incremental, validated)
+
+        # Check the whole sheet before any instance is created
+        parsed = self._validated(df, validated)
+
+        # The overview is named after the type of the last sample
+        specimenType = parsed.specimenType[parsed.name == parsed.name.drop_duplicates().iloc[-1]].iloc[-1]
+        filename = overviewFile(output_path, specimenType, self.overview)
+
+        blocks = self._splitSpecimens(parsed)
+        sample_dict, state_dict, hashes = self._buildSheet(self._buildSamples, df, blocks, output_path,
+                                                           filename, singleCollection, workers, incremental)
+
+        # The UUID columns are added to a copy, df is not changed. The row
+        # hashes are kept for the next incremental run
+        with self.stats.stage("overview"):
+            data = addIds(df, sample_dict, state_dict, hashes)
+            saveOverview(data, filename)
+
+        return data
+
+    def _buildSamples(self, blocks, output_path, singleCollection=False):
+        """
+        Create and save the samples and sample states of (name, Records)
+        blocks, returns the @ids of the samples and states by name, the
+        manifest entries of the files that were written and the counts of the
+        notices
+        """
+        import pandas as pd
         kg_prefix = "https://kg.ebrains.eu/api/instances/"
-        data = df
-        
-        uniqueSamples = df.name.unique()
+        terms = self.terms
+        writer = self._writer(output_path)
+
         state_dict = {}
-        sample_dict = {} 
-        for sample in range(len(uniqueSamples)):
+        sample_dict = {}
+        if singleCollection:
+            mycol = self._collection()
+
+        # Notices are counted, with verbosity "debug" they are also logged per specimen
+        notices = Notices()
+        debug = notices.debug
+
+        # Time spent on creating the instances and on saving them, and the
+        # number of instances of every type
+        create = Timer()
+        save = Timer()
+        created = {}
+
+        for sample_name, stateInfo in blocks:
             
-            sample_name = str(uniqueSamples[sample])
-            stateInfo = df[df.name == uniqueSamples[sample]].reset_index(drop=True)
+            create.start()
+            sample_name = str(sample_name)
 
             # Select all the states that belong to one sample
-            print("\n Creating states for tissue sample " + str(sample_name) + "\n")
+            if debug:
+                logger.debug("Creating states for tissue sample " + sample_name)
 
-            sampleStates = stateInfo.timePoint.to_list()
+            sampleStates = list(stateInfo.timePoint)
+
+            # initiate the collection into which you will store the sample and its states
+            if not singleCollection:
+                mycol = self._collection()
             
             stateName = []
             states = []  
@@ -286,285 +896,573 @@ class openMINDS_wrapper:
 
                 # Find the names of the sample states, if no name was given, make generic name
                 if pd.isnull(stateInfo.timePointName[state]):
-                    print(">>> No sample state name defined, making generic one <<<")
+                    notices.add("No sample state name defined, making generic one", sample_name)
                     stateName.append(str(sample_name) + "_" + "state-0" + str(stateInfo.timePoint[state]))
                 else:
                     stateName.append(str(stateInfo.timePointName[state]))
 
-                # Define openMINDS function based on specimenType
+                # Define openMINDS type based on specimenType
                 if stateInfo.specimenType[state] == "tsc" :
-                    statemethod = 'add_core_tissueSampleCollectionState'
-                    samplemethod = 'add_core_tissueSampleCollection'
+                    statetype = 'tissueSampleCollectionState'
+                    sampletype = 'tissueSampleCollection'
                 elif stateInfo.specimenType[state] == "ts" :
-                    statemethod = 'add_core_tissueSampleState'
-                    samplemethod = 'add_core_tissueSample' 
+                    statetype = 'tissueSampleState'
+                    sampletype = 'tissueSample'
                 
-                # initiate the collection into which you will store all metadata instances
-                mycol = self.helper.create_collection()
-
                 # Create sample state(s)                    
-                print("creating state " + str(stateName[state]))
-                state_dict[stateName[state]] = getattr(mycol, statemethod)()    
-                mycol.get(state_dict[stateName[state]]).lookupLabel = stateName[state]
+                if debug:
+                    logger.debug("creating state " + str(stateName[state]))
+                stateProperties = {"lookupLabel": stateName[state]}
 
-                if pd.isnull(df.descendedFrom[state]):
-                    print("No 'descended from' information defined")
+                if pd.isnull(stateInfo.descendedFrom[state]):
+                    notices.add("No 'descended from' information defined", stateName[state])
                 else:
-                    if 'descendedFrom_uuid' in df.columns:
-                        mycol.get(state_dict[stateName[state]]).descendedFrom = [{"@id" : kg_prefix + stateInfo.descendedFrom_uuid[state]}]
+                    if 'descendedFrom_uuid' in stateInfo.columns:
+                        descendedState = self._uuidLinks(stateInfo.descendedFrom_uuid[state])
+                        if descendedState:
+                            stateProperties["descendedFrom"] = descendedState
                     
-                # If state attribute is defined, add to collection
-                attribute = []
-                if pd.isnull(stateInfo.attribute[state]):
-                    print(">>> No state attribute available <<<")
-                    attribute = None
-                else:
-                    if stateInfo.attribute[state].find(','):
-                        for attributes in stateInfo.attribute[state].split(","):
-                            attribute.append({"@id": "https://openminds.ebrains.eu/instances/tissueSampleAttribute/" + str(attributes.strip())})
-                    else:
-                        attribute = [{"@id" : "https://openminds.ebrains.eu/instances/tissueSampleAttribute/" + str(stateInfo.attribute[state])}]
-                mycol.get(state_dict[stateName[state]]).attribute = attribute
+                # If state attribute is defined, add to the state
+                attribute = terms.links("tissueSampleAttribute", stateInfo.attributeList[state])
+                if attribute is None:
+                    notices.add("No state attribute available", stateName[state])
+                stateProperties["attribute"] = attribute
         
                 if pd.isnull(stateInfo.remarks[state]):
-                    print("No remarks added")
+                    notices.add("No remarks added", stateName[state])
                     additionalRemarks = None
                 else:
                     additionalRemarks = str(stateInfo.remarks[state])
-                mycol.get(state_dict[stateName[state]]).additionalRemarks = additionalRemarks
+                stateProperties["additionalRemarks"] = additionalRemarks
 
+                # Create the state with all its properties
+                state_dict[stateName[state]] = addInstance(mycol, statetype, stateProperties, self._uuid(
+                    statetype, sample_name, stateInfo.timePoint[state], stateName[state]))
+                created[statetype] = created.get(statetype, 0) + 1
                 states.append({"@id": kg_prefix + state_dict[stateName[state]].split("/")[-1]})
 
-                # Save the instance in the output folder
-                mycol.save(output_path)     
-
             # Create the sample and link the sample state
-            print("Creating sample " + str(sample_name))
+            if debug:
+                logger.debug("Creating sample " + sample_name)
             
-            if not stateInfo.strainAtid[state]:
-                print("No strain identifier found, please check 'strainAtid' or add manually")
+            if pd.isnull(stateInfo.strainAtid[state]) or not stateInfo.strainAtid[state]:
+                notices.add("No strain identifier found, please check 'strainAtid' or add manually",
+                            sample_name)
                 strain_info = None
                 strain_atid = None
             else:
                 strain_atid = kg_prefix + str(stateInfo.strainAtid[state])
                 strain_info = [{"@id": strain_atid}]
                     
-            # check if the origin is an organ or cell type
-            if str(stateInfo.origin[state]) == "brain" or str(stateInfo.origin[state]) == "muscle":
-                origin = "https://openminds.ebrains.eu/instances/organ/" + str(stateInfo.origin[state])
-            else:
-                origin = "https://openminds.ebrains.eu/instances/cellType/" + str(stateInfo.origin[state])    
-            
-            sample_dict[sample_name] = getattr(mycol, samplemethod)(
-                species = strain_info,
-                type = [{"@id" : "https://openminds.ebrains.eu/instances/tissueSampleType/" + str(stateInfo.sampleType[state])}],
-                origin = [{"@id" : origin}],
-                studiedState = states)
-            mycol.get(sample_dict[sample_name]).lookupLabel = str(sample_name)
+            # The origin is an organ or a cell type
+            sampleProperties = {"species": strain_info,
+                                "type": [terms.link("tissueSampleType", str(stateInfo.sampleType[state]))],
+                                "origin": [{"@id" : terms.origin(str(stateInfo.origin[state]))}],
+                                "studiedState": states,
+                                "lookupLabel": str(sample_name)}
         
             # add biological sex if available
             if pd.isnull(stateInfo.biologicalSex[state]):
-                print('No biological sex information available')
+                notices.add("No biological sex information available", sample_name)
                 sex = None
-                # mycol.get(sample_dict[sample_name]).biologicalSex = sex
             else:
-                sex = [{"@id" : "https://openminds.ebrains.eu/instances/biologicalSex/" + str(stateInfo.biologicalSex[state])}]  
-            mycol.get(sample_dict[sample_name]).biologicalSex = sex
+                sex = [terms.link("biologicalSex", stateInfo.biologicalSex[state])]
+            sampleProperties["biologicalSex"] = sex
             
-            # If internal identifier is defined, add to collection
+            # If internal identifier is defined, add to the sample
             if pd.isnull(stateInfo.internalID[state]):
-                print(">>> No internal identifier available <<<")
+                notices.add("No internal identifier available", sample_name)
                 internalID = None
             else:
                 internalID = str(stateInfo.internalID[state])
-            mycol.get(sample_dict[sample_name]).internalIdentifier = internalID
+            sampleProperties["internalIdentifier"] = internalID
             
-            # If sample is a tissue sample collection and the quantity is defined, add to collection
+            # If sample is a tissue sample collection and the quantity is defined, add to the sample
             if stateInfo.specimenType[state] == "tsc" :
-                if pd.isnull(stateInfo.quantity[state]):
-                    print("No quantity defined")
+                if pd.isnull(stateInfo.quantityValue[state]):
+                    notices.add("No quantity defined", sample_name)
                     quantity = None
                 else:
-                    quantity = int(stateInfo.quantity[state])
-            else:
-                # print(">>> No quantity available for tissue sample <<<")
-                quantity = None
-            mycol.get(sample_dict[sample_name]).quantity = quantity
+                    quantity = int(stateInfo.quantityValue[state])
+                sampleProperties["quantity"] = quantity
         
-            # If brain region is defined, add to collection
+            # If brain region is defined, add to the sample
             if pd.isnull(stateInfo.region[state]):
-                print("No brain region defined")
+                notices.add("No brain region defined", sample_name)
                 brain_region = None
             else:
-                if (stateInfo.region[state].split("_")[0] == "AMBA") or (stateInfo.region[state].split("_")[0] == "WHSSD" and stateInfo.region[state].split("_")[1] in ["v1-01", "v2", "v3-01","v3", "v4"]) or (stateInfo.region[state].split("-")[0] == "JBA"):
-                    urlstring = "https://openminds.ebrains.eu/instances/parcellationEntityVersion/"
-                elif stateInfo.region[state].split("_")[0] == "WHSSD" or stateInfo.region[state].split("_")[0] == "JBA" or  stateInfo.region[state].split("_")[0] == "DWMA":
-                    urlstring = "https://openminds.ebrains.eu/instances/parcellationEntity/"
-                region_dict = {}
+                # Each region is linked as a parcellation entity (version) of its atlas
                 brain_region = []
                 for region in stateInfo.region[state].split(","):
-                    region_dict["@id"] = urlstring + region.strip()
-                    brain_region.append(region_dict)
-            mycol.get(sample_dict[sample_name]).anatomicalLocation = brain_region
+                    brain_region.append({"@id": terms.region(region.strip())})
+            sampleProperties["anatomicalLocation"] = brain_region
         
-            if pd.isnull(df.isPartOf[state]):
-                print("Specimen is not part of a group or collection")
+            if pd.isnull(stateInfo.isPartOf[state]):
+                notices.add("Specimen is not part of a group or collection", sample_name)
             else:
-                if 'isPartOf_uuid' in df.columns:
-                    mycol.get(sample_dict[sample_name]).isPartOf = [{"@id" : "https://kg.ebrains.eu/api/instances/" + df.isPartOf_uuid[state]}]
-
-            # Save the instance in the output folder
-            mycol.save(output_path) 
-
-        for x in range(len(data)):
-            if not 'specimen_uuid' in data.columns:
-                data.insert(x, 'specimen_uuid', '')
-            data.loc[x, "specimen_uuid"] = sample_dict[str(data["name"][x])].split("/")[-1]
-            if not 'state_uuid' in data.columns:
-                data.insert(x, 'state_uuid', '')
-            if pd.isnull(data.timePointName[x]):
-                data.loc[x, "state_uuid"] = state_dict[str(data["name"][x]) + "_" + "state-0" + str(data.timePoint[x])].split("/")[-1]
+                if 'isPartOf_uuid' in stateInfo.columns:
+                    isPartOf = self._uuidLinks(stateInfo.isPartOf_uuid[state])
+                    if isPartOf:
+                        sampleProperties["isPartOf"] = isPartOf
+
+            # Create the sample with all its properties
+            sample_dict[sample_name] = addInstance(mycol, sampletype, sampleProperties,
+                                                   self._uuid(sampletype, sample_name))
+            created[sampletype] = created.get(sampletype, 0) + 1
+            create.stop()
+
+            # Save the sample and its states in the output folder
+            if not singleCollection:
+                save.start()
+                writer.save(mycol)
+                save.stop()
+
+        # Save all instances of the sheet in the output folder
+        save.start()
+        if singleCollection:
+            writer.save(mycol)
+        writer.close()
+        save.stop()
+
+        self.stats.add("create", create)
+        self.stats.add("save", save)
+        self.stats.countInstances(created)
+        return sample_dict, state_dict, writer.entries, notices.counts
+
+    @timed("makeSpecimenCollections")
+    def makeSpecimenCollections(self, df, output_path, singleCollection=False, workers=1,
+                                incremental=False):
+        """
+
+        Parameters
+        ----------
+        df : Pandas DataFrame
+            DataFrame containing the metadata of all specimen (subject
+            groups, subjects, tissue sample collections and tissue samples)
+        output_path : string
+            Location files should be saved in
+        singleCollection, workers, incremental :
+            Passed on to makeSubjectCollections and makeSampleCollections
+            for every level
+        Returns
+        -------
+        data : Pandas DataFrame
+            DataFrame containing the metadata of all specimen including
+            information about the newly generated instances, in the order of
+            df
+
+        Every specimen type is created with makeSubjectCollections or
+        makeSampleCollections after the types its isPartOf and descendedFrom
+        columns refer to, whose UUIDs are filled in with findGroup. Types
+        that do not depend on each other (e.g. tissue sample collections and
+        tissue samples that both come from subjects) are created at the same
+        time.
+        """
+        import pandas as pd
+        df = df.reset_index(drop=True)
+        output_path = os.path.join(output_path, "")
+
+        # Check the whole sheet before any level is created, the levels only
+        # parse their rows
+        self._validated(df)
+
+        parents = specimenParents(df)
+        results = {}
+
+        def makeLevel(specimenType):
+            rows = df.index[df.specimenType == specimenType]
+            info = df.loc[rows].reset_index(drop=True)
+            if parents[specimenType]:
+                group_data = pd.concat([results[parent] for parent in parents[specimenType]], ignore_index=True)
+                info = self.findGroup(info, group_data)
+            if specimenType in SUBJECT_TYPES:
+                data = self.makeSubjectCollections(info, output_path, singleCollection, workers, incremental,
+                                                   validated=True)
             else:
-                data.loc[x, "state_uuid"] = state_dict[str(data["timePointName"][x])].split("/")[-1]
+                data = self.makeSampleCollections(info, output_path, singleCollection, workers, incremental,
+                                                  validated=True)
+            data.index = rows
+            return data
 
-        filename = output_path + df.specimenType[sample] + '_created.csv'
-        data.to_csv(filename, index = False, header=True)        
-   
-        return data
-    
-    def upload(self, instances_fnames, token, space_name):
+        for wave in planLevels(parents):
+            if len(wave) == 1:
+                results[wave[0]] = makeLevel(wave[0])
+                continue
+            with ThreadPoolExecutor(max_workers=len(wave)) as pool:
+                results.update(zip(wave, pool.map(makeLevel, wave)))
+
+        # One table in the order of the sheet, with the UUID columns first
+        data = pd.concat(results.values()).sort_index()
+        generated = [column for column in ["state_uuid", "specimen_uuid", "descendedFrom_uuid", "isPartOf_uuid"]
+                     if column in data.columns]
+        return data[generated + [column for column in data.columns if column not in generated]]
+
+    @timed("upload")
+    def upload(self, instances_fnames, token, space_name, workers=8, rate=None, kg_url=KG_URL,
+               journal=None, ordered=True, prefetch=64):
         """
         
         Parameters
         ----------
-        instances_fnames : List 
-            list of file paths to instances that need to be uploaded
+        instances_fnames : List or string
+            list of file paths to instances that need to be uploaded, or an
+            output folder (or its manifest.csv or pack) to upload all
+            instances in its pack or manifest (or all instance files of a
+            folder without either)
         token : string
             Authorisation token to get access to the KGE
         space_name : string
             Space that the instances needs to be uploaded to, e.g. "dataset", "common", etc.
+        workers : int
+            Number of instances that are posted at the same time
+        rate : float
+            Maximum number of requests per second (None for no limit)
+        kg_url : string
+            Instances endpoint of the KG API (e.g. a local test server)
+        journal : string
+            Location of an upload journal (e.g. in the output folder). Instances
+            that the journal confirms as uploaded with the same content are
+            skipped, instances whose content changed or that already existed
+            in the KG (409) are replaced (PUT). The journal is written every
+            few hundred instances, so an interrupted upload can be restarted
+        ordered : boolean
+            If True, instances are uploaded in waves so that the instances an
+            instance links to are posted first. This needs one pass over the
+            files (keeping only the links) before posting starts. If False,
+            posting starts immediately in the order of instances_fnames
+        prefetch : int
+            Number of instances that are read ahead of the KG responses. Only
+            this many instances are kept in memory at the same time
         Returns
         -------
         response : dictionary
             For each UUID as response is stored that indications if the upload 
-            was successful
+            was successful (instances skipped by the journal are not included).
+            Failed uploads are listed in self.failures
         """
         
-        hed = {"accept": "*/*",
-               "Authorization": "Bearer " + token,
-               "Content-Type": "application/json"
-               }
-        
-        # Prefix to upload to the right space
-        url = "https://core.kg.ebrains.eu/v3-beta/instances/{}?space=" + space_name
-        kg_prefix = "https://kg.ebrains.eu/api/instances/"
-        
-        new_instances = []
-        for fname in instances_fnames:
-            with open(fname, 'r') as f:
-                new_instances.append(json.load(f))
-            f.close()
-        
-        # Correct the capitalisation in the openMINDS package
-        for instance in new_instances:
-            atid = kg_prefix + instance["@id"].split("/")[-1]
-            instance["@id"] = atid
-            if "studiedState" in instance.keys():
-                for ss in range(len(instance["studiedState"])):
-                    atid = kg_prefix + instance["studiedState"][ss]["@id"].split("/")[-1]
-                    instance["studiedState"][ss]["@id"] = atid
-            if instance["@type"].endswith("Tissuesamplecollectionstate"):
-                splittype = instance["@type"].split("/")[:-1]
-                splittype.append("TissueSampleCollectionState")
-                instance["@type"] = "/".join(splittype)
-            if instance["@type"].endswith("Tissuesamplecollection"):
-                splittype = instance["@type"].split("/")[:-1]
-                splittype.append("TissueSampleCollection")
-                instance["@type"] = "/".join(splittype)
-            if instance["@type"].endswith("Tissuesamplestate"):
-                splittype = instance["@type"].split("/")[:-1]
-                splittype.append("TissueSampleState")
-                instance["@type"] = "/".join(splittype)
-            if instance["@type"].endswith("Tissuesample"):
-                splittype = instance["@type"].split("/")[:-1]
-                splittype.append("TissueSample")
-                instance["@type"] = "/".join(splittype)
-            if instance["@type"].endswith("Subjectstate"):
-                splittype = instance["@type"].split("/")[:-1]
-                splittype.append("SubjectState")
-                instance["@type"] = "/".join(splittype)
-        
-        # Upload to the KGE
-        print("\nUploading instances now:\n")
-        
-        count = 0
-        response = {}    
-        for instance in new_instances:
-            count += 1
-            print("Posting instance " + str(count)+"/"+str(len(new_instances)))
-            atid = instance["@id"].split("/")[-1] 
-            response[atid] = requests.post(url.format(atid), json=instance, headers=hed)
-            if response[atid].status_code == 200:
-                print(response[atid], "OK!" )
-            elif response[atid].status_code == 409:
-                print(response[atid], "Instance already exists")
-            elif response[atid].status_code == 401:
-                print(response[atid], "Token not valid, authorisation not successful")
+        load = self._instanceLoader()
+        if isinstance(instances_fnames, str):
+            if packFile(instances_fnames) is not None:
+                # The instances are read from the pack by UUID
+                pack = PackReader(instances_fnames)
+                instances_fnames, load = pack.uuids(), pack.get
             else:
-                print(response[atid])
-            
+                instances_fnames = manifestFiles(instances_fnames)
+
+        # Upload in waves, an instance is only posted once all the instances
+        # it links to (studiedState, isPartOf, descendedFrom) have been posted
+        if ordered:
+            with self.stats.stage("links"):
+                links = [self._instanceLinksFromFile(fname, load) for fname in instances_fnames]
+                waves = [[instances_fnames[i] for i in wave] for wave in dependencyWaves(links)]
+        else:
+            waves = [instances_fnames]
+
+        if journal is not None:
+            journal = UploadJournal(journal)
+            confirmed = journal.confirmed(space_name)
+
+        # Read, normalise and post the instances one by one
+        hashes = {}
+        counts = collections.Counter()
+        loading = Timer()
+        progress = Progress(len(instances_fnames), "Posted instance")
+        def instances(fnames):
+            for fname in fnames:
+                loading.start()
+                instance = normalizeInstance(load(fname))
+                loading.stop()
+                atid = instance["@id"].split("/")[-1]
+                method = "POST"
+                if journal is not None:
+                    hashes[atid] = contentHash(instance)
+                    if atid in confirmed:
+                        if confirmed[atid] == hashes[atid]:
+                            counts["skipped"] += 1
+                            progress.skip()
+                            continue
+                        method = "PUT"
+                counts["sent"] += 1
+                yield method, atid, instance
+
+        def report(atid, result):
+            progress.update()
+            if journal is not None:
+                journal.record(atid, space_name, hashes.pop(atid), result.status_code)
+
+        # Upload to the KGE
+        logger.info("Uploading " + str(len(instances_fnames)) + " instances now")
+
+        response = {}
+        try:
+            with KGClient(token, space_name, kg_url=kg_url, workers=workers, rate=rate, stats=self.stats) as client:
+                for wave_num, wave in enumerate(waves):
+                    if ordered:
+                        logger.info("Uploading wave " + str(wave_num + 1) + "/" + str(len(waves)) + " (" + str(len(wave)) + " instances)")
+                    response.update(client.stream(instances(wave), prefetch=prefetch, callback=report))
+                self.stats.add("load", loading)
+                if counts["skipped"]:
+                    logger.info(str(counts["skipped"]) + " instance(s) already uploaded, skipped these")
+                self.failures = client.summary(counts["sent"])
+        finally:
+            if journal is not None:
+                journal.close()
             
         return response    
-            
-    def delete(self, instance_atids, token, space_name):   
+
+    def _loadInstance(self, fname):
+        with open(fname, 'r') as f:
+            return json.load(f)
+
+    def _instanceLoader(self):
+        """
+        Function that reads an instance file, or with packed output the
+        instance of <output_path>/<type>/<uuid>.jsonld (the file listed in
+        the change manifests) from the pack of output_path
+        """
+        packs = {}
+        def load(fname):
+            if os.path.exists(fname) or not fname.endswith(".jsonld"):
+                return self._loadInstance(fname)
+            folder = os.path.dirname(os.path.dirname(fname))
+            if folder not in packs:
+                packs[folder] = PackReader(folder) if packFile(folder) is not None else None
+            if packs[folder] is None:
+                return self._loadInstance(fname)
+            return packs[folder].get(self._uuidFrom(fname))
+        return load
+
+    def _instanceLinksFromFile(self, fname, load=None):
+        """
+        Read an instance file (or an instance of a pack with load) and keep
+        only its UUID and the UUIDs it links to
+        """
+        instance = (load or self._loadInstance)(fname)
+        return {"@id": instance["@id"],
+                "links": [{"@id": atid} for atid in referencedUUIDs(instance)]}
+
+    @timed("delete")
+    def delete(self, instance_atids, token, space_name, workers=8, rate=None, kg_url=KG_URL,
+               journal=None):
         """
         
         Parameters
         ----------
-        instances_fnames : List 
-            UUIDs of the instances that need to be deleted
+        instance_atids : List or string
+            UUIDs of the instances that need to be deleted, or an output
+            folder (or its manifest.csv or pack) to delete all instances in
+            its pack or manifest (or all instance files of a folder without
+            either)
         token : string
             Authorisation token to get access to the KGE
         space_name : string
             Space that the instances needs to be deleted from, e.g. "dataset", "common", etc.
+        workers : int
+            Number of instances that are deleted at the same time
+        rate : float
+            Maximum number of requests per second (None for no limit)
+        kg_url : string
+            Instances endpoint of the KG API (e.g. a local test server)
+        journal : string
+            Location of the upload journal of these instances, the deleted
+            instances are removed from it so that a next upload posts them again
         
         Returns
         -------
         response : dictionary
             For each UUID as response is stored that indications if the deletion
-            was successful
+            was successful. Failed deletions are listed in self.failures
         """
         
-        
-        hed = {"accept": "*/*",
-               "Authorization": "Bearer " + token
-               }
-        
-        # URL of the space the instances need to be removed from
-        url = "https://core.kg.ebrains.eu/v3-beta/instances/{}?space=" + space_name
-        
-        # Delete the instances
-        print("\nDeleting instances now:\n")
-        
-        count = 0
-        response = {}    
-        for instance in instance_atids:
-            atid = instance.split("\\")[-1] 
-            count += 1
-            print("Deleting instance " + str(count)+"/"+str(len(instance_atids)))
-            response[atid] = requests.delete(url.format(atid), headers=hed)
-            if response[atid].status_code == 200:
-                print(response[atid].status_code, "OK!" )
-            elif response[atid].status_code == 401:
-                print(response[atid], "Token not valid, authorisation unsuccessful")
-            elif response[atid].status_code == 404:
-                print(response[atid], "Instance not found")
+        if isinstance(instance_atids, str):
+            if packFile(instance_atids) is not None:
+                instance_atids = PackReader(instance_atids).uuids()
             else:
-                print(response[atid])
+                instance_atids = manifestFiles(instance_atids)
+        atids = [self._uuidFrom(instance) for instance in instance_atids]
+
+        # Delete the instances
+        logger.info("Deleting " + str(len(atids)) + " instances now")
+
+        if journal is not None:
+            journal = UploadJournal(journal)
+
+        progress = Progress(len(atids), "Processed instance")
+        def report(atid, result):
+            progress.update()
+            if journal is not None and result is not None and result.status_code in GONE:
+                journal.forget(atid, space_name)
+        try:
+            with KGClient(token, space_name, kg_url=kg_url, workers=workers, rate=rate, stats=self.stats) as client:
+                response = client.map("DELETE", atids, callback=report)
+                self.failures = client.summary(len(atids))
+        finally:
+            if journal is not None:
+                journal.close()
             
         return response
 
-    def add2dsv(self, instances2add, token, dsv_uuid, space_name):
+    @timed("bulkDelete")
+    def bulkDelete(self, instances, token, space_name, workers=8, rate=None, kg_url=KG_URL,
+                   preflight=True, journal=None):
+        """
+        
+        Parameters
+        ----------
+        instances : string or List 
+            UUIDs, paths to instance files and/or paths to overview files
+            (<type>_created.csv, .parquet or .feather) of the instances that
+            need to be deleted. An output folder (or its manifest.csv or
+            pack) stands for all instances in its pack or manifest, or for
+            all its instance files if it has neither
+        token : string
+            Authorisation token to get access to the KGE
+        space_name : string
+            Space that the instances needs to be deleted from, e.g. "dataset", "common", etc.
+        workers : int
+            Number of instances that are deleted at the same time
+        rate : float
+            Maximum number of requests per second (None for no limit)
+        kg_url : string
+            Instances endpoint of the KG API (e.g. a local test server)
+        preflight : boolean
+            Check first which instances exist and only delete those
+        journal : string
+            Location of the upload journal of these instances, the deleted
+            instances (and those that were not found) are removed from it so
+            that a next upload posts them again
+        
+        Returns
+        -------
+        result : Pandas DataFrame
+            One row per instance with the uuid, the deletion wave, whether the
+            instance existed, and the status code and message of the deletion
+        """
+        import pandas as pd
+
+        # Instances that link to others are deleted first (e.g. a subject before
+        # its states), so the waves of the upload are deleted in reverse
+        links = self._instanceLinks(instances)
+        waves = dependencyWaves(links)[::-1]
+        atids = [link["@id"] for link in links]
+
+        result = pd.DataFrame({"uuid": atids, "wave": 0, "exists": None,
+                               "status": None, "message": None}).astype(object)
+        for wave_num, wave in enumerate(waves):
+            result.loc[wave, "wave"] = wave_num + 1
+
+        logger.info("Deleting " + str(len(atids)) + " instances in " + str(len(waves)) + " waves")
+
+        if journal is not None:
+            journal = UploadJournal(journal)
+
+        try:
+            with KGClient(token, space_name, kg_url=kg_url, workers=workers, rate=rate, stats=self.stats) as client:
+                if preflight:
+                    found = client.map("GET", atids, params={"stage": "IN_PROGRESS"})
+                    result["exists"] = [None if found[atid] is None else found[atid].status_code != 404
+                                        for atid in atids]
+                    logger.info(str((result.exists == False).sum()) + " instance(s) not found, skipping these")
+                    if journal is not None:
+                        for atid in result.uuid[result.exists == False]:
+                            journal.forget(atid, space_name)
+
+                progress = Progress(int((result.exists != False).sum()), "Processed instance")
+                def report(atid, response):
+                    progress.update()
+                    if journal is not None and response is not None and response.status_code in GONE:
+                        journal.forget(atid, space_name)
+
+                for wave_num, wave in enumerate(waves):
+                    wave = [i for i in wave if result.exists[i] != False]
+                    logger.info("Deleting wave " + str(wave_num + 1) + "/" + str(len(waves)) + " (" + str(len(wave)) + " instances)")
+                    response = client.map("DELETE", [atids[i] for i in wave], callback=report)
+                    for i in wave:
+                        if response[atids[i]] is not None:
+                            result.loc[i, "status"] = response[atids[i]].status_code
+                requests_sent = int((result.exists != False).sum()) + (len(atids) if preflight else 0)
+                self.failures = client.summary(requests_sent)
+        finally:
+            if journal is not None:
+                journal.close()
+
+        # Describe the outcome of every instance in one column
+        messages = dict(zip(self.failures.uuid, self.failures.message))
+        result["message"] = ["Instance not found" if exists == False else "Deleted" if status == 200
+                             else messages.get(atid)
+                             for atid, exists, status in zip(result.uuid, result.exists, result.status)]
+
+        return result
+
+    def _uuidFrom(self, instance):
+        """
+        UUID of an instance given as UUID, @id or path to the instance file
+        """
+        atid = instance.replace("\\", "/").rstrip("/").split("/")[-1]
+        if atid.endswith(".jsonld") or atid.endswith(".json"):
+            atid = atid.rsplit(".", 1)[0]
+        return atid
+
+    def _instanceLinks(self, instances):
+        """
+        Collect the UUIDs of the instances and the links between them. Instance
+        files and overview files (<type>_created.csv) also give the links.
+        """
+        import pandas as pd
+        if isinstance(instances, str):
+            instances = [instances]
+
+        # A pack, manifest or folder stands for all the instances it lists
+        expanded = []
+        packs = []
+        for instance in instances:
+            if packFile(instance) is not None:
+                packs.append(PackReader(instance))
+            elif instance.endswith(MANIFEST) or os.path.isdir(instance):
+                expanded += manifestFiles(instance)
+            else:
+                expanded.append(instance)
+        instances = expanded
+
+        links = {}
+        def add(atid, **properties):
+            link = links.setdefault(atid, {"@id": atid})
+            for key, values in properties.items():
+                link.setdefault(key, [])
+                link[key] += [{"@id": value} for value in values]
+
+        for instance in instances:
+            if instance.endswith((".csv", ".parquet", ".feather")):
+                overview = readOverview(instance)
+                for row in overview.itertuples(index=False):
+                    state = getattr(row, "state_uuid", None)
+                    specimen = getattr(row, "specimen_uuid", None)
+                    isPartOf = getattr(row, "isPartOf_uuid", None)
+                    descendedFrom = getattr(row, "descendedFrom_uuid", None)
+                    if not pd.isnull(state):
+                        add(state, descendedFrom=self._splitUUIDs(descendedFrom))
+                    if not pd.isnull(specimen):
+                        add(specimen, studiedState=[] if pd.isnull(state) else [state],
+                            isPartOf=self._splitUUIDs(isPartOf))
+            elif os.path.isfile(instance):
+                with open(instance, 'r') as f:
+                    content = json.load(f)
+                content["@id"] = self._uuidFrom(instance)
+                links.setdefault(content["@id"], {}).update(content)
+            else:
+                add(self._uuidFrom(instance))
+
+        for pack in packs:
+            for atid in pack.uuids():
+                content = pack.get(atid)
+                content["@id"] = atid
+                links.setdefault(atid, {}).update(content)
+
+        return list(links.values())
+
+    @timed("add2dsv")
+    def add2dsv(self, instances2add, token, dsv_uuid, space_name, kg_url=KG_URL, merge=False, workers=8):
         """
         
         Parameters
@@ -573,43 +1471,81 @@ class openMINDS_wrapper:
             UUIDs of the studied specimen that need to be added to the studiedSpecimen section of the dataset version
         token : string
             Authorisation token to get access to the KGE
-        dsv_uuid : string
-            UUID of the dataset version the specimen needs to be added to
+        dsv_uuid : string or List
+            UUID of the dataset version the specimen needs to be added to, or
+            a list of UUIDs to add the specimen to several dataset versions at
+            the same time
         space_name : string
             Space that the instances needs to be deleted from, e.g. "dataset", "common", etc.
+        kg_url : string
+            Instances endpoint of the KG API (e.g. a local test server)
+        merge : boolean
+            If True, the studied specimen the dataset version already links to
+            are kept: the dataset version is fetched once and the new specimen
+            are added to its list (each specimen only once). By default the
+            list is replaced by instances2add
+        workers : int
+            Number of dataset versions that are updated at the same time
         
         Returns
         -------
         response : dictionary
-            For each UUID as response is stored that indications if the deletion
-            was successful
+            For each dataset version the response to its request. A failed
+            request is listed in self.failures
         """
         
-        hed = {"accept": "*/*",
-            "Authorization": "Bearer " + token
-            }
-            
-        # URL of the space the instances need to be removed from
-        url = "https://core.kg.ebrains.eu/v3-beta/instances/{}?space=" + space_name
-        kg_prefix = "https://kg.ebrains.eu/api/instances/"
+        kg_prefix = KG_PREFIX
 
-        studiedSpecimen = []
-        for atid in instances2add:
-            studiedSpecimen.append({"@id": kg_prefix + atid.split("\\")[-1] })
-
-        # Create the instance to patch
-        instance = {"@context": {"@vocab": "https://openminds.ebrains.eu/vocab/"},
-                    "studiedSpecimen": studiedSpecimen
-                    }
-
-        response = {}     
-        print("Adding specimen now ")
-        response[dsv_uuid] = requests.patch(url.format(dsv_uuid), json=instance, headers=hed)
-        if response[dsv_uuid].status_code == 200:
-            print(response[dsv_uuid].status_code, "OK!" )
-        elif response[dsv_uuid].status_code == 401:
-            print(response[dsv_uuid], "Token not valid, authorisation unsuccessful")
-        elif response[dsv_uuid].status_code == 404:
-            print(response[dsv_uuid], "Instance not found")
-        else:
-            print(response[dsv_uuid])
+        dsv_uuids = [dsv_uuid] if isinstance(dsv_uuid, str) else list(dict.fromkeys(dsv_uuid))
+
+        # A dictionary keeps the order of the specimen and each one only once
+        new = list(dict.fromkeys(self._uuidFrom(atid) for atid in instances2add))
+
+        logger.info("Adding " + str(len(new)) + " specimen now")
+        response = {}
+        requests_sent = 0
+        with KGClient(token, space_name, kg_url=kg_url, workers=workers, stats=self.stats) as client:
+            linked = {dsv: [] for dsv in dsv_uuids}
+            if merge:
+                # A dataset version that does not exist is a failure
+                found = client.map("GET", dsv_uuids, params={"stage": "IN_PROGRESS"}, failMissing=True)
+                requests_sent += len(dsv_uuids)
+                for dsv in dsv_uuids:
+                    if found[dsv] is None or found[dsv].status_code >= 300:
+                        # Patching would remove the specimen that are linked now
+                        logger.warning("Dataset version " + dsv + " could not be fetched, skipping it")
+                        del linked[dsv]
+                        response[dsv] = found[dsv]
+                    else:
+                        linked[dsv] = self._studiedSpecimen(found[dsv])
+
+            # The KG replaces the whole studiedSpecimen list, so every
+            # dataset version gets one request with its complete list
+            changed = []
+            for dsv in linked:
+                merged = list(dict.fromkeys(linked[dsv] + new))
+                if merged != linked[dsv] or not merge:
+                    linked[dsv] = merged
+                    changed.append(dsv)
+
+            # Create the instances to patch
+            instances = [{"@context": {"@vocab": "https://openminds.ebrains.eu/vocab/"},
+                          "studiedSpecimen": [{"@id": kg_prefix + uuid} for uuid in linked[dsv]]}
+                         for dsv in changed]
+            if changed:
+                response.update(client.map("PATCH", changed, instances))
+                requests_sent += len(changed)
+
+            self.failures = client.summary(requests_sent)
+
+        return response
+
+    def _studiedSpecimen(self, response):
+        """
+        UUIDs of the studied specimen a fetched dataset version links to
+        """
+        data = response.json().get("data") or {}
+        links = data.get("studiedSpecimen", data.get("https://openminds.ebrains.eu/vocab/studiedSpecimen")) or []
+        if isinstance(links, dict):
+            links = [links]
+        return [self._uuidFrom(link["@id"]) for link in links if isinstance(link, dict) and "@id" in link]
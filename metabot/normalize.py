@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Normalisation of the instances written by the openMINDS package before they
+are uploaded to the KG. The openMINDS package writes types with a wrong
+capitalisation (e.g. Tissuesamplecollectionstate) and links between the new
+instances with a local @id (https://localhost/<type>/<uuid>). Both are fixed
+with lookup tables that are built once when the module is imported.
+
+Functions:
+-------
+    normalizeType :
+        correct the capitalisation of an openMINDS type
+    normalizeInstance :
+        correct the type and point the @id and all links to the KG
+"""
+
+from .kgclient import KG_PREFIX
+
+LOCAL_PREFIX = "https://localhost/"
+
+# openMINDS v3 core schemas (actors, data, digitalIdentifier, miscellaneous,
+# products and research)
+CORE_TYPES = [
+    "Affiliation", "Consortium", "ContactInformation", "Contribution", "Organization", "Person",
+    "ContentType", "Copyright", "File", "FileArchive", "FileBundle", "FilePathPattern",
+    "FileRepository", "FileRepositoryStructure", "Hash", "License", "Measurement", "ServiceLink",
+    "DOI", "GRIDID", "HANDLE", "ISBN", "ORCID", "RORID", "RRID", "SWHID",
+    "IdentifiersDotOrgID", "StockNumber",
+    "Funding", "QuantitativeValue", "QuantitativeValueArray", "QuantitativeValueRange",
+    "ResearchProductGroup", "WebResource",
+    "Dataset", "DatasetVersion", "MetaDataModel", "MetaDataModelVersion", "Model",
+    "ModelVersion", "Project", "Software", "SoftwareVersion", "WebService", "WebServiceVersion",
+    "BehavioralProtocol", "Configuration", "CustomPropertySet", "NumericalParameter",
+    "Parameter", "ParameterSet", "PropertyValueList", "Protocol", "ProtocolExecution",
+    "Strain", "StringParameter", "Subject", "SubjectGroup", "SubjectGroupState", "SubjectState",
+    "TissueSample", "TissueSampleCollection", "TissueSampleCollectionState", "TissueSampleState",
+]
+
+# Properties of the core schemas that link to other instances
+LINK_PROPERTIES = frozenset([
+    "studiedState", "isPartOf", "descendedFrom", "species", "studiedSpecimen",
+    "anatomicalLocation", "origin", "type", "attribute", "ageCategory", "biologicalSex",
+    "pathology", "handedness", "laterality", "geneticStrainType", "backgroundStrain",
+    "breedingType", "phenotype", "digitalIdentifier", "isVersionOf", "hasVersion",
+    "isAlternativeVersionOf", "isNewVersionOf", "custodian", "author", "contributor",
+    "funding", "license", "accessibility", "ethicsAssessment", "experimentalApproach",
+    "preparationDesign", "technique", "behavioralProtocol", "protocol", "input", "output",
+    "repository", "copyright", "fullDocumentation", "relatedPublication", "keyword",
+])
+
+# Lower case name -> correctly capitalised name
+TYPE_NAMES = {name.lower(): name for name in CORE_TYPES}
+
+
+# Full type IRI -> corrected type IRI, filled as types are seen
+_type_cache = {}
+
+
+def normalizeType(atype):
+    """
+    Correct the capitalisation of the last part of an openMINDS type IRI
+    """
+    normalized = _type_cache.get(atype)
+    if normalized is None:
+        prefix, _, name = atype.rpartition("/")
+        name = TYPE_NAMES.get(name.lower(), name)
+        normalized = _type_cache[atype] = prefix + "/" + name if prefix else name
+    return normalized
+
+
+def normalizeInstance(instance):
+    """
+    Correct the type of an instance and point its @id and the links to other
+    new instances (local @ids) to the KG. Links to controlled terms and other
+    existing KG instances are left as they are. The instance is changed in
+    place and returned.
+    """
+    instance["@id"] = KG_PREFIX + instance["@id"].rsplit("/", 1)[-1]
+    if "@type" in instance:
+        instance["@type"] = normalizeType(instance["@type"])
+
+    for key, value in instance.items():
+        if key not in LINK_PROPERTIES:
+            continue
+        for link in value if isinstance(value, list) else (value,):
+            if isinstance(link, dict):
+                atid = link.get("@id")
+                if atid is not None and atid.startswith(LOCAL_PREFIX):
+                    link["@id"] = KG_PREFIX + atid.rsplit("/", 1)[-1]
+
+    return instance
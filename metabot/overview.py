@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Functions for the overview file (<type>_created.csv) that
+makeSubjectCollections and makeSampleCollections save next to the instances.
+The overview is the sheet with the UUIDs of the specimen and states (and the
+row hashes of an incremental run) added, and can be saved as CSV, or with
+pyarrow as Parquet or Feather with the same column types for every sheet.
+
+Functions:
+-------
+    stateKeys :
+        the name of the state of every row
+    addIds :
+        copy of a sheet with the specimen and state UUIDs added
+    overviewFile :
+        location of the overview file of a specimen type
+    saveOverview :
+        save an overview file
+    readOverview :
+        read an overview file in any of the formats
+"""
+
+import os
+
+from .log import logger
+
+OVERVIEW_FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+# Column types of Parquet and Feather overviews, all other columns are text
+# so they can always be joined on
+OVERVIEW_TYPES = {"timePoint": "Int64"}
+
+
+def stateKeys(df):
+    """
+    Name of the state of every row, the same names the states get in
+    makeSubjectCollections and makeSampleCollections
+    """
+    generic = df.name.astype(str) + "_state-0" + df.timePoint.astype(str)
+    return df.timePointName.astype("string").fillna(generic).astype(str)
+
+
+def _uuids(atids):
+    return atids.str.rsplit("/", n=1).str[-1].to_numpy()
+
+
+def addIds(df, specimen_dict, state_dict, hashes=None):
+    """
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        The sheet the instances were created from, it is not changed
+    specimen_dict, state_dict : dictionary
+        The @ids of the specimen and states by name
+    hashes : Pandas Series
+        Row hashes of df (incremental.rowHashes), stored in row_hash
+    Returns
+    -------
+    data : Pandas DataFrame
+        Copy of df with the state_uuid and specimen_uuid columns first (or
+        replaced if df already has them) and the row_hash column last
+    """
+    data = df.copy()
+    ids = {"specimen_uuid": _uuids(df.name.astype(str).map(specimen_dict)),
+           "state_uuid": _uuids(stateKeys(df).map(state_dict))}
+    for column, values in ids.items():
+        if column in data.columns:
+            data[column] = values
+        else:
+            data.insert(0, column, values)
+
+    if hashes is not None:
+        data["row_hash"] = hashes.to_numpy()
+    return data
+
+
+def overviewFile(output_path, specimenType, overview="csv"):
+    """
+    Location of the overview file of a specimen type in output_path, overview
+    is "csv", "parquet" or "feather"
+    """
+    if overview not in OVERVIEW_FORMATS:
+        raise ValueError("Unknown overview format " + str(overview) + ", use one of "
+                         + ", ".join(OVERVIEW_FORMATS))
+    return output_path + specimenType + "_created" + OVERVIEW_FORMATS[overview]
+
+
+def _typed(data):
+    types = {column: OVERVIEW_TYPES.get(column, "string") for column in data.columns}
+    return data.reset_index(drop=True).astype(types)
+
+
+def saveOverview(data, filename):
+    """
+    Save the overview in the format of its extension and return the
+    location it was saved at. Without pyarrow a Parquet or Feather overview
+    is saved as CSV instead.
+    """
+    extension = os.path.splitext(filename)[1]
+    try:
+        if extension == ".parquet":
+            _typed(data).to_parquet(filename, index=False)
+            return filename
+        if extension == ".feather":
+            _typed(data).to_feather(filename)
+            return filename
+    except ImportError:
+        logger.warning("pyarrow is not installed, the overview is saved as CSV")
+        filename = os.path.splitext(filename)[0] + ".csv"
+
+    data.to_csv(filename, index = False, header=True)
+    return filename
+
+
+def readOverview(filename, anyFormat=False):
+    """
+
+    Parameters
+    ----------
+    filename : string
+        Location of an overview file (.csv, .parquet or .feather)
+    anyFormat : boolean
+        If the file does not exist, read the overview of the same specimen
+        type in one of the other formats
+    Returns
+    -------
+    overview : Pandas DataFrame
+        The overview with all columns as text, None if there is none
+    """
+    import pandas as pd
+    stem, extension = os.path.splitext(filename)
+    candidates = [filename]
+    if anyFormat:
+        candidates += [stem + other for other in OVERVIEW_FORMATS.values() if other != extension]
+
+    for candidate in candidates:
+        if not os.path.exists(candidate):
+            continue
+        if candidate.endswith(".parquet"):
+            return pd.read_parquet(candidate).astype("string")
+        if candidate.endswith(".feather"):
+            return pd.read_feather(candidate).astype("string")
+        return pd.read_csv(candidate, dtype=str)
+    return None
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Packed output: all instances of an output folder in one JSON-lines file
+(instances.jsonl), optionally compressed with gzip (instances.jsonl.gz) or
+zstd (instances.jsonl.zst, needs the zstandard package), instead of one file
+per instance. The lines are written in blocks of about BLOCK_SIZE bytes, a
+compressed pack is a series of compressed blocks, so it can still be read in
+one go with gunzip / zstd. The index next to it (instances.index.csv) gives
+the block and the position in the block of every UUID, so a single instance
+can be read without reading the rest of the pack.
+
+Classes:
+-------
+    PackWriter :
+        write instances to a part of a pack, with the interface of an
+        InstanceWriter
+    PackReader :
+        read instances from a pack by UUID
+Functions:
+-------
+    packFile :
+        the pack of an output folder
+    mergePack :
+        add the parts written by PackWriters to the pack of an output folder
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+from .sink import _manifest_lock, instanceContent, writeAtomic
+
+PACK = "instances.jsonl"
+INDEX = "instances.index.csv"
+INDEX_COLUMNS = ["uuid", "type", "sha256", "offset", "length", "start", "size"]
+
+# Extension of the pack for each compression
+COMPRESSION = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+BLOCK_SIZE = 64 * 1024
+
+
+def _codec(compression):
+    """
+    Compress and decompress functions of a compression (None for none)
+    """
+    if compression not in COMPRESSION:
+        raise ValueError("Unknown compression " + str(compression) + ", use None, gzip or zstd")
+    if compression == "gzip":
+        return gzip.compress, gzip.decompress
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Install the zstandard package to write or read zstd compressed packs")
+        return zstandard.ZstdCompressor().compress, zstandard.ZstdDecompressor().decompress
+    return None, None
+
+
+def packFile(path):
+    """
+    Location of the pack of an output folder (or path itself if it is a
+    pack), None if there is none
+    """
+    if os.path.isfile(path) and os.path.basename(path).startswith(PACK):
+        return path
+    if os.path.isdir(path):
+        for extension in COMPRESSION.values():
+            candidate = os.path.join(path, PACK + extension)
+            if os.path.exists(candidate):
+                return candidate
+    return None
+
+
+def _compressionOf(pack):
+    for compression, extension in COMPRESSION.items():
+        if extension and pack.endswith(extension):
+            return compression
+    return None
+
+
+def _packPath(output_path, compression):
+    # A folder holds one pack, new instances are added to it in its compression
+    pack = os.path.join(output_path, PACK + COMPRESSION[compression])
+    existing = packFile(output_path)
+    if existing is not None and existing != pack:
+        raise ValueError(output_path + " already has a pack with another compression (" + existing + ")")
+    return pack
+
+
+class PackWriter:
+    def __init__(self, output_path, compression=None):
+        """
+
+        Parameters
+        ----------
+        output_path : string
+            Output folder of the pack, the instances are written to a part
+            file in it that mergePack adds to the pack
+        compression : string
+            None, "gzip" or "zstd"
+        """
+        import pandas as pd
+        self.compress = _codec(compression)[0]
+        os.makedirs(output_path, exist_ok=True)
+        _packPath(output_path, compression)
+        handle, self.part = tempfile.mkstemp(dir=output_path, prefix="." + PACK + ".", suffix=".part")
+        self.file = os.fdopen(handle, "wb")
+        self.block = []
+        self.block_size = 0
+        self.entries = []
+
+        # Instances that are already in the pack with the same content are
+        # not written again
+        index = os.path.join(output_path, INDEX)
+        self.packed = {}
+        if os.path.exists(index):
+            previous = pd.read_csv(index, dtype=str, usecols=["uuid", "sha256"])
+            self.packed = dict(zip(previous.uuid, previous.sha256))
+
+    def write(self, type_name, uuid, content):
+        """
+        Add one instance (JSON-LD text) to the pack
+        """
+        if "\n" in content:
+            # Every instance has to be on one line
+            content = json.dumps(json.loads(content))
+        data = content.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        if self.packed.get(uuid) == sha256:
+            return
+        self.entries.append({"uuid": uuid, "type": type_name, "sha256": sha256, "part": self.part,
+                             "offset": None, "length": None, "start": self.block_size, "size": len(data)})
+        self.block.append(data + b"\n")
+        self.block_size += len(data) + 1
+        if self.block_size >= BLOCK_SIZE:
+            self._flush()
+
+    def save(self, collection):
+        """
+        Add all instances of a JsonLdCollection or an openMINDS collection
+        """
+        for instance in collection.data.values():
+            self.write(instance.type_name, str(instance.UUID), instanceContent(instance))
+
+    def _flush(self):
+        if not self.block:
+            return
+        data = b"".join(self.block)
+        if self.compress is not None:
+            data = self.compress(data)
+        offset = self.file.tell()
+        self.file.write(data)
+        for entry in self.entries:
+            if entry["offset"] is None:
+                entry["offset"] = offset
+                entry["length"] = len(data)
+        self.block = []
+        self.block_size = 0
+
+    def close(self):
+        self._flush()
+        self.file.close()
+        if not self.entries:
+            os.remove(self.part)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def mergePack(output_path, entries, removed=(), compression=None):
+    """
+
+    Parameters
+    ----------
+    output_path : string
+        Output folder of the pack
+    entries : List
+        The entries of closed PackWriters (in any number of parts)
+    removed : List
+        UUIDs that are left out of the index
+    compression : string
+        Compression of the pack, it must be the same as the one of the pack
+        that is already in the folder
+    Returns
+    -------
+    index : Pandas DataFrame
+        The index of the pack. Instances that were replaced stay in the pack
+        but are not in the index anymore.
+    """
+    import pandas as pd
+    pack = _packPath(output_path, compression)
+
+    entries = pd.DataFrame(entries, columns=INDEX_COLUMNS + ["part"])
+    with _manifest_lock:
+        with open(pack, "ab") as f:
+            for part in entries.part.unique():
+                with open(part, "rb") as p:
+                    shift = f.tell()
+                    f.write(p.read())
+                rows = entries.part == part
+                entries.loc[rows, "offset"] = entries.offset[rows].astype(int) + shift
+                os.remove(part)
+
+        index_file = os.path.join(output_path, INDEX)
+        index = pd.read_csv(index_file, dtype=str) if os.path.exists(index_file) else None
+        new = entries[INDEX_COLUMNS].astype(str)
+        index = new if index is None else pd.concat([index, new], ignore_index=True)
+        index = index.drop_duplicates("uuid", keep="last")
+        index = index[~index.uuid.isin(list(removed))]
+        writeAtomic(index_file, index.to_csv(index=False))
+    return index
+
+
+class PackReader:
+    def __init__(self, path):
+        """
+
+        Parameters
+        ----------
+        path : string
+            Location of a pack, or of an output folder with a pack
+        """
+        import pandas as pd
+        self.pack = packFile(path)
+        if self.pack is None:
+            raise ValueError("No pack found at " + path)
+        self.decompress = _codec(_compressionOf(self.pack))[1]
+        index = pd.read_csv(os.path.join(os.path.dirname(self.pack), INDEX), dtype=str)
+        for column in ["offset", "length", "start", "size"]:
+            index[column] = index[column].astype(int)
+        # In the order of the pack, so reading all instances reads every block once
+        index = index.sort_values(["offset", "start"], kind="stable")
+        self.index = index.reset_index(drop=True)
+        positions = zip(index["offset"], index["length"], index["start"], index["size"])
+        self.positions = dict(zip(index.uuid, positions))
+        self.cached = (None, None)
+
+    def uuids(self):
+        return self.index.uuid.tolist()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, uuid):
+        return uuid in self.positions
+
+    def _read(self, f, uuid):
+        offset, length, start, size = self.positions[uuid]
+        if self.decompress is None:
+            f.seek(offset + start)
+            return f.read(size).decode("utf-8")
+        cached = self.cached
+        if cached[0] != offset:
+            f.seek(offset)
+            cached = self.cached = (offset, self.decompress(f.read(length)))
+        return cached[1][start:start + size].decode("utf-8")
+
+    def content(self, uuid):
+        """
+        JSON-LD text of the instance with this UUID
+        """
+        with open(self.pack, "rb") as f:
+            return self._read(f, uuid)
+
+    def get(self, uuid):
+        """
+        The instance with this UUID as a dictionary
+        """
+        return json.loads(self.content(uuid))
+
+    def __iter__(self):
+        with open(self.pack, "rb") as f:
+            for uuid in self.index.uuid:
+                yield json.loads(self._read(f, uuid))
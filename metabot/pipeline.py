@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Functions to plan how the levels of a specimen sheet (subject groups,
+subjects, tissue sample collections and tissue samples) are created. The
+hierarchy is read from the specimenType, isPartOf and descendedFrom columns,
+a level is created after the levels it refers to so their UUIDs can be filled
+in, and levels that do not depend on each other can be created at the same
+time.
+
+Functions:
+-------
+    specimenParents :
+        the specimen types each specimen type refers to
+    planLevels :
+        group the specimen types into waves that can be created concurrently
+"""
+
+# Specimen types created with makeSubjectCollections, the others are samples
+SUBJECT_TYPES = ["subjectGroup", "subject"]
+
+
+def _references(values):
+    # One row per (comma separated) reference, with the index of its row
+    return values.dropna().map(lambda ref: [part.strip() for part in ref.split(",")]
+                               if isinstance(ref, str) else [ref]).explode()
+
+
+def specimenParents(df):
+    """
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        DataFrame containing the metadata of all specimen
+    Returns
+    -------
+    parents : dictionary
+        For each specimen type in the sheet (in order of appearance) the set
+        of specimen types it is part of (isPartOf, by name) or descended from
+        (descendedFrom, by timePointName). References to specimen that are
+        not in the sheet are left out
+    """
+    import pandas as pd
+    names = df.drop_duplicates("name").set_index("name").specimenType
+    states = df.dropna(subset=["timePointName"]).drop_duplicates("timePointName")
+    states = states.set_index("timePointName").specimenType
+
+    parents = {specimenType: set() for specimenType in df.specimenType.unique()}
+    for column, index in [("isPartOf", names), ("descendedFrom", states)]:
+        if column not in df.columns:
+            continue
+        references = _references(df[column])
+        types = references.map(index)
+        for child, parent in zip(df.specimenType.loc[references.index], types):
+            if pd.notna(parent):
+                parents[child].add(parent)
+    return parents
+
+
+def planLevels(parents):
+    """
+
+    Parameters
+    ----------
+    parents : dictionary
+        Specimen types and the specimen types they refer to (specimenParents)
+    Returns
+    -------
+    waves : List
+        Lists of specimen types. Every specimen type only refers to specimen
+        types in earlier waves, the types in one wave do not depend on each
+        other
+    """
+    waves = []
+    done = set()
+    while len(done) < len(parents):
+        wave = [specimenType for specimenType, refers in parents.items()
+                if specimenType not in done and refers <= done]
+        if not wave:
+            cycle = sorted(specimenType for specimenType in parents if specimenType not in done)
+            raise ValueError("Specimen of the types " + ", ".join(cycle) + " refer to specimen of the same "
+                             "type or to each other, these levels can not be created in order")
+        waves.append(wave)
+        done.update(wave)
+    return waves
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Timing and profiling of a run. Every openMINDS_wrapper keeps a RunStats
+(wrapper.stats) that adds up the wall and CPU time of the stages of the build
+(reading the sheet, validate, findGroup, creating the instances, saving them,
+the manifest and the overview) and of upload, delete, bulkDelete and add2dsv,
+counts the instances of every type, and keeps a latency histogram of the
+requests to the KG by status code. Optionally the run is profiled with
+cProfile and tracemalloc. openMINDS_wrapper.saveReport saves the report as
+JSON.
+
+Classes:
+-------
+    Timer :
+        add up the time of a stage that is run many times in a loop
+    RunStats :
+        collect the timings, counts and profiles of a run
+Functions:
+-------
+    timed :
+        decorator that times a method of the openMINDS_wrapper as a stage
+"""
+
+import contextlib
+import cProfile
+import functools
+import pstats
+import threading
+import time
+import tracemalloc
+
+# Upper bounds (seconds) of the buckets of the request latency histogram
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+class Timer:
+    __slots__ = ["wall", "cpu", "calls", "started"]
+
+    def __init__(self):
+        """
+        Wall and CPU time of one stage in one thread, start and stop cost two
+        clock readings each
+        """
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.calls = 0
+        self.started = None
+
+    def start(self):
+        self.started = (time.perf_counter(), time.thread_time())
+
+    def stop(self):
+        wall, cpu = self.started
+        self.wall += time.perf_counter() - wall
+        self.cpu += time.thread_time() - cpu
+        self.calls += 1
+
+
+def timed(stage):
+    """
+    Time a method of the openMINDS_wrapper as stage in its stats
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.stats.stage(stage):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RunStats:
+    def __init__(self):
+        """
+        Timings, counts and profiles of a run, can be used from several
+        threads. The CPU time of a stage is that of the thread that ran it
+        """
+        self.lock = threading.Lock()
+        self.active = threading.local()
+        self.reset()
+
+    def __reduce__(self):
+        # Worker processes start with empty stats, their report is merged
+        # into the stats of the main process
+        return RunStats, ()
+
+    def reset(self):
+        """
+        Start a new run
+        """
+        with self.lock:
+            self.started = time.time()
+            self.stages = {}
+            self.instances = {}
+            self.requests = {}
+            self.profile = {}
+
+    def add(self, stage, timer):
+        """
+        Add the time of a Timer (or a stage of another report) to stage
+        """
+        with self.lock:
+            total = self.stages.setdefault(stage, {"calls": 0, "wall": 0.0, "cpu": 0.0})
+            total["calls"] += timer.calls
+            total["wall"] += timer.wall
+            total["cpu"] += timer.cpu
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Time the code in the with block as stage name. A stage that is
+        already running in this thread (e.g. makeSubjectCollections for each
+        chunk of a sheet) is only counted once
+        """
+        running = self.active.__dict__.setdefault("stages", set())
+        if name in running:
+            yield
+            return
+        running.add(name)
+        timer = Timer()
+        timer.start()
+        try:
+            yield
+        finally:
+            timer.stop()
+            running.discard(name)
+            self.add(name, timer)
+
+    def iterate(self, name, iterable):
+        """
+        Time every step of iterable (e.g. reading a sheet in chunks) as stage
+        name
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def countInstances(self, counts):
+        """
+        Add the number of instances created of every type ({type: number})
+        """
+        with self.lock:
+            for type_name, number in counts.items():
+                self.instances[type_name] = self.instances.get(type_name, 0) + number
+
+    def request(self, method, status, seconds):
+        """
+        Add one request to the KG with its status code (None if there was no
+        response) and latency
+        """
+        status = "error" if status is None else str(status)
+        bucket = next((str(bound) for bound in LATENCY_BUCKETS if seconds <= bound), "inf")
+        with self.lock:
+            total = self.requests.get(status) or self.requests.setdefault(status, _requestTotal())
+            total["count"] += 1
+            total["seconds"] += seconds
+            total["max"] = max(total["max"], seconds)
+            total["methods"][method] = total["methods"].get(method, 0) + 1
+            total["histogram"][bucket] = total["histogram"].get(bucket, 0) + 1
+
+    def merge(self, report):
+        """
+        Add the stages, instances and requests of another report (of a
+        worker process)
+        """
+        for name, stage in report["stages"].items():
+            timer = Timer()
+            timer.calls, timer.wall, timer.cpu = stage["calls"], stage["wall"], stage["cpu"]
+            self.add(name, timer)
+        self.countInstances(report["instances"])
+        with self.lock:
+            for status, other in report["requests"].items():
+                total = self.requests.get(status) or self.requests.setdefault(status, _requestTotal())
+                total["count"] += other["count"]
+                total["seconds"] += other["seconds"]
+                total["max"] = max(total["max"], other["max"])
+                for key in ["methods", "histogram"]:
+                    for name, number in other[key].items():
+                        total[key][name] = total[key].get(name, 0) + number
+
+    @contextlib.contextmanager
+    def capture(self, cpu=True, memory=False, top=30, profileFile=None):
+        """
+
+        Parameters
+        ----------
+        cpu : boolean
+            Profile the with block with cProfile (only the calling thread,
+            not the writer threads, worker processes or requests)
+        memory : boolean
+            Trace the memory allocations of the with block with tracemalloc
+        top : int
+            Number of functions and lines kept in the report
+        profileFile : string
+            If given, the cProfile statistics are also saved to this file
+            (for pstats or snakeviz)
+        """
+        profiler = cProfile.Profile() if cpu else None
+        tracing = memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield self
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self.profile["cpu"] = _topFunctions(profiler, top)
+                if profileFile is not None:
+                    profiler.dump_stats(profileFile)
+            if memory:
+                snapshot = tracemalloc.take_snapshot()
+                self.profile["memory"] = {"peak": tracemalloc.get_traced_memory()[1],
+                                          "top": [{"line": str(stat.traceback[0]), "size": stat.size,
+                                                   "count": stat.count}
+                                                  for stat in snapshot.statistics("lineno")[:top]]}
+                if tracing:
+                    tracemalloc.stop()
+
+    def report(self):
+        """
+        The report of the run as a dictionary
+        """
+        with self.lock:
+            requests = {}
+            for status, total in self.requests.items():
+                requests[status] = dict(total, mean=total["seconds"] / total["count"] if total["count"] else 0.0)
+            return {"started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                    "wall": time.time() - self.started,
+                    "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                    "instances": dict(self.instances),
+                    "requests": requests,
+                    "latencyBuckets": LATENCY_BUCKETS,
+                    "profile": dict(self.profile)}
+
+
+def _requestTotal():
+    # Every bucket is in the histogram, in the order of LATENCY_BUCKETS
+    return {"count": 0, "seconds": 0.0, "max": 0.0, "methods": {},
+            "histogram": {str(bound): 0 for bound in LATENCY_BUCKETS + ["inf"]}}
+
+
+def _topFunctions(profiler, top):
+    stats = pstats.Stats(profiler)
+    functions = []
+    for (file_name, line, function), (calls, _, total, cumulative, _) in stats.stats.items():
+        functions.append({"function": file_name + ":" + str(line) + "(" + function + ")",
+                          "calls": calls, "total": total, "cumulative": cumulative})
+    functions.sort(key=lambda entry: entry["cumulative"], reverse=True)
+    return functions[:top]
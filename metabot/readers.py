@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Functions to read specimen sheets from CSV, JSON, JSON-lines, Parquet and
+Excel files. CSV, JSON-lines and Parquet files are read with pyarrow when it
+is installed (much faster than read_excel on large sheets), and huge files
+can be read in chunks that each hold whole specimen.
+
+Functions:
+-------
+    readSheet :
+        read a specimen sheet in one go
+    readChunks :
+        read a specimen sheet in chunks of whole specimen
+    mergeInfo :
+        merge subject and sample metadata into one sheet
+"""
+
+import importlib.util
+import os
+
+CSV = [".csv", ".tsv"]
+JSON_LINES = [".jsonl", ".ndjson"]
+JSON = [".json"]
+PARQUET = [".parquet", ".pq"]
+EXCEL = [".xlsx", ".xls"]
+
+# Keep the values as they are in the file, pandas would otherwise turn names
+# like "170529_1" into numbers
+JSON_OPTIONS = {"dtype": False, "convert_dates": False}
+
+# Columns of the sample rows that are taken from the specimen they descend from
+INHERITED_COLUMNS = ["strainName", "strainAtid", "biologicalSex"]
+
+
+def _hasPyarrow():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _extension(fname):
+    extension = os.path.splitext(fname)[1].lower()
+    if extension not in CSV + JSON_LINES + JSON + PARQUET + EXCEL:
+        raise ValueError("Unknown file type " + extension + ", use a CSV, JSON, JSON-lines, Parquet or Excel file")
+    return extension
+
+
+def readSheet(fname, columns=None):
+    """
+
+    Parameters
+    ----------
+    fname : string
+        Location of the sheet (.csv, .tsv, .json, .jsonl, .ndjson, .parquet
+        or .xlsx). A JSON file holds a list of rows ({"column": value})
+    columns : List
+        Only read these columns (by default all)
+    Returns
+    -------
+    df : Pandas DataFrame
+        DataFrame containing specimen metadata
+    """
+    import pandas as pd
+    extension = _extension(fname)
+    engine = "pyarrow" if _hasPyarrow() else None
+    if extension in CSV:
+        sep = "\t" if extension == ".tsv" else ","
+        df = pd.read_csv(fname, sep=sep, usecols=columns, engine=engine or "c")
+    elif extension in JSON_LINES:
+        try:
+            df = pd.read_json(fname, lines=True, engine=engine or "ujson", **JSON_OPTIONS)
+        except ValueError:
+            # pyarrow needs one type per column, names are often numbers and text
+            df = pd.read_json(fname, lines=True, **JSON_OPTIONS)
+    elif extension in JSON:
+        df = pd.read_json(fname, orient="records", **JSON_OPTIONS)
+    elif extension in PARQUET:
+        df = pd.read_parquet(fname, columns=columns)
+    else:
+        df = pd.read_excel(fname, usecols=columns)
+
+    if columns is not None:
+        df = df[columns]
+    return df
+
+
+def _rawChunks(fname, extension, chunksize, columns):
+    import pandas as pd
+    if extension in CSV:
+        sep = "\t" if extension == ".tsv" else ","
+        yield from pd.read_csv(fname, sep=sep, usecols=columns, chunksize=chunksize)
+    elif extension in JSON_LINES:
+        yield from pd.read_json(fname, lines=True, chunksize=chunksize, **JSON_OPTIONS)
+    elif extension in PARQUET:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(fname).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        # JSON and Excel files can only be read in one go
+        df = readSheet(fname, columns)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+
+
+def readChunks(fname, chunksize=10000, columns=None):
+    """
+
+    Parameters
+    ----------
+    fname : string
+        Location of the sheet, see readSheet
+    chunksize : int
+        Number of rows read at a time
+    columns : List
+        Only read these columns (by default all)
+    Yields
+    ------
+    chunk : Pandas DataFrame
+        About chunksize rows (index starting at 0) of the sheet. The rows of
+        a specimen are never split over two chunks, as long as they are next
+        to each other in the sheet (as in the template). The chunks can be
+        passed on to makeSubjectCollections and makeSampleCollections
+    """
+    import pandas as pd
+    extension = _extension(fname)
+    rest = None
+    for chunk in _rawChunks(fname, extension, chunksize, columns):
+        if columns is not None:
+            chunk = chunk[columns]
+        if rest is not None:
+            chunk = pd.concat([rest, chunk], ignore_index=True)
+
+        # Keep the rows of the last specimen back, more of them can follow
+        last = chunk.name.iloc[-1]
+        end = len(chunk)
+        while end > 0 and chunk.name.iloc[end - 1] == last:
+            end -= 1
+        if end == 0:
+            rest = chunk
+            continue
+        rest = chunk.iloc[end:]
+        yield chunk.iloc[:end].reset_index(drop=True)
+
+    if rest is not None and len(rest):
+        yield rest.reset_index(drop=True)
+
+
+def mergeInfo(subject_info, sample_info):
+    """
+
+    Parameters
+    ----------
+    subject_info : Pandas DataFrame
+        DataFrame containing subject (and subject group) metadata
+    sample_info : Pandas DataFrame
+        DataFrame containing sample metadata
+    Returns
+    -------
+    df : Pandas DataFrame
+        One specimen sheet with the subjects first. Empty strainName,
+        strainAtid and biologicalSex values of the samples are taken from the
+        specimen they descend from (the first one in descendedFrom)
+    """
+    import pandas as pd
+    df = pd.concat([subject_info, sample_info], ignore_index=True)
+    if "descendedFrom" not in df.columns or "timePointName" not in df.columns:
+        return df
+
+    parent = df.descendedFrom.map(lambda ref: ref.split(",")[0].strip() if isinstance(ref, str) else ref)
+    states = df.dropna(subset=["timePointName"]).drop_duplicates("timePointName").timePointName
+    position = pd.Series(states.index, index=states.to_numpy())
+    parent = parent.map(position)
+
+    # Samples can descend from samples, fill in one generation at a time
+    for column in [column for column in INHERITED_COLUMNS if column in df.columns]:
+        for _ in range(len(df)):
+            missing = df[column].isna() & parent.notna()
+            if not missing.any():
+                break
+            values = df[column].to_numpy()[parent[missing].astype(int).to_numpy()]
+            if pd.isna(values).all():
+                break
+            df.loc[missing, column] = values
+    return df
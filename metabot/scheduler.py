@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Functions to order openMINDS instances by their references, so that an
+instance is only sent to the KG after the instances it links to
+(studiedState, isPartOf, descendedFrom, ...)
+
+Functions:
+-------
+    referencedUUIDs :
+        UUIDs of all instances an instance links to
+    dependencyWaves :
+        group instances into waves that can be uploaded concurrently
+"""
+
+
+def _uuid(atid):
+    return atid.rstrip("/").split("/")[-1]
+
+
+def referencedUUIDs(instance):
+    """
+    Collect the UUIDs of every {"@id": ...} link in the properties of an
+    instance (the @id of the instance itself is skipped)
+    """
+    uuids = set()
+    stack = [value for key, value in instance.items() if key != "@id"]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            if "@id" in value:
+                uuids.add(_uuid(value["@id"]))
+            stack.extend(v for k, v in value.items() if k != "@id")
+        elif isinstance(value, list):
+            stack.extend(value)
+    return uuids
+
+
+def dependencyWaves(instances):
+    """
+
+    Parameters
+    ----------
+    instances : List
+        JSON-LD instances (dictionaries) that will be uploaded
+    Returns
+    -------
+    waves : List
+        Lists of positions in instances. Every instance only links to
+        instances in earlier waves (links to instances outside of the list
+        are ignored). Instances on a reference cycle are put in a last wave.
+    """
+    position = {}
+    for i, instance in enumerate(instances):
+        position[_uuid(instance["@id"])] = i
+
+    # Count for each instance how many of the instances it links to still need
+    # to be uploaded, and remember who is waiting for whom
+    waiting = [0] * len(instances)
+    children = [[] for _ in instances]
+    for i, instance in enumerate(instances):
+        for uuid in referencedUUIDs(instance):
+            parent = position.get(uuid)
+            if parent is not None and parent != i:
+                waiting[i] += 1
+                children[parent].append(i)
+
+    waves = []
+    wave = [i for i in range(len(instances)) if waiting[i] == 0]
+    done = 0
+    while wave:
+        waves.append(wave)
+        done += len(wave)
+        next_wave = []
+        for parent in wave:
+            for child in children[parent]:
+                waiting[child] -= 1
+                if waiting[child] == 0:
+                    next_wave.append(child)
+        wave = next_wave
+
+    if done < len(instances):
+        waves.append([i for i in range(len(instances)) if waiting[i] > 0])
+
+    return waves
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy loading of the openMINDS package. The openMINDS package is only imported
+and set up when the first collection is created, so jobs that only upload or
+delete instances do not pay for it:
+
+    - the openMINDS repository is only cloned or pulled when it is missing,
+      or when an update is asked for
+    - one openMINDS Helper is made per process and version, and shared by
+      all wrappers
+    - the collection class that Helper.create_collection builds (reading
+      every schema file) is kept, later collections are new objects of the
+      same class
+
+Functions:
+-------
+    loadHelper :
+        set up openMINDS and return the shared openMINDS Helper
+    createCollection :
+        create a new, empty openMINDS collection
+"""
+
+import json
+import os
+from pathlib import Path
+
+DEFAULT_VERSION = "v3"
+
+_state = {}
+
+
+def loadHelper(version=DEFAULT_VERSION, update=False):
+    """
+
+    Parameters
+    ----------
+    version : string
+        openMINDS version to use
+    update : boolean
+        Pull the latest openMINDS schemas, even if they were downloaded before
+    Returns
+    -------
+    helper : openMINDS.Helper
+        Helper that is shared by all wrappers of this process
+    """
+    helper = _state.get("helper")
+    if helper is not None and _state["version"] == version and not update:
+        return helper
+
+    import openMINDS
+    import openMINDS.version_manager
+
+    config_file = openMINDS.version_manager.CONFIG_FILE
+    config = None
+    if os.path.exists(config_file):
+        with open(config_file) as f:
+            config = json.load(f)
+
+    # Only go to GitHub if the schemas are not there yet
+    if update or config is None or not os.path.isdir(os.path.join(config["openMINDS_directory"], version)):
+        target_dir = config["openMINDS_directory"] if config else os.path.join(
+            Path.home(), openMINDS.version_manager.DEFAULT_DIRECTORY)
+        openMINDS.version_manager.init(target_dir)
+        config = None
+    if config is None or config.get("selected_version") != version:
+        openMINDS.version_manager.version_selection(version)
+
+    helper = openMINDS.Helper()
+    _state.update(helper=helper, version=version, collection=None)
+    return helper
+
+
+def createCollection(helper=None):
+    """
+    Create a new, empty collection. The first collection of a helper is made
+    by the helper, the next ones are new objects of its class.
+    """
+    if helper is None:
+        helper = loadHelper()
+    if _state.get("collection_helper") is not helper:
+        collection = helper.create_collection()
+        _state.update(collection=type(collection), collection_helper=helper)
+        return collection
+    return _state["collection"](helper.core, helper.SANDS)
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Writing the instance files. An InstanceWriter takes the instances of the
+collections as they are created and writes them through a pool of threads,
+every file to a temporary file first that is then renamed, so a crash never
+leaves half-written instances behind. The files that were written are listed
+in a manifest (manifest.csv in the output folder) that upload, delete and
+bulkDelete can read instead of searching the folder.
+
+Classes:
+-------
+    InstanceWriter :
+        write the instances of collections with a pool of threads
+Functions:
+-------
+    writeAtomic :
+        write a file through a temporary file
+    updateManifest :
+        add the written instances to the manifest of an output folder
+    readManifest :
+        read the manifest of an output folder
+    manifestFiles :
+        the instance files listed in a manifest, or found in an output folder
+"""
+
+import collections
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .log import logger
+
+MANIFEST = "manifest.csv"
+MANIFEST_COLUMNS = ["uuid", "path", "type", "sha256"]
+
+CONTEXT = {"@vocab": "https://openminds.ebrains.eu/vocab/"}
+
+# Levels of a sheet can be created at the same time, they share the manifest
+_manifest_lock = threading.Lock()
+
+# Mode of the written files, the temporary files of mkstemp can only be read
+# by their owner. The umask can only be read by setting it, so this is done
+# once before any thread writes
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0o666 & ~_umask
+
+
+def writeAtomic(file_name, content):
+    """
+    Write content (a string) to file_name through a temporary file in the
+    same folder. Nothing is written if the file already has this content.
+    The file gets the mode of a file created with open (FILE_MODE).
+    """
+    if os.path.exists(file_name):
+        with open(file_name) as f:
+            if f.read() == content:
+                return
+    folder, name = os.path.split(file_name)
+    handle, temporary = tempfile.mkstemp(dir=folder or ".", prefix="." + name, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "w") as f:
+            f.write(content)
+        os.chmod(temporary, FILE_MODE)
+        os.replace(temporary, file_name)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def _writeFiles(files):
+    for file_name, content in files:
+        writeAtomic(file_name, content)
+
+
+def instanceContent(instance):
+    """
+    JSON-LD text of an instance of a JsonLdCollection or an openMINDS
+    collection, the same text the collections save
+    """
+    if hasattr(instance, "content"):
+        return instance.content()
+    data = {key: value for key, value in instance.get_dict().items() if value is not None}
+    data["@context"] = CONTEXT
+    return json.dumps(data)
+
+
+class InstanceWriter:
+    def __init__(self, output_path, workers=8, pending=256):
+        """
+
+        Parameters
+        ----------
+        output_path : string
+            Location the instances are saved in, every type in its own folder
+        workers : int
+            Number of files that are written at the same time, with 0 the
+            files are written one by one in the calling thread
+        pending : int
+            Number of collections that can wait to be written, save waits
+            for the oldest ones when there are more
+        """
+        self.output_path = output_path
+        self.pool = ThreadPoolExecutor(max_workers=workers) if workers else None
+        self.pending = collections.deque()
+        self.max_pending = max(1, pending)
+        self.folders = set()
+        self.entries = []
+
+    def _prepare(self, type_name, uuid, content):
+        folder = os.path.join(self.output_path, type_name)
+        if folder not in self.folders:
+            os.makedirs(folder, exist_ok=True)
+            self.folders.add(folder)
+
+        self.entries.append({"uuid": uuid,
+                             "path": type_name + "/" + uuid + ".jsonld",
+                             "type": type_name,
+                             "sha256": hashlib.sha256(content.encode("utf-8")).hexdigest()})
+        return os.path.join(folder, uuid + ".jsonld"), content
+
+    def _submit(self, files):
+        if self.pool is None:
+            _writeFiles(files)
+            return
+        self.pending.append(self.pool.submit(_writeFiles, files))
+        while len(self.pending) > self.max_pending:
+            self.pending.popleft().result()
+
+    def write(self, type_name, uuid, content):
+        """
+        Write one instance (JSON-LD text) to <output_path>/<type_name>/<uuid>.jsonld
+        """
+        self._submit([self._prepare(type_name, uuid, content)])
+
+    def save(self, collection):
+        """
+        Write all instances of a JsonLdCollection or an openMINDS collection,
+        the files of one collection are written by one thread
+        """
+        self._submit([self._prepare(instance.type_name, str(instance.UUID), instanceContent(instance))
+                      for instance in collection.data.values()])
+
+    def close(self):
+        """
+        Wait until every file is written, raises the first error of a write
+        """
+        try:
+            while self.pending:
+                self.pending.popleft().result()
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _manifestPath(path):
+    return path if path.endswith(".csv") else os.path.join(path, MANIFEST)
+
+
+def readManifest(path):
+    """
+    Read the manifest (uuid, path, type, sha256) of an output folder, path is
+    the folder or the manifest file. Empty if there is no manifest.
+    """
+    import pandas as pd
+    path = _manifestPath(path)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=MANIFEST_COLUMNS)
+    return pd.read_csv(path, dtype=str)
+
+
+def updateManifest(output_path, entries, removed=()):
+    """
+    Add the entries of an InstanceWriter to the manifest of output_path
+    (replacing older entries of the same UUIDs) and leave out the UUIDs in
+    removed
+    """
+    import pandas as pd
+    with _manifest_lock:
+        manifest = readManifest(output_path)
+        manifest = pd.concat([manifest, pd.DataFrame(entries, columns=MANIFEST_COLUMNS)], ignore_index=True)
+        manifest = manifest.drop_duplicates("uuid", keep="last")
+        manifest = manifest[~manifest.uuid.isin(list(removed))]
+        writeAtomic(_manifestPath(output_path), manifest.to_csv(index=False))
+    return manifest
+
+
+def manifestFiles(path):
+    """
+    Locations of the instance files in the manifest of an output folder,
+    path is the folder or the manifest file. Without a manifest (e.g. a
+    folder written by an older version) the <type>/<uuid>.jsonld files of
+    the folder are used, raises FileNotFoundError if there are none
+    """
+    path = _manifestPath(path)
+    folder = os.path.dirname(path)
+    if os.path.exists(path):
+        return [os.path.join(folder, *file.split("/")) for file in readManifest(path).path]
+    files = sorted(glob.glob(os.path.join(folder, "*", "*.jsonld")))
+    if not files:
+        raise FileNotFoundError("No " + MANIFEST + " or instance files in " + (folder or "."))
+    logger.warning("No " + MANIFEST + " in " + (folder or ".") + ", using the " + str(len(files))
+                   + " instance files found in it")
+    return files
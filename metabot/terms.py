@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+File containing the TermResolver class, which turns the names of openMINDS
+controlled terms and brain atlas regions into instance IRIs. The names that
+exist in openMINDS are read once from a local snapshot of the openMINDS
+instances repository (one JSON file per version), and every IRI that was
+resolved is remembered, so each name is only looked up once for all rows
+and sheets.
+
+Classes:
+-------
+    TermResolver :
+        resolve and validate controlled term and brain region IRIs
+Functions:
+-------
+    downloadSnapshot :
+        save the list of openMINDS instances of a version as a local snapshot
+    defaultResolver :
+        the resolver shared by all wrappers
+"""
+
+import json
+import os
+import time
+
+from .log import logger
+from .validate import AGE_CATEGORY, AGE_UNITS, BIOLOGICAL_SEX, WEIGHT_UNITS
+
+OM_PREFIX = "https://openminds.ebrains.eu/instances/"
+
+INSTANCES_REPO = "openMetadataInitiative/openMINDS_instances"
+DEFAULT_VERSION = "main"
+# Folder of the openMINDS version in the instances repository
+# (instances/<openMINDS version>/...)
+DEFAULT_OPENMINDS = "latest"
+SNAPSHOT_FOLDER = os.path.join(os.path.expanduser("~"), ".cache", "metabot")
+
+# Folders of the instances repository that do not use the name of the type
+FOLDER_TYPES = {"parcellationEntities": "parcellationEntity",
+                "parcellationEntityVersions": "parcellationEntityVersion"}
+
+# Brain atlases whose region names are linked as parcellation entity versions,
+# used when a region is not in the snapshot
+VERSIONED_ATLASES = ["AMBA"]
+VERSIONED_WHSSD = ["v1-01", "v2", "v3-01", "v3", "v4"]
+ENTITY_ATLASES = ["WHSSD", "JBA", "DWMA"]
+
+# Organs that can be the origin of a sample, other origins are cell types
+ORGANS = ["brain", "muscle"]
+
+# Terms of the template, these are the only names accepted for their type
+# when the snapshot does not list it
+TEMPLATE_TERMS = {"unitOfMeasurement": frozenset(AGE_UNITS + WEIGHT_UNITS),
+                  "biologicalSex": frozenset(BIOLOGICAL_SEX),
+                  "ageCategory": frozenset(AGE_CATEGORY)}
+
+
+def snapshotPath(version=DEFAULT_VERSION, folder=SNAPSHOT_FOLDER, openMINDS=DEFAULT_OPENMINDS):
+    return os.path.join(folder, "openMINDS_instances_" + version + "_" + openMINDS + ".json")
+
+
+def downloadSnapshot(version=DEFAULT_VERSION, folder=SNAPSHOT_FOLDER, openMINDS=DEFAULT_OPENMINDS):
+    """
+
+    Parameters
+    ----------
+    version : string
+        Branch, tag or commit of the openMINDS instances repository
+    folder : string
+        Folder in which the snapshot is saved
+    openMINDS : string
+        openMINDS version whose instances are saved, the name of its folder
+        in the repository (e.g. "latest" or "v3.0")
+    Returns
+    -------
+    path : string
+        Location of the snapshot, a JSON file with the commit and the names
+        of the instances of each type
+    """
+    import requests
+    url = "https://api.github.com/repos/" + INSTANCES_REPO + "/git/trees/" + version
+    response = requests.get(url, params={"recursive": "1"}, timeout=60)
+    response.raise_for_status()
+    tree = response.json()
+    if tree.get("truncated"):
+        raise RuntimeError("The file list of " + INSTANCES_REPO + " (" + version + ") returned by GitHub "
+                           "is truncated, the snapshot would miss instances")
+
+    terms = {}
+    versions = set()
+    for item in tree["tree"]:
+        parts = item["path"].split("/")
+        # instances/<openMINDS version>/<folder>/[<type or atlas>/]<name>.jsonld
+        if item["type"] != "blob" or len(parts) < 4 or parts[0] != "instances" or not parts[-1].endswith(".jsonld"):
+            continue
+        versions.add(parts[1])
+        if parts[1] != openMINDS:
+            continue
+        if parts[2] == "terminologies":
+            if len(parts) < 5:
+                continue
+            termType = parts[3]
+        else:
+            termType = FOLDER_TYPES.get(parts[2])
+            if termType is None:
+                continue
+        terms.setdefault(termType, set()).add(parts[-1][:-len(".jsonld")])
+    if not terms:
+        raise ValueError("No instances of openMINDS " + openMINDS + " in " + INSTANCES_REPO + " (" + version
+                         + "), available versions: " + ", ".join(sorted(versions)))
+
+    snapshot = {"version": version,
+                "openMINDS": openMINDS,
+                "commit": tree["sha"],
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "terms": {termType: sorted(names) for termType, names in terms.items()}}
+
+    os.makedirs(folder, exist_ok=True)
+    path = snapshotPath(version, folder, openMINDS)
+    with open(path, "w") as f:
+        json.dump(snapshot, f)
+    logger.info("Saved " + str(sum(len(names) for names in terms.values())) + " openMINDS " + openMINDS
+                + " instances of " + version + " (" + tree["sha"][:7] + ") to " + path)
+    return path
+
+
+class TermResolver:
+    def __init__(self, snapshot=None):
+        """
+
+        Parameters
+        ----------
+        snapshot : string
+            Location of a snapshot made with downloadSnapshot. Without a
+            snapshot (or for types that are not in it) the names are checked
+            against TEMPLATE_TERMS, the IRIs of other types are made from the
+            names without checking them
+        """
+        self.snapshot = snapshot
+        self.version = None
+        self.terms = {}
+        self.cache = {}
+
+        if snapshot is not None:
+            with open(snapshot) as f:
+                content = json.load(f)
+            self.version = content.get("commit", content.get("version"))
+            self.terms = {termType: frozenset(names) for termType, names in content["terms"].items()}
+
+    def knows(self, termType):
+        """
+        True if the snapshot lists the instances of this type
+        """
+        return termType in self.terms
+
+    def exists(self, termType, name):
+        """
+        False if the snapshot (or else the template) lists the instances of
+        this type and the name is not one of them
+        """
+        names = self.terms.get(termType, TEMPLATE_TERMS.get(termType))
+        return names is None or name in names
+
+    def iri(self, termType, name):
+        """
+        IRI of the instance with this name, raises ValueError for empty names
+        and names that are not in the snapshot
+        """
+        key = (termType, name)
+        iri = self.cache.get(key)
+        if iri is None:
+            if not isinstance(name, str) or not name.strip():
+                raise ValueError("No " + termType + " given (" + repr(name) + ")")
+            if not self.exists(termType, name):
+                raise ValueError("Unknown " + termType + ": " + str(name))
+            iri = self.cache[key] = OM_PREFIX + termType + "/" + name
+        return iri
+
+    def link(self, termType, name):
+        return {"@id": self.iri(termType, name)}
+
+    def links(self, termType, names):
+        """
+        List of links for a list of names, or None if there are no names
+        """
+        if not names:
+            return None
+        return [self.link(termType, name) for name in names]
+
+    def regionType(self, region):
+        """
+        Whether a brain region is linked as a parcellationEntityVersion or a
+        parcellationEntity
+        """
+        key = ("region", region)
+        termType = self.cache.get(key)
+        if termType is None:
+            for termType in ["parcellationEntityVersion", "parcellationEntity"]:
+                if region in self.terms.get(termType, ()):
+                    break
+            else:
+                atlas = region.split("_")
+                if (atlas[0] in VERSIONED_ATLASES or region.split("-")[0] == "JBA"
+                        or (atlas[0] == "WHSSD" and len(atlas) > 1 and atlas[1] in VERSIONED_WHSSD)):
+                    termType = "parcellationEntityVersion"
+                elif atlas[0] in ENTITY_ATLASES:
+                    termType = "parcellationEntity"
+                else:
+                    raise ValueError("Unknown brain region: " + str(region))
+            self.cache[key] = termType
+        return termType
+
+    def region(self, region):
+        return self.iri(self.regionType(region), region)
+
+    def originType(self, origin):
+        """
+        Whether the origin of a sample is an organ or a cellType
+        """
+        if origin in self.terms.get("organ", ORGANS):
+            return "organ"
+        return "cellType"
+
+    def origin(self, origin):
+        return self.iri(self.originType(origin), origin)
+
+
+_default = {}
+
+
+def defaultResolver(snapshot=None):
+    """
+    Resolver shared by all wrappers, one per snapshot. Without a snapshot the
+    snapshot of the default version is used if it was downloaded before.
+    """
+    if snapshot is None:
+        path = snapshotPath()
+        snapshot = path if os.path.exists(path) else None
+    resolver = _default.get(snapshot)
+    if resolver is None:
+        resolver = _default[snapshot] = TermResolver(snapshot)
+    return resolver
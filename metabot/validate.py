@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Column-wise validation and parsing of a specimen sheet. The whole sheet is
+checked once before any instance is created, so a sheet with mistakes fails
+before the first file is written, with all mistakes listed in one table.
+
+Functions:
+-------
+    parseValues :
+        parse a column of whole values and value ranges ("6", "6-8")
+    splitList :
+        split a column of comma separated lists
+    checkNames :
+        check the names in a column against a TermResolver
+    validateSheet :
+        check a specimen sheet and add the parsed columns
+"""
+
+SPECIMEN_TYPES = ["subject", "subjectGroup", "tsc", "ts"]
+
+# openMINDS controlled terms that can be used in the sheet
+BIOLOGICAL_SEX = ["female", "male", "hermaphrodite", "notDetectable"]
+AGE_CATEGORY = ["adolescent", "adult", "embryo", "infant", "juvenile", "lateAdult",
+                "neonate", "perinatal", "prenatal", "primeAdult", "youngAdult"]
+# Units of the template, used to check the units when there is no snapshot
+AGE_UNITS = ["millisecond", "second", "minute", "hour", "day", "week", "month", "year"]
+WEIGHT_UNITS = ["microgram", "milligram", "gram", "kilogram"]
+
+REQUIRED_COLUMNS = ["specimenType", "name", "timePoint"]
+# Columns that the instances are made from, a sheet without them is created
+# as if they were empty
+OPTIONAL_COLUMNS = ["internalID", "strainName", "strainAtid", "timePointName", "biologicalSex", "ageCategory",
+                    "ageValue", "ageUnit", "weightValue", "weightUnit", "attribute", "sampleType", "region",
+                    "origin", "quantity", "isPartOf", "descendedFrom", "remarks"]
+
+ERROR_COLUMNS = ["row", "name", "column", "value", "message", "level"]
+
+
+def parseValues(values):
+    """
+    Parse a column with single values ("6") and value ranges ("6-8")
+
+    Returns
+    -------
+    parsed : Pandas DataFrame
+        columns min and max (equal for single values), isRange, invalid for
+        cells that are filled in but could not be parsed, fraction for
+        values that are not whole numbers and reversed for ranges whose
+        minimum is larger than their maximum
+    """
+    import numpy as np
+    import pandas as pd
+    text = values.astype("string").str.strip()
+    parts = text.str.split("-", n=1, expand=True).reindex(columns=[0, 1])
+
+    low = pd.to_numeric(parts[0], errors="coerce")
+    high = pd.to_numeric(parts[1], errors="coerce")
+    isRange = parts[1].notna().to_numpy()
+
+    parsed = pd.DataFrame({"min": low,
+                           "max": np.where(isRange, high, low),
+                           "isRange": isRange}, index=values.index)
+    parsed["invalid"] = text.notna().to_numpy() & (parsed["min"].isna() | parsed["max"].isna()).to_numpy()
+    parsed["fraction"] = ((parsed["min"].notna() & (parsed["min"] % 1 != 0))
+                          | (parsed["max"].notna() & (parsed["max"] % 1 != 0)))
+    parsed["reversed"] = (parsed["min"] > parsed["max"]).fillna(False).astype(bool)
+    return parsed
+
+
+def splitList(values):
+    """
+    Split a column of comma separated lists into lists of stripped strings
+    (None for empty cells)
+    """
+    lists = values.astype("string").str.split(",")
+    return lists.map(lambda items: None if not isinstance(items, list)
+                     else [item.strip() for item in items if item.strip()]).astype(object)
+
+
+def _errors(df, mask, column, message, level="error"):
+    import numpy as np
+    import pandas as pd
+    mask = np.asarray(mask, dtype=bool)
+    return pd.DataFrame({"row": df.index[mask],
+                         "name": df["name"].to_numpy()[mask] if "name" in df.columns else None,
+                         "column": column,
+                         "value": df[column].to_numpy()[mask] if column in df.columns else None,
+                         "message": message,
+                         "level": level}, columns=ERROR_COLUMNS)
+
+
+def _checkTerms(df, column, terms, errors, resolver=None, termType=None):
+    # The terms of the snapshot are used when the resolver has them, else
+    # the list
+    if column not in df.columns:
+        return
+    if resolver is not None and resolver.knows(termType):
+        checkNames(df, column, lambda name: resolver.exists(termType, name), errors)
+    else:
+        values = df[column]
+        errors.append(_errors(df, values.notna() & ~values.isin(terms), column,
+                              "Unknown term, expected one of: " + ", ".join(terms)))
+
+
+def checkNames(df, column, check, errors, message="Unknown openMINDS instance"):
+    """
+    Check every (comma separated) name in a column once with check(name),
+    which returns False or raises ValueError for unknown names, and add the
+    rows with unknown names to errors
+    """
+    if column not in df.columns:
+        return
+    lists = splitList(df[column])
+    unknown = set()
+    for name in lists.explode().dropna().unique():
+        try:
+            if not check(name):
+                unknown.add(name)
+        except ValueError:
+            unknown.add(name)
+    if unknown:
+        mask = lists.map(lambda names: names is not None and not unknown.isdisjoint(names))
+        errors.append(_errors(df, mask, column, message))
+
+
+def validateSheet(df, resolver=None, check=True):
+    """
+
+    Parameters
+    ----------
+    df : Pandas DataFrame
+        DataFrame containing specimen metadata
+    resolver : TermResolver
+        Resolver used to check the controlled terms and brain regions. The
+        terms that are not in its snapshot are checked against the lists in
+        this module
+    check : boolean
+        If False, the sheet is only parsed (for a sheet that was checked
+        before) and errors is empty
+    Returns
+    -------
+    parsed : Pandas DataFrame
+        Copy of df with the parsed columns added: ageMin, ageMax, ageRange,
+        weightMin, weightMax, weightRange, attributeList and quantityValue.
+        The OPTIONAL_COLUMNS that df does not have are added empty
+    errors : Pandas DataFrame
+        One row per mistake with the row, name, column, value, message and
+        level: "error" for mistakes that stop the sheet from being created,
+        "warning" for values that are used as they are
+    """
+    import pandas as pd
+    errors = []
+    if check:
+        for column in REQUIRED_COLUMNS:
+            if column not in df.columns:
+                errors.append(pd.DataFrame([[None, None, column, None, "Column is missing", "error"]],
+                                           columns=ERROR_COLUMNS))
+            else:
+                errors.append(_errors(df, df[column].isna(), column, "Required value is missing"))
+
+    missing = [column for column in OPTIONAL_COLUMNS if column not in df.columns]
+    df = df.reindex(columns=list(df.columns) + missing)
+    parsed = df.copy()
+
+    if check:
+        _checkTerms(df, "specimenType", SPECIMEN_TYPES, errors)
+        _checkTerms(df, "biologicalSex", BIOLOGICAL_SEX, errors, resolver, "biologicalSex")
+        _checkTerms(df, "ageCategory", AGE_CATEGORY, errors, resolver, "ageCategory")
+
+        # Subject states can only be made with an age category, samples
+        # with a type and an origin
+        if "specimenType" in df.columns:
+            subjects = df.specimenType.isin(["subject", "subjectGroup"])
+            samples = df.specimenType.isin(["tsc", "ts"])
+            for column, rows in [("ageCategory", subjects), ("sampleType", samples), ("origin", samples)]:
+                errors.append(_errors(df, rows & df[column].isna(), column, "Required value is missing"))
+
+    for quantity, units in [("age", AGE_UNITS), ("weight", WEIGHT_UNITS)]:
+        valueColumn = quantity + "Value"
+        unitColumn = quantity + "Unit"
+        values = parseValues(df[valueColumn])
+        parsed[quantity + "Min"] = values["min"]
+        parsed[quantity + "Max"] = values["max"]
+        parsed[quantity + "Range"] = values["isRange"]
+        if not check:
+            continue
+        errors.append(_errors(df, values["invalid"], valueColumn,
+                              "Not a number or a range of numbers (e.g. 6 or 6-8)"))
+        errors.append(_errors(df, values["fraction"], valueColumn, "Not a whole number"))
+        errors.append(_errors(df, values["reversed"], valueColumn,
+                              "The minimum of the range is larger than the maximum"))
+        _checkTerms(df, unitColumn, units, errors, resolver, "unitOfMeasurement")
+        errors.append(_errors(df, df[valueColumn].notna() & df[unitColumn].isna(), unitColumn,
+                              "No unit given for " + valueColumn))
+        errors.append(_errors(df, df[valueColumn].isna() & df[unitColumn].notna(), valueColumn,
+                              "A value is required when " + unitColumn + " is filled in"))
+
+    parsed["attributeList"] = splitList(df.attribute)
+
+    if check and resolver is not None:
+        # Attributes of subjects and samples are different terminologies
+        if "attribute" in df.columns and "specimenType" in df.columns:
+            subjects = df.specimenType.isin(["subject", "subjectGroup"])
+            checkNames(df[subjects], "attribute", lambda name: resolver.exists("subjectAttribute", name), errors)
+            checkNames(df[~subjects], "attribute", lambda name: resolver.exists("tissueSampleAttribute", name), errors)
+        checkNames(df, "sampleType", lambda name: resolver.exists("tissueSampleType", name), errors)
+        checkNames(df, "origin", lambda name: resolver.iri(resolver.originType(name), name), errors)
+        checkNames(df, "region", resolver.region, errors, "Unknown brain region")
+
+    parsed["quantityValue"] = pd.to_numeric(df.quantity, errors="coerce")
+    if check:
+        errors.append(_errors(df, df.quantity.notna() & parsed.quantityValue.isna(), "quantity",
+                              "Not a number"))
+        errors.append(_errors(df, parsed.quantityValue.notna() & (parsed.quantityValue % 1 != 0), "quantity",
+                              "Not a whole number"))
+
+    errors = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(columns=ERROR_COLUMNS)
+    return parsed, errors
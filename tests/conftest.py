@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures shared by the tests: a local stand-in for the KG instances endpoint
+(benchmarks/kg_standin.py) and small instance files to upload.
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from kg_standin import startServer  # noqa: E402
+
+LOCAL_PREFIX = "https://localhost/"
+VOCAB = "https://openminds.ebrains.eu/core/"
+
+
+@pytest.fixture
+def server():
+    server = startServer(latency=0.0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def writeInstance(folder, type_name, uuid, **properties):
+    os.makedirs(os.path.join(folder, type_name), exist_ok=True)
+    path = os.path.join(folder, type_name, uuid + ".jsonld")
+    instance = {"@id": LOCAL_PREFIX + type_name + "/" + uuid,
+                "@type": VOCAB + type_name[0].upper() + type_name[1:],
+                "@context": {"@vocab": "https://openminds.ebrains.eu/vocab/"}}
+    instance.update(properties)
+    with open(path, "w") as f:
+        json.dump(instance, f)
+    return path
+
+
+@pytest.fixture
+def instances(tmp_path):
+    """
+    Two subjects with one state each, the subjects are listed first so an
+    ordered upload has to post the states before them
+    """
+    folder = str(tmp_path)
+    subjects = [writeInstance(folder, "subject", "subject-" + str(i), lookupLabel="sub-" + str(i),
+                              studiedState=[{"@id": LOCAL_PREFIX + "subjectState/state-" + str(i)}])
+                for i in range(2)]
+    states = [writeInstance(folder, "subjectState", "state-" + str(i), lookupLabel="sub-" + str(i) + "_state")
+              for i in range(2)]
+    return subjects + states
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Parity of the two emitters: the instances written with emitter="jsonld" must
+be the same as those of the openMINDS package (when its schemas are
+available) and as the checked-in instances of examples/example_specimen.xlsx,
+apart from the UUIDs.
+"""
+
+import json
+import os
+import warnings
+
+import pandas as pd
+import pytest
+
+from bench_emitter import build, canonical, makeSheets
+from metabot import openMINDS_wrapper
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE = os.path.join(ROOT, "examples", "example_specimen.xlsx")
+EXPECTED = os.path.join(ROOT, "tests", "data", "example_specimen_instances.json")
+
+
+def openMINDSAvailable():
+    # The schemas are only used when they were downloaded before, the tests
+    # do not go to GitHub
+    try:
+        import openMINDS.version_manager
+    except ImportError:
+        return False
+    config_file = openMINDS.version_manager.CONFIG_FILE
+    if not os.path.exists(config_file):
+        return False
+    with open(config_file) as f:
+        config = json.load(f)
+    return os.path.isdir(os.path.join(config["openMINDS_directory"], "v3"))
+
+
+def example(emitter, output_path):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        df = pd.read_excel(EXAMPLE)
+    openMINDS_wrapper(emitter=emitter, verbosity="quiet").makeSpecimenCollections(df, output_path)
+    return [json.loads(instance) for instance in canonical(output_path)]
+
+
+def test_example_matches_fixture(tmp_path):
+    with open(EXPECTED) as f:
+        expected = json.load(f)
+    assert example("jsonld", str(tmp_path)) == expected
+
+
+@pytest.mark.skipif(not openMINDSAvailable(), reason="the openMINDS v3 schemas are not downloaded")
+def test_example_matches_openMINDS(tmp_path):
+    assert example("jsonld", str(tmp_path / "jsonld")) == example("openMINDS", str(tmp_path / "openMINDS"))
+
+
+@pytest.mark.skipif(not openMINDSAvailable(), reason="the openMINDS v3 schemas are not downloaded")
+def test_generated_sheets_match_openMINDS(tmp_path):
+    subject, sample = makeSheets(5)
+    outputs = {}
+    for emitter in ["jsonld", "openMINDS"]:
+        folder = str(tmp_path / emitter)
+        build(emitter, subject, sample, folder + "/")
+        outputs[emitter] = canonical(folder)
+    assert len(outputs["jsonld"]) == 5 * (1 + 2) + 5 * 4 * 2
+    assert outputs["jsonld"] == outputs["openMINDS"]
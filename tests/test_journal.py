@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+The UploadJournal on its own: recording, forgetting and periodic commits.
+"""
+
+import sqlite3
+
+from metabot.journal import UploadJournal
+
+
+def count(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT COUNT(*) FROM instances").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_commits_every_n_records(tmp_path):
+    path = str(tmp_path / "journal.sqlite")
+    journal = UploadJournal(path, commit_every=3)
+    for i in range(5):
+        journal.record("u" + str(i), "dataset", "hash", 201)
+    # Another connection only sees what was committed
+    assert count(path) == 3
+    journal.close()
+    assert count(path) == 5
+
+
+def test_failed_upload_keeps_confirmed_hash(tmp_path):
+    with UploadJournal(str(tmp_path / "journal.sqlite")) as journal:
+        journal.record("a", "dataset", "first", 201)
+        journal.record("a", "dataset", "second", 500)
+        journal.record("b", "dataset", "content", 409)
+        assert journal.confirmed("dataset") == {"a": "first", "b": None}
+        assert journal.confirmed("common") == {}
+
+
+def test_forget(tmp_path):
+    with UploadJournal(str(tmp_path / "journal.sqlite")) as journal:
+        journal.record("a", "dataset", "hash", 201)
+        journal.record("a", "common", "hash", 201)
+        journal.forget("a", "dataset")
+        assert journal.confirmed("dataset") == {}
+        assert journal.confirmed("common") == {"a": "hash"}
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+KGClient against the local stand-in of the KG: retries, the circuit breaker
+for a rejected token, 404s and query parameters.
+"""
+
+import time
+
+from metabot.kgclient import KGClient
+
+
+def test_retry_after(server):
+    server.instances["a"] = {"name": "a"}
+    server.scripted["a"] = [(429, {"Retry-After": "0.3"}), (503, {"Retry-After": "0"})]
+    # With this backoff a retry that ignored Retry-After would take minutes
+    with KGClient("token", "dataset", kg_url=server.kg_url, backoff=60.0, max_backoff=60.0) as client:
+        started = time.monotonic()
+        response = client.request("GET", "a")
+        elapsed = time.monotonic() - started
+    assert response.status_code == 200
+    assert server.log == [("GET", "a")] * 3
+    assert 0.3 <= elapsed < 5.0
+    assert client.failures == []
+
+
+def test_retries_exhausted(server):
+    server.instances["a"] = {}
+    server.scripted["a"] = [(503, {"Retry-After": "0"})] * 3
+    with KGClient("token", "dataset", kg_url=server.kg_url, retries=2) as client:
+        response = client.request("DELETE", "a")
+    assert response.status_code == 503
+    assert len(server.log) == 3
+    assert client.failures == [{"uuid": "a", "method": "DELETE", "status": 503,
+                                "message": "Service unavailable", "attempts": 3}]
+
+
+def test_rejected_token_stops_sending(server):
+    uuids = ["u" + str(i) for i in range(6)]
+    with KGClient("wrong", "dataset", kg_url=server.kg_url, workers=1, max_unauthorized=2) as client:
+        response = client.map("DELETE", uuids)
+    # Only the first two requests reach the server, the others are not sent
+    assert len(server.log) == 2
+    assert [response[uuid].status_code for uuid in uuids[:2]] == [401, 401]
+    assert all(response[uuid] is None for uuid in uuids[2:])
+    failures = client.failureTable()
+    assert failures.uuid.tolist() == uuids
+    assert (failures.message[2:] == "Not sent, the token was rejected").all()
+
+
+def test_conflict_is_a_failure(server):
+    server.instances["a"] = {}
+    with KGClient("token", "dataset", kg_url=server.kg_url) as client:
+        response = client.request("POST", "a", json={"name": "a"})
+    assert response.status_code == 409
+    assert client.failures[0]["message"] == "Instance already exists"
+
+
+def test_missing_instances(server):
+    with KGClient("token", "dataset", kg_url=server.kg_url) as client:
+        assert client.request("GET", "missing").status_code == 404
+        assert client.failures == []
+        client.request("GET", "missing", failMissing=True)
+        assert client.failures[0]["status"] == 404
+
+
+def test_params_keep_the_space(server):
+    server.instances["a"] = {}
+    with KGClient("token", "dataset", kg_url=server.kg_url) as client:
+        client.request("GET", "a", params={"stage": "IN_PROGRESS"})
+        client.request("DELETE", "a")
+    assert server.queries == [{"space": ["dataset"], "stage": ["IN_PROGRESS"]}, {"space": ["dataset"]}]
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Writing instance files and the manifest of an output folder.
+"""
+
+import os
+import stat
+
+import pytest
+
+from metabot.sink import FILE_MODE, manifestFiles, updateManifest, writeAtomic
+
+
+def test_write_atomic(tmp_path):
+    path = str(tmp_path / "instance.jsonld")
+    writeAtomic(path, "{}")
+    with open(path) as f:
+        assert f.read() == "{}"
+    assert stat.S_IMODE(os.stat(path).st_mode) == FILE_MODE
+    # Only the file itself is left
+    assert os.listdir(str(tmp_path)) == ["instance.jsonld"]
+
+
+@pytest.mark.skipif(os.name != "posix", reason="file modes are POSIX")
+def test_write_atomic_mode_follows_umask(tmp_path):
+    path = str(tmp_path / "instance.jsonld")
+    with open(str(tmp_path / "plain"), "w"):
+        pass
+    writeAtomic(path, "{}")
+    assert os.stat(path).st_mode == os.stat(str(tmp_path / "plain")).st_mode
+
+
+def test_manifest_files(tmp_path):
+    folder = str(tmp_path)
+    os.makedirs(os.path.join(folder, "subject"))
+    for uuid in ["b", "a"]:
+        writeAtomic(os.path.join(folder, "subject", uuid + ".jsonld"), "{}")
+    # Without a manifest the instance files of the folder are used
+    assert manifestFiles(folder) == [os.path.join(folder, "subject", uuid + ".jsonld") for uuid in ["a", "b"]]
+    updateManifest(folder, [{"uuid": "b", "path": "subject/b.jsonld", "type": "subject", "sha256": ""}])
+    assert manifestFiles(folder) == [os.path.join(folder, "subject", "b.jsonld")]
+
+
+def test_manifest_files_empty_folder(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        manifestFiles(str(tmp_path))
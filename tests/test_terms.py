@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+TermResolver with and without a snapshot.
+"""
+
+import json
+
+import pytest
+
+from metabot.terms import OM_PREFIX, TermResolver
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = str(tmp_path / "snapshot.json")
+    with open(path, "w") as f:
+        json.dump({"version": "main", "commit": "abc", "terms": {"unitOfMeasurement": ["stone"],
+                                                                 "organ": ["brain"]}}, f)
+    return path
+
+
+def test_template_terms_without_snapshot():
+    terms = TermResolver()
+    assert terms.link("unitOfMeasurement", "gram") == {"@id": OM_PREFIX + "unitOfMeasurement/gram"}
+    with pytest.raises(ValueError, match="Unknown unitOfMeasurement: stone"):
+        terms.link("unitOfMeasurement", "stone")
+    # Types that are not in the template are not checked
+    assert terms.exists("tissueSampleType", "anything")
+
+
+def test_snapshot_overrides_template(snapshot):
+    terms = TermResolver(snapshot)
+    assert terms.exists("unitOfMeasurement", "stone")
+    assert not terms.exists("unitOfMeasurement", "gram")
+    assert terms.origin("brain") == OM_PREFIX + "organ/brain"
+    assert terms.origin("astrocyte") == OM_PREFIX + "cellType/astrocyte"
+
+
+@pytest.mark.parametrize("name", [None, float("nan"), "", "  "])
+def test_empty_names(name):
+    with pytest.raises(ValueError, match="No biologicalSex given"):
+        TermResolver().link("biologicalSex", name)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+upload, delete, bulkDelete and add2dsv of the openMINDS_wrapper against the
+local stand-in of the KG.
+"""
+
+import pytest
+
+from metabot import openMINDS_wrapper
+from metabot.kgclient import KG_PREFIX
+
+
+@pytest.fixture
+def wrapper():
+    return openMINDS_wrapper(verbosity="warning")
+
+
+def test_upload_in_dependency_order(server, instances, wrapper):
+    response = wrapper.upload(instances, "token", "dataset", kg_url=server.kg_url, workers=2)
+    assert {uuid: result.status_code for uuid, result in response.items()} == {
+        "subject-0": 200, "subject-1": 200, "state-0": 200, "state-1": 200}
+    posted = [uuid for method, uuid in server.log]
+    assert posted.index("state-0") < posted.index("subject-0")
+    assert posted.index("state-1") < posted.index("subject-1")
+    # The links point to the KG instead of the local @ids
+    assert server.instances["subject-0"]["studiedState"] == [{"@id": KG_PREFIX + "state-0"}]
+    assert len(wrapper.failures) == 0
+
+
+def test_upload_twice_conflicts(server, instances, wrapper):
+    wrapper.upload(instances, "token", "dataset", kg_url=server.kg_url)
+    response = wrapper.upload(instances, "token", "dataset", kg_url=server.kg_url)
+    assert {result.status_code for result in response.values()} == {409}
+    assert wrapper.failures.status.tolist() == [409] * 4
+
+
+def test_delete(server, instances, wrapper):
+    wrapper.upload(instances, "token", "dataset", kg_url=server.kg_url)
+    response = wrapper.delete(instances + ["missing"], "token", "dataset", kg_url=server.kg_url)
+    assert server.instances == {}
+    assert response["missing"].status_code == 404
+    assert wrapper.failures.uuid.tolist() == ["missing"]
+
+
+def test_bulk_delete(server, instances, wrapper):
+    wrapper.upload(instances, "token", "dataset", kg_url=server.kg_url)
+    server.log.clear()
+    wrapper.bulkDelete(instances, "token", "dataset", kg_url=server.kg_url)
+    assert server.instances == {}
+    deleted = [uuid for method, uuid in server.log if method == "DELETE"]
+    # Subjects are deleted before the states they link to
+    assert deleted.index("subject-0") < deleted.index("state-0")
+
+
+def test_add2dsv(server, wrapper):
+    server.instances["dsv"] = {"studiedSpecimen": [{"@id": KG_PREFIX + "old"}]}
+    wrapper.add2dsv(["new-1", "new-2", "new-1"], "token", "dsv", "dataset", kg_url=server.kg_url, merge=True)
+    assert server.instances["dsv"]["studiedSpecimen"] == [{"@id": KG_PREFIX + uuid} for uuid in ["old", "new-1", "new-2"]]
+    wrapper.add2dsv(["new-3"], "token", "dsv", "dataset", kg_url=server.kg_url)
+    assert server.instances["dsv"]["studiedSpecimen"] == [{"@id": KG_PREFIX + "new-3"}]
+
+
+def test_add2dsv_missing_dataset_version(server, wrapper):
+    response = wrapper.add2dsv(["new"], "token", "missing", "dataset", kg_url=server.kg_url, merge=True)
+    assert response["missing"].status_code == 404
+    assert wrapper.failures.status.tolist() == [404]
+
+
+@pytest.mark.parametrize("delete", ["delete", "bulkDelete"])
+def test_journal_forgets_deleted_instances(server, instances, wrapper, tmp_path, delete):
+    journal = str(tmp_path / "journal.sqlite")
+    wrapper.upload(instances, "token", "dataset", kg_url=server.kg_url, journal=journal)
+    assert wrapper.upload(instances, "token", "dataset", kg_url=server.kg_url, journal=journal) == {}
+    getattr(wrapper, delete)(instances, "token", "dataset", kg_url=server.kg_url, journal=journal)
+    assert server.instances == {}
+    response = wrapper.upload(instances, "token", "dataset", kg_url=server.kg_url, journal=journal)
+    assert {result.status_code for result in response.values()} == {200}
+    assert len(server.instances) == 4
+
+
+def test_journal_replaces_existing_instances(server, instances, wrapper, tmp_path):
+    journal = str(tmp_path / "journal.sqlite")
+    server.instances["state-0"] = {"lookupLabel": "old"}
+    wrapper.upload(instances, "token", "dataset", kg_url=server.kg_url, journal=journal)
+    assert wrapper.failures.uuid.tolist() == ["state-0"]
+    # The journal does not know the content of the existing instance, so it is replaced
+    server.log.clear()
+    wrapper.upload(instances, "token", "dataset", kg_url=server.kg_url, journal=journal)
+    assert server.log == [("PUT", "state-0")]
+    assert server.instances["state-0"]["lookupLabel"] == "sub-0_state"
+
+
+def test_add2dsv_one_request_per_dataset_version(server, wrapper):
+    server.instances["dsv-1"] = {"studiedSpecimen": [{"@id": KG_PREFIX + "new-1"}]}
+    server.instances["dsv-2"] = {}
+    wrapper.add2dsv(["new-" + str(i) for i in range(50)], "token", ["dsv-1", "dsv-2"], "dataset",
+                    kg_url=server.kg_url, merge=True)
+    assert sorted(server.log) == [("GET", "dsv-1"), ("GET", "dsv-2"), ("PATCH", "dsv-1"), ("PATCH", "dsv-2")]
+    assert len(server.instances["dsv-2"]["studiedSpecimen"]) == 50
+    # Nothing is sent when all specimen are linked already
+    server.log.clear()
+    wrapper.add2dsv(["new-3"], "token", "dsv-1", "dataset", kg_url=server.kg_url, merge=True)
+    assert server.log == [("GET", "dsv-1")]
+
+
+def test_folder_without_manifest(server, instances, wrapper, tmp_path):
+    response = wrapper.upload(str(tmp_path), "token", "dataset", kg_url=server.kg_url)
+    assert len(response) == 4
+    response = wrapper.delete(str(tmp_path), "token", "dataset", kg_url=server.kg_url)
+    assert len(response) == 4
+    assert server.instances == {}
+    wrapper.upload(str(tmp_path), "token", "dataset", kg_url=server.kg_url)
+    result = wrapper.bulkDelete(str(tmp_path), "token", "dataset", kg_url=server.kg_url)
+    assert result.message.tolist() == ["Deleted"] * 4
+
+
+def test_empty_folder(server, wrapper, tmp_path):
+    with pytest.raises(FileNotFoundError, match="No manifest.csv or instance files"):
+        wrapper.upload(str(tmp_path), "token", "dataset", kg_url=server.kg_url)
+    with pytest.raises(FileNotFoundError):
+        wrapper.delete(str(tmp_path), "token", "dataset", kg_url=server.kg_url)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Validation and parsing of specimen sheets.
+"""
+
+import os
+import warnings
+
+import pandas as pd
+import pytest
+
+from metabot import openMINDS_wrapper
+from metabot.validate import parseValues, validateSheet
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+
+
+def sheet(**columns):
+    rows = {"specimenType": ["subject", "subject"], "name": ["a", "b"], "timePoint": [1, 1],
+            "ageCategory": ["adult", "adult"]}
+    rows.update(columns)
+    return pd.DataFrame(rows)
+
+
+def messages(errors, column):
+    return errors[errors.column == column].set_index("row").message.to_dict()
+
+
+def test_parse_values():
+    parsed = parseValues(pd.Series(["6", "6-8", " 7 ", None, "six", "6.5", "8-6"]))
+    assert parsed["min"].tolist()[:3] == [6, 6, 7]
+    assert parsed["max"].tolist()[:3] == [6, 8, 7]
+    assert parsed.isRange.tolist() == [False, True, False, False, False, False, True]
+    assert parsed.invalid.tolist() == [False, False, False, False, True, False, False]
+    assert parsed.fraction.tolist() == [False, False, False, False, False, True, False]
+    assert parsed.reversed.tolist() == [False, False, False, False, False, False, True]
+
+
+def test_values_must_be_whole_and_ordered():
+    errors = validateSheet(sheet(ageValue=["6.5", "8-6"], ageUnit=["month", "month"]))[1]
+    assert messages(errors, "ageValue") == {0: "Not a whole number",
+                                            1: "The minimum of the range is larger than the maximum"}
+
+
+def test_value_without_unit():
+    errors = validateSheet(sheet(weightValue=[20, 30], weightUnit=["gram", None]))[1]
+    assert messages(errors, "weightUnit") == {1: "No unit given for weightValue"}
+    assert errors.level.unique().tolist() == ["error"]
+    # A sheet without the unit column has no units at all
+    errors = validateSheet(sheet(weightValue=[20, None]))[1]
+    assert messages(errors, "weightUnit") == {0: "No unit given for weightValue"}
+
+
+def test_missing_columns():
+    errors = validateSheet(sheet().drop(columns="timePoint"))[1]
+    assert messages(errors, "timePoint") == {None: "Column is missing"}
+    parsed, errors = validateSheet(sheet())
+    assert len(errors) == 0
+    assert parsed.remarks.isna().all()
+    assert parsed.attributeList.tolist() == [None, None]
+
+
+def test_samples_need_type_and_origin():
+    samples = sheet(specimenType=["ts", "tsc"], ageCategory=[None, None], sampleType=["tissueSlice", None],
+                    origin=[None, "brain"], quantity=[None, 2.5])
+    errors = validateSheet(samples)[1]
+    assert messages(errors, "sampleType") == {1: "Required value is missing"}
+    assert messages(errors, "origin") == {0: "Required value is missing"}
+    assert messages(errors, "quantity") == {1: "Not a whole number"}
+
+
+def test_example_sheet(tmp_path):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        df = pd.read_excel(os.path.join(EXAMPLES, "example_specimen.xlsx"))
+    data = openMINDS_wrapper(emitter="jsonld", verbosity="warning").makeSpecimenCollections(df, str(tmp_path))
+    assert len(data) == len(df)
+    assert data.state_uuid.notna().all()
+
+
+def test_errors_stop_the_sheet(tmp_path):
+    wrapper = openMINDS_wrapper(verbosity="quiet")
+    with pytest.raises(ValueError, match="1 mistake"):
+        wrapper.makeSubjectCollections(sheet(ageValue=["6", "7"], ageUnit=["month", None]), str(tmp_path))
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_units_without_snapshot():
+    errors = validateSheet(sheet(weightValue=[20, 30], weightUnit=["gram", "stone"]))[1]
+    assert messages(errors, "weightUnit") == {1: "Unknown term, expected one of: microgram, milligram, gram, kilogram"}
+    assert errors.level.tolist() == ["error"]